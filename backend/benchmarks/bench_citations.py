@@ -0,0 +1,106 @@
+"""Benchmark citation rewriting and marker insertion against the previous implementations.
+
+Usage:
+    python benchmarks/bench_citations.py [--sources 150] [--report-chars 40000]
+
+Checks that both implementations produce identical output before timing them.
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from agent.utils import insert_citation_markers, rewrite_source_urls  # noqa: E402
+
+
+def legacy_rewrite(content, sources):
+    """Rewrite short URLs with one str.replace per source, as finalize_answer used to."""
+    unique_sources = []
+    for source in sources:
+        if source.get("short_url") and source["short_url"] in content:
+            content = content.replace(source["short_url"], source["value"])
+            unique_sources.append(source)
+    return content, unique_sources
+
+
+def legacy_insert(text, citations_list):
+    """Insert citation markers back to front with one string copy each, as utils used to."""
+    sorted_citations = sorted(
+        citations_list, key=lambda c: (c["end_index"], c["start_index"]), reverse=True
+    )
+    modified_text = text
+    for citation_info in sorted_citations:
+        end_idx = citation_info["end_index"]
+        marker_to_insert = ""
+        for segment in citation_info["segments"]:
+            marker_to_insert += f" [{segment['label']}]({segment['short_url']})"
+        modified_text = modified_text[:end_idx] + marker_to_insert + modified_text[end_idx:]
+    return modified_text
+
+
+def build_fixture(n_sources: int, report_chars: int, seed: int = 0):
+    """Build a report citing `n_sources` sources (with duplicates) and its citation list."""
+    rng = random.Random(seed)
+    sources = []
+    for i in range(n_sources):
+        # Suffix keeps URLs prefix-free: the legacy loop counts "article-1" as cited
+        # whenever "article-18" is, the single-pass matcher takes the longest URL
+        url = f"https://news.example{i % 17}.com/{rng.choice(['markets', 'tech', 'policy'])}/article-{i}.html"
+        sources.append({"label": f"Source {i}", "short_url": url, "value": url})
+    # Branches frequently return the same page, so duplicates are realistic
+    sources += rng.sample(sources, n_sources // 4)
+
+    words = "the market grew strongly while analysts revised their forecasts upward".split()
+    parts = []
+    length = 0
+    while length < report_chars:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(10, 25))) + ". "
+        if rng.random() < 0.35:
+            sentence += f"([source]({rng.choice(sources)['short_url']})) "
+        parts.append(sentence)
+        length += len(sentence)
+    report = "".join(parts)
+
+    citations = [
+        {
+            "start_index": max(0, end - 80),
+            "end_index": end,
+            "segments": [{"label": s["label"], "short_url": s["short_url"]} for s in rng.sample(sources, 2)],
+        }
+        for end in sorted(rng.sample(range(len(report)), n_sources))
+    ]
+    return report, sources, citations
+
+
+def main() -> None:
+    """Time the legacy and single-pass implementations and check they agree."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", type=int, default=150)
+    parser.add_argument("--report-chars", type=int, default=40000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    report, sources, citations = build_fixture(args.sources, args.report_chars)
+
+    new_content, new_sources = rewrite_source_urls(report, sources)
+    old_content, old_sources = legacy_rewrite(report, sources)
+    assert new_content == old_content, "rewritten content differs"
+    assert [s["short_url"] for s in new_sources] == list(dict.fromkeys(s["short_url"] for s in old_sources))
+    assert insert_citation_markers(report, citations) == legacy_insert(report, citations)
+
+    print(f"report_chars={len(report)} sources={len(sources)} citations={len(citations)}")
+    for name, fn in (
+        ("rewrite legacy", lambda: legacy_rewrite(report, sources)),
+        ("rewrite single-pass", lambda: rewrite_source_urls(report, sources)),
+        ("markers legacy", lambda: legacy_insert(report, citations)),
+        ("markers builder", lambda: insert_citation_markers(report, citations)),
+    ):
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat)) * 1000
+        print(f"{name:22s} {best:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""Offline end-to-end benchmark of the compiled research graph.
+
+Usage:
+    python benchmarks/bench_graph.py [--runs 20] [--concurrency 4] [--llm-latency-ms 800]
+    python benchmarks/bench_graph.py --replay cassettes/slow-run.cassette.gz [--time-scale 0.1]
+
+Runs `agent.graph.graph` against a stub Azure OpenAI server, a fake search
+provider and a local fixture site for scraping, then reports per-node latency,
+end-to-end p50/p95/p99, throughput at the given concurrency and peak RSS.
+Results are written as JSON to benchmarks/results/ (tagged with the git commit)
+so regressions can be tracked across commits.
+
+With --replay, LLM, search and scrape calls are answered from a cassette
+recorded with AGENT_CASSETTE_MODE=record (see src/agent/cassette.py), so a
+real production run can be re-executed and profiled without network access.
+--record captures the benchmark's own stub traffic into a cassette.
+
+With --checkpoint, runs are checkpointed to an in-memory saver through
+`CompactSerializer` (zstd, zlib or none) and checkpoint bytes and write
+latency per run are reported; compare with AGENT_WRITE_ONCE_STATE=true to
+see the effect of the write-once state fields.
+
+With --simple-fraction, that share of the runs asks a short factual question
+(routed to the fast path, see src/agent/routing.py) and end-to-end latency is
+also reported per route.
+
+Reflection cascade escalation rate, the measured overhead of escalated first
+passes and the estimated latency accepted first passes saved are reported per
+run; compare with --config '{"reflection_cascade": false}'.
+
+Compare with --config '{"incremental_reflection": true}' to measure pipelined
+research waves (follow-ups dispatched from within each web_research branch).
+
+With --follow-up, every deep run is followed by a second question in the same
+thread; compare with --config '{"reuse_evidence": false}' to see the effect of
+reusing the thread's evidence store (src/agent/evidence.py).
+
+With --stall-probability, that share of stub LLM calls stalls (long-tail
+latency); hedges, timeouts and retries are reported. Compare with
+--config '{"llm_hedge_after_seconds": 0}' to see what hedging buys.
+
+To measure the merged finalize-and-report mode, compare a run with
+--config '{"merged_finalize": false}' against the default; --decode-ms-per-token
+makes stub latency grow with completion length, as long generations do.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List
+from uuid import UUID
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+from stubs import StubServices, StubSettings, make_fake_search  # noqa: E402
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": round(statistics.mean(values), 4) if values else 0.0,
+        "p50": round(_percentile(values, 0.50), 4),
+        "p95": round(_percentile(values, 0.95), 4),
+        "p99": round(_percentile(values, 0.99), 4),
+        "max": round(max(values), 4) if values else 0.0,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def _configure_environment(base_url: str, workdir: str, args) -> None:
+    """Point the agent at the stub services before it is imported."""
+    if args.record or args.replay:
+        os.environ.update({
+            "AGENT_CASSETTE_MODE": "replay" if args.replay else "record",
+            "AGENT_CASSETTE_PATH": args.replay or args.record,
+            "AGENT_CASSETTE_TIME_SCALE": str(args.time_scale),
+        })
+    os.environ.update({
+        "AZURE_OPENAI_API_KEY": "stub",
+        "AZURE_OPENAI_ENDPOINT": base_url,
+        "AZURE_OPENAI_API_VERSION": "2024-12-01-preview",
+        "SERPAPI_API_KEY": "stub",
+        "KNOWLEDGE_INDEX_PATH": os.path.join(workdir, "knowledge.db"),
+    })
+    os.environ.pop("TAVILY_API_KEY", None)
+
+
+def _node_timer():
+    """Return a callback handler collecting wall time per graph node invocation."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class NodeTimer(BaseCallbackHandler):
+        def __init__(self):
+            self.started: Dict[UUID, tuple] = {}
+            self.durations: Dict[str, List[float]] = defaultdict(list)
+
+        def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+            node = (metadata or {}).get("langgraph_node")
+            if node and kwargs.get("name") == node:
+                self.started[run_id] = (node, time.perf_counter())
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            entry = self.started.pop(run_id, None)
+            if entry:
+                self.durations[entry[0]].append(time.perf_counter() - entry[1])
+
+        on_chain_error = on_chain_end
+
+    return NodeTimer()
+
+
+async def _run_benchmark(args, configurable: Dict[str, Any]) -> Dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+
+    from agent.graph import builder, graph
+    from agent.tracing import shutdown_tracing
+    from agent.web_research import WebResearchTool
+
+    WebResearchTool.search_with_serpapi = make_fake_search(os.environ["AZURE_OPENAI_ENDPOINT"])
+
+    if args.checkpoint != "off":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        from agent.checkpointing import CompactSerializer, with_checkpoint_metrics
+
+        saver = with_checkpoint_metrics(InMemorySaver)(serde=CompactSerializer(compression=args.checkpoint))
+        graph = builder.compile(checkpointer=saver, name=graph.name)
+    elif args.follow_up:
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        # Follow-up turns need the thread state of the first turn
+        graph = builder.compile(checkpointer=InMemorySaver(), name=graph.name)
+
+    timer = _node_timer()
+    latencies: List[float] = []
+    route_latencies: Dict[str, List[float]] = defaultdict(list)
+    cascades: List[Dict[str, Any]] = []
+    follow_up_latencies: List[float] = []
+    failures = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_run(i: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            # Spread the simple questions evenly over the runs
+            simple = int((i + 1) * args.simple_fraction) > int(i * args.simple_fraction)
+            question = f"What is the capital of country {i}?" if simple else f"Research question {i}: how is the market evolving?"
+            start = time.perf_counter()
+            try:
+                output = await graph.ainvoke(
+                    {"messages": [HumanMessage(content=question)]},
+                    {"configurable": {**configurable, "run_id": f"bench-{i}", "thread_id": f"bench-{i}"}, "callbacks": [timer], "recursion_limit": 50},
+                )
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed)
+                route = (output["messages"][-1].additional_kwargs.get("route") or {}).get("route", "deep")
+                route_latencies[route].append(elapsed)
+                cascade = output["messages"][-1].additional_kwargs.get("reflection_cascade")
+                if cascade and cascade["passes"]:
+                    cascades.append(cascade)
+                if args.follow_up and not simple:
+                    start = time.perf_counter()
+                    await graph.ainvoke(
+                        {"messages": [HumanMessage(content=f"And how do the key figures of question {i} compare across regions?")]},
+                        {"configurable": {**configurable, "run_id": f"bench-{i}-follow-up", "thread_id": f"bench-{i}"}, "callbacks": [timer], "recursion_limit": 50},
+                    )
+                    follow_up_latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                failures += 1
+                print(f"run {i} failed: {e!r}")
+
+    if args.warmup:
+        await one_run(-1)
+        latencies.clear()
+        route_latencies.clear()
+        cascades.clear()
+        follow_up_latencies.clear()
+        timer.durations.clear()
+
+    from agent.metrics import metrics
+
+    tail_counters = ("llm_hedges_total", "llm_timeouts_total", "llm_retries_total")
+    before = {name: metrics.counter(name) for name in tail_counters}
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one_run(i) for i in range(args.runs)))
+    wall = time.perf_counter() - wall_start
+    shutdown_tracing()
+
+    checkpoints = None
+    if args.checkpoint != "off":
+        from agent.checkpointing import checkpoint_stats
+
+        runs = [r for key, r in checkpoint_stats.snapshot()["runs"].items() if key != "bench--1"]
+        checkpoints = {
+            "compression": args.checkpoint,
+            "stored_bytes_per_run": _summary([r["stored_bytes"] for r in runs]),
+            "raw_bytes_per_run": _summary([r["raw_bytes"] for r in runs]),
+            "write_seconds_per_run": _summary([r["write_seconds"] for r in runs]),
+            "puts_per_run": _summary([r["checkpoints"] + r["writes"] for r in runs]),
+        }
+
+    # Hedges by winner, timeouts by scope and retries of the measured runs
+    tail = {}
+    for name in tail_counters:
+        for key, value in metrics.counter(name).items():
+            labels = dict(key)
+            series = f"{name.removeprefix('llm_').removesuffix('_total')}.{labels.get('winner') or labels.get('scope') or 'all'}"
+            delta = value - before[name].get(key, 0)
+            if delta:
+                tail[series] = tail.get(series, 0) + int(delta)
+
+    return {
+        "checkpoints": checkpoints,
+        "llm_tail": dict(sorted(tail.items())),
+        "end_to_end_seconds": _summary(latencies),
+        "routes": {route: _summary(values) for route, values in sorted(route_latencies.items())},
+        "follow_up_seconds": _summary(follow_up_latencies) if follow_up_latencies else None,
+        "reflection_cascade": {
+            "escalation_rate": _summary([c["escalation_rate"] for c in cascades]),
+            "overhead_seconds_per_run": _summary([c["escalation_overhead_seconds"] for c in cascades]),
+            "estimated_saved_seconds_per_run": _summary(
+                [c["estimated_saved_seconds"] for c in cascades if c["estimated_saved_seconds"] is not None]
+            ),
+        } if cascades else None,
+        "throughput_runs_per_minute": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "failures": failures,
+        "nodes": {node: _summary(values) for node, values in sorted(timer.durations.items())},
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print per-run and per-node latency."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--reasoning-latency-ms", type=float, default=4000.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--completion-tokens", type=int, default=350)
+    parser.add_argument("--scrape-latency-ms", type=float, default=150.0)
+    parser.add_argument("--decode-ms-per-token", type=float, default=0.0,
+                        help="extra stub LLM latency per completion token")
+    parser.add_argument("--low-confidence-probability", type=float, default=0.3,
+                        help="chance a stub reflection reports low confidence and escalates")
+    parser.add_argument("--malformed-probability", type=float, default=0.0,
+                        help="chance a stub structured reply is malformed and takes the repair path")
+    parser.add_argument("--stall-probability", type=float, default=0.0,
+                        help="chance a stub LLM call stalls for 20s (long-tail latency)")
+    parser.add_argument("--max-research-loops", type=int, default=2)
+    parser.add_argument("--config", default="{}", help="extra Configuration values as JSON")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--record", metavar="CASSETTE", help="record LLM, search and scrape calls to a cassette")
+    parser.add_argument("--replay", metavar="CASSETTE", help="answer LLM, search and scrape calls from a cassette")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="replay timing factor (0 = instant)")
+    parser.add_argument("--checkpoint", choices=["off", "zstd", "zlib", "none"], default="off",
+                        help="checkpoint runs in memory with this compression and report checkpoint bytes")
+    parser.add_argument("--simple-fraction", type=float, default=0.0,
+                        help="share of runs asking a simple factual question (fast path)")
+    parser.add_argument("--follow-up", action="store_true",
+                        help="ask a follow-up question in the same thread after each deep run and report its latency")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    settings = StubSettings(
+        llm_latency_ms=args.llm_latency_ms,
+        reasoning_latency_ms=args.reasoning_latency_ms,
+        latency_sigma=args.latency_sigma,
+        completion_tokens=args.completion_tokens,
+        scrape_latency_ms=args.scrape_latency_ms,
+        decode_ms_per_token=args.decode_ms_per_token,
+        low_confidence_probability=args.low_confidence_probability,
+        malformed_probability=args.malformed_probability,
+        stall_probability=args.stall_probability,
+    )
+    configurable = {
+        "search_engine": "serpapi",
+        "max_research_loops": args.max_research_loops,
+        "use_azure_sessions": False,
+        # Every run must do its research; pass --config '{"answer_cache_mode": "answer"}' to measure the cache
+        "answer_cache_mode": "off",
+        **json.loads(args.config),
+    }
+
+    with tempfile.TemporaryDirectory() as workdir, StubServices(settings) as services:
+        _configure_environment(services.base_url, workdir, args)
+        results = asyncio.run(_run_benchmark(args, configurable))
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": args.runs,
+        "concurrency": args.concurrency,
+        "stub_settings": asdict(settings),
+        "configurable": configurable,
+        "cassette": {"mode": "replay", "path": args.replay, "time_scale": args.time_scale} if args.replay else None,
+        **results,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+    output = Path(args.output) if args.output else BENCH_DIR / "results" / f"{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    e2e = report["end_to_end_seconds"]
+    print(f"runs={args.runs} concurrency={args.concurrency} failures={report['failures']}")
+    print(f"end-to-end s: p50={e2e['p50']} p95={e2e['p95']} p99={e2e['p99']}")
+    print(f"throughput: {report['throughput_runs_per_minute']} runs/min, peak RSS {report['peak_rss_mb']} MB")
+    if report["checkpoints"]:
+        cp = report["checkpoints"]
+        print(f"checkpoints ({cp['compression']}): {cp['stored_bytes_per_run']['mean']:.0f} B/run stored, "
+              f"{cp['raw_bytes_per_run']['mean']:.0f} B/run raw, {cp['puts_per_run']['mean']:.0f} puts/run, "
+              f"{cp['write_seconds_per_run']['mean'] * 1000:.1f} ms/run writing")
+    if report["reflection_cascade"]:
+        cascade = report["reflection_cascade"]
+        saved = cascade["estimated_saved_seconds_per_run"]
+        print(f"reflection cascade: escalation rate mean={cascade['escalation_rate']['mean']:.2f}, "
+              f"escalation overhead {cascade['overhead_seconds_per_run']['mean']:.2f}s/run mean, "
+              + (f"estimated saving {saved['mean']:.2f}s/run mean ({saved['count']} runs)" if saved["count"]
+                 else "no saving estimate yet (too few escalations)"))
+    if report["llm_tail"]:
+        print("llm tail handling: " + ", ".join(f"{name}={count}" for name, count in report["llm_tail"].items()))
+    if report["follow_up_seconds"]:
+        follow_up = report["follow_up_seconds"]
+        print(f"follow-up turns: p50={follow_up['p50']:.3f}s p95={follow_up['p95']:.3f}s")
+    for route, stats in report["routes"].items():
+        print(f"  route {route:12s} n={stats['count']:3d} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s")
+    for node, stats in report["nodes"].items():
+        print(f"  {node:18s} n={stats['count']:3d} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s")
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
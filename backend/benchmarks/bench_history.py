@@ -0,0 +1,69 @@
+"""Benchmark research-topic prompt size against the number of turns in a thread.
+
+Usage:
+    python benchmarks/bench_history.py [--turns 1,2,4,8,16,32] [--budget 3000] [--report-tokens 1500]
+
+Simulates a thread in which each turn is a question and a full report, and
+compares the full concatenation (`utils.get_research_topic`, rebuilt by every
+node) with the windowed topic of `agent.history` (built once per run, older
+turns folded into a rolling summary). The LLM summarizer is replaced by the
+extractive fallback, so the summary size is a lower bound of a real run.
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+from agent.history import build_research_topic, estimate_tokens  # noqa: E402
+from agent.utils import get_research_topic  # noqa: E402
+
+# Nodes that put the research topic into their prompt in a deep research run
+TOPIC_PROMPTS = 5
+
+
+def build_thread(turns: int, report_tokens: int, seed: int = 0):
+    """Return a thread of `turns` question and report pairs followed by a new follow-up question."""
+    rng = random.Random(seed)
+    words = "market growth data report analysis revenue share estimate survey region quarter trend".split()
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"Question {i}: how did the {rng.choice(words)} {rng.choice(words)} change this year?"))
+        messages.append(AIMessage(content=" ".join(rng.choice(words) for _ in range(report_tokens * 4 // 7))))
+    # The run being benchmarked answers the newest question
+    messages.append(HumanMessage(content="And how does that compare with last year?"))
+    return messages
+
+
+def main() -> None:
+    """Compare prompt tokens and build time of both research topics per thread length."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", default="1,2,4,8,16,32", help="earlier turns in the thread (comma separated)")
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--report-tokens", type=int, default=1500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"budget={args.budget} report_tokens={args.report_tokens} topic prompts per run={TOPIC_PROMPTS}")
+    print(f"{'turns':>5s} {'full tok':>9s} {'window tok':>10s} {'saved/run':>10s} {'full ms':>8s} {'window ms':>9s}")
+    for turns in (int(t) for t in args.turns.split(",")):
+        messages = build_thread(turns, args.report_tokens)
+        full = get_research_topic(messages)
+        # Earlier runs of the thread already folded all but the last turn
+        _, previous = build_research_topic(messages[:-2], args.budget)
+        windowed, _ = build_research_topic(messages, args.budget, previous)
+        full_ms = min(timeit.repeat(lambda: [get_research_topic(messages) for _ in range(TOPIC_PROMPTS)],
+                                    number=1, repeat=args.repeat)) * 1000
+        window_ms = min(timeit.repeat(lambda: build_research_topic(messages, args.budget, previous),
+                                      number=1, repeat=args.repeat)) * 1000
+        saved = (estimate_tokens(full) - estimate_tokens(windowed)) * TOPIC_PROMPTS
+        print(f"{turns:5d} {estimate_tokens(full):9d} {estimate_tokens(windowed):10d} {saved:10d} "
+              f"{full_ms:8.3f} {window_ms:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Cold-start benchmark: how long importing the agent takes in a fresh interpreter.
+
+Usage:
+    python benchmarks/bench_import.py [--module agent.graph] [--repeat 5] [--top 15]
+
+Each repetition runs `python -X importtime -c "import <module>"` in a new
+process and parses the cumulative import time of every module. Reports the
+median total, the slowest top-level imports of the median run, and writes
+the result to benchmarks/results/import-<commit>-<time>.json so cold-start
+time can be tracked across commits.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BENCH_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCH_DIR.parent / "src"
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[str, int, float]]]:
+    """Import `module` in a fresh interpreter; return (wall seconds, [(name, depth, cumulative seconds)])."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(SRC_DIR), os.environ.get("PYTHONPATH")]))}
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - start
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            depth = (len(match.group(3)) - 1) // 2
+            entries.append((match.group(4), depth, int(match.group(2)) / 1e6))
+    return wall, entries
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main() -> None:
+    """Time the import in fresh interpreters and report the median run."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="agent.graph")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/import-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.repeat):
+        wall, entries = measure(args.module)
+        total = next((seconds for name, depth, seconds in entries if name == args.module), 0.0)
+        runs.append({"wall_seconds": wall, "import_seconds": total, "entries": entries})
+
+    median_run = sorted(runs, key=lambda r: r["import_seconds"])[len(runs) // 2]
+    # Direct dependencies of the measured module (and of the agent package) are the actionable ones
+    top_level: Dict[str, float] = {}
+    for name, depth, seconds in median_run["entries"]:
+        if depth <= 2 and name != args.module:
+            top_level[name] = max(top_level.get(name, 0.0), seconds)
+    slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "module": args.module,
+        "repeat": args.repeat,
+        "import_seconds": {
+            "median": round(statistics.median(r["import_seconds"] for r in runs), 4),
+            "min": round(min(r["import_seconds"] for r in runs), 4),
+            "max": round(max(r["import_seconds"] for r in runs), 4),
+        },
+        "process_wall_seconds_median": round(statistics.median(r["wall_seconds"] for r in runs), 4),
+        "slowest_imports": [{"module": name, "cumulative_seconds": round(seconds, 4)} for name, seconds in slowest],
+    }
+
+    output = Path(args.output) if args.output else BENCH_DIR / "results" / f"import-{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    stats = report["import_seconds"]
+    print(f"import {args.module}: median {stats['median']:.3f}s (min {stats['min']:.3f}s, max {stats['max']:.3f}s) "
+          f"over {args.repeat} runs; process wall {report['process_wall_seconds_median']:.3f}s")
+    for entry in report["slowest_imports"]:
+        print(f"  {entry['cumulative_seconds']:7.3f}s  {entry['module']}")
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
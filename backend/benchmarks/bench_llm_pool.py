@@ -0,0 +1,118 @@
+"""Benchmark the Azure OpenAI deployment pool against rate-limited stub endpoints.
+
+Usage:
+    python benchmarks/bench_llm_pool.py [--deployments 1,3] [--requests 120] [--concurrency 16] [--rpm-limit 60]
+
+Starts one stub server per deployment, each answering 429 with Retry-After
+beyond --rpm-limit requests per minute, and sends --requests chat completions
+through `InstrumentedLLM` over a `DeploymentPool` of those endpoints. Reports
+throughput, latency, how requests were spread over the deployments, 429s and
+failovers. Each pool size runs twice: with the deployments' RPM quota known to
+the pool (token buckets route around exhausted deployments before they throttle)
+and without it (the pool only learns from 429 cooldowns).
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+from stubs import StubServices, StubSettings  # noqa: E402
+
+from agent.llm import InstrumentedLLM  # noqa: E402
+from agent.llm_pool import Deployment, DeploymentPool, TokenBucket  # noqa: E402
+from agent.metrics import metrics  # noqa: E402
+
+MODEL = "gpt-4o-mini"
+
+
+def _counter(name: str) -> Dict[tuple, float]:
+    return {tuple(sorted(dict(key).items())): value for key, value in metrics.counter(name).items()}
+
+
+def _delta(name: str, before: Dict[tuple, float]) -> Dict[tuple, float]:
+    return {key: value - before.get(key, 0) for key, value in _counter(name).items() if value - before.get(key, 0)}
+
+
+async def _run(llm: InstrumentedLLM, requests: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await llm.achat("bench", model=MODEL, messages=[{"role": "user", "content": f"Summarize item {i}."}],
+                            max_tokens=200)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+def run_config(args, deployments: int, quota_aware: bool) -> Dict[str, Any]:
+    """Send the requests through a pool of `deployments` stub endpoints and collect the pool metrics."""
+    settings = StubSettings(llm_latency_ms=args.llm_latency_ms, completion_tokens=50, rpm_limit=args.rpm_limit)
+    with ExitStack() as stack:
+        services = [stack.enter_context(StubServices(settings)) for _ in range(deployments)]
+        pool = DeploymentPool([
+            Deployment(MODEL, MODEL, s.base_url, "stub", "2024-12-01-preview",
+                       rpm=TokenBucket(args.rpm_limit) if quota_aware else None)
+            for s in services
+        ])
+        llm = InstrumentedLLM(pool, max_retries=args.max_retries, backoff_seconds=0.5)
+        before = {name: _counter(name) for name in ("llm_pool_requests_total", "llm_pool_failovers_total", "llm_retries_total")}
+        start = time.perf_counter()
+        latencies = asyncio.run(_run(llm, args.requests, args.concurrency))
+        elapsed = time.perf_counter() - start
+
+    requests = _delta("llm_pool_requests_total", before["llm_pool_requests_total"])
+    by_deployment: Dict[str, int] = {}
+    throttled = 0
+    for key, value in requests.items():
+        labels = dict(key)
+        if labels["outcome"] == "ok":
+            by_deployment[labels["deployment"]] = int(value)
+        throttled += int(value) if labels["outcome"] == "throttled" else 0
+    return {
+        "elapsed": elapsed,
+        "latencies": sorted(latencies),
+        "by_deployment": sorted(by_deployment.values(), reverse=True),
+        "throttled": throttled,
+        "failovers": int(sum(_delta("llm_pool_failovers_total", before["llm_pool_failovers_total"]).values())),
+        "retries": int(sum(_delta("llm_retries_total", before["llm_retries_total"]).values())),
+    }
+
+
+def main() -> None:
+    """Run every pool size with and without known quotas and print one row each."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deployments", default="1,3", help="pool sizes to compare (comma separated)")
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rpm-limit", type=int, default=60, help="stub requests per minute per deployment")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--max-retries", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"requests={args.requests} concurrency={args.concurrency} rpm_limit={args.rpm_limit}")
+    print(f"{'deps':>4s} {'quota':>5s} {'req/s':>7s} {'p50 s':>7s} {'p95 s':>7s} {'429s':>5s} {'failover':>8s} "
+          f"{'retries':>7s}  per deployment")
+    for deployments in (int(d) for d in args.deployments.split(",")):
+        for quota_aware in (True, False):
+            result = run_config(args, deployments, quota_aware)
+            latencies = result["latencies"]
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * (len(latencies) - 1)))]
+            print(f"{deployments:4d} {'yes' if quota_aware else 'no':>5s} {args.requests / result['elapsed']:7.2f} "
+                  f"{statistics.median(latencies):7.2f} {p95:7.2f} {result['throttled']:5d} {result['failovers']:8d} "
+                  f"{result['retries']:7d}  {result['by_deployment']}")
+
+
+if __name__ == "__main__":
+    main()
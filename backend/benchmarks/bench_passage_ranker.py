@@ -0,0 +1,65 @@
+"""Benchmark the passage ranker on fixture pages.
+
+Usage:
+    python benchmarks/bench_passage_ranker.py [--pages 300] [--budget 500]
+
+Reports per-page ranking latency and how often the query-relevant paragraphs
+survive selection compared to blind truncation at the same budget.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from fixtures import TOPICS, make_page_text  # noqa: E402
+
+from agent.passage_ranker import CHARS_PER_TOKEN, select_passages  # noqa: E402
+
+
+def _coverage(selected: str, topic: str) -> float:
+    words = topic.split()
+    text = selected.lower()
+    return sum(text.count(w) for w in words) / len(words)
+
+
+def main() -> None:
+    """Time passage selection and compare its query-term coverage with truncation."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--budget", type=int, default=500, help="token budget per page")
+    args = parser.parse_args()
+
+    pages = [
+        (TOPICS[i % len(TOPICS)], make_page_text(TOPICS[i % len(TOPICS)], seed=i, paragraphs=40 + i % 40))
+        for i in range(args.pages)
+    ]
+
+    timings = []
+    ranked_coverage = []
+    truncated_coverage = []
+    for topic, text in pages:
+        start = time.perf_counter()
+        selected = select_passages(text, topic, token_budget=args.budget)
+        timings.append((time.perf_counter() - start) * 1000)
+        ranked_coverage.append(_coverage(selected, topic))
+        truncated_coverage.append(_coverage(text[: args.budget * CHARS_PER_TOKEN], topic))
+
+    timings.sort()
+    avg_chars = statistics.mean(len(t) for _, t in pages)
+    print(f"pages={len(pages)} avg_chars={avg_chars:.0f} budget={args.budget} tokens")
+    print(
+        f"latency ms: p50={timings[len(timings) // 2]:.2f} "
+        f"p95={timings[int(len(timings) * 0.95)]:.2f} max={timings[-1]:.2f}"
+    )
+    print(
+        f"query-term hits per page: ranked={statistics.mean(ranked_coverage):.1f} "
+        f"truncated={statistics.mean(truncated_coverage):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
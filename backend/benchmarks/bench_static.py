@@ -0,0 +1,142 @@
+"""Requests per second and bytes on the wire for the static frontend routes.
+
+Usage:
+    python benchmarks/bench_static.py [--seconds 2] [--concurrency 16]
+
+Builds a fixture Vite-style build (index.html, hashed JS/CSS bundles, public
+images) and drives `agent.app` in-process through an ASGI transport, so the
+numbers isolate handler cost from the network. Each route is measured with
+the previous per-request filesystem handlers as a baseline, for a first visit
+(Accept-Encoding: gzip, br) and a revalidating repeat visit (If-None-Match).
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import fastapi  # noqa: E402
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+
+ROUTES = ["/app/", "/app/assets/index-3f9a1c7e.js", "/app/assets/index-8b2e04d1.css", "/app/research/123", "/dr_logo.png"]
+
+
+def make_fixture_build(root: Path) -> None:
+    """Write a Vite-style build (index.html, hashed bundles) and a public image below `root`."""
+    rng = random.Random(0)
+    dist, public = root / "dist", root / "public"
+    (dist / "assets").mkdir(parents=True)
+    public.mkdir(parents=True)
+    words = "const let function return props state useEffect render component export import default".split()
+    script = "\n".join(f"{rng.choice(words)} v{i}={rng.choice(words)}(a{i % 97},\"{rng.choice(words)}\");" for i in range(12000))
+    (dist / "assets" / "index-3f9a1c7e.js").write_text(script)
+    (dist / "assets" / "index-8b2e04d1.css").write_text("".join(f".c{i}{{margin:{i % 16}px;color:#{i % 4096:03x}}}\n" for i in range(3000)))
+    (dist / "index.html").write_text(
+        '<!doctype html><html><head><meta charset="UTF-8"><title>Deep Research</title>'
+        '<script type="module" src="/app/assets/index-3f9a1c7e.js"></script>'
+        '<link rel="stylesheet" href="/app/assets/index-8b2e04d1.css"></head><body><div id="root"></div></body></html>'
+    )
+    (public / "dr_logo.png").write_bytes(os.urandom(120 * 1024))
+
+
+def legacy_app(root: Path) -> FastAPI:
+    """Build the handlers as they were: filesystem checks and a plain FileResponse per request."""
+    app = FastAPI()
+    build_path, public_path = root / "dist", root / "public"
+
+    @app.get("/{filename}")
+    async def serve_public_assets(filename: str):
+        allowed_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp'}
+        if not any(filename.endswith(ext) for ext in allowed_extensions):
+            raise fastapi.exceptions.HTTPException(status_code=404, detail="File not found")
+        file_path = public_path / filename
+        if file_path.exists() and file_path.is_file():
+            return fastapi.responses.FileResponse(file_path)
+        raise fastapi.exceptions.HTTPException(status_code=404, detail="File not found")
+
+    @app.get("/app/{path:path}")
+    async def serve_frontend(request: Request, path: str):
+        fp = build_path / "index.html" if path in ("", "/") else build_path / path
+        if not fp.exists() or not fp.is_file():
+            fp = build_path / "index.html"
+        return fastapi.responses.FileResponse(fp)
+
+    return app
+
+
+def current_app(root: Path) -> FastAPI:
+    """Return `agent.app` serving the build below `root` from asset manifests."""
+    import agent.app as agent_app
+    from agent.static_assets import AssetManifest
+
+    agent_app.frontend_assets = AssetManifest(root / "dist")
+    agent_app.public_assets = AssetManifest(root / "public")
+    return agent_app.app
+
+
+async def measure(app: FastAPI, route: str, seconds: float, concurrency: int, revalidate: bool) -> dict:
+    """Request `route` from `concurrency` workers for `seconds` and report throughput and response size."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"Accept-Encoding": "gzip, br"}
+        first = await client.get(route, headers=headers)
+        if revalidate and "etag" in first.headers:
+            headers["If-None-Match"] = first.headers["etag"]
+
+        requests = 0
+        wire_bytes = 0
+        statuses = set()
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            nonlocal requests, wire_bytes
+            while time.perf_counter() < deadline:
+                # Read the raw body: bytes on the wire, before any client-side decompression
+                async with client.stream("GET", route, headers=headers) as response:
+                    body = b"".join([chunk async for chunk in response.aiter_raw()])
+                requests += 1
+                wire_bytes += len(body)
+                statuses.add(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {
+        "rps": requests / elapsed,
+        "bytes": wire_bytes / max(requests, 1),
+        "status": ",".join(str(s) for s in sorted(statuses)),
+        "encoding": first.headers.get("content-encoding", "identity"),
+        "cache": first.headers.get("cache-control", "-"),
+    }
+
+
+def main() -> None:
+    """Compare the legacy and current handlers on every route."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = pathlib.Path(tmp)
+        make_fixture_build(root)
+        apps = {"legacy": legacy_app(root), "manifest": current_app(root)}
+
+        print(f"{'route':34s} {'handler':9s} {'visit':7s} {'rps':>8s} {'bytes/req':>10s} status encoding  cache-control")
+        for route in ROUTES:
+            for name, app in apps.items():
+                for revalidate in (False, True):
+                    result = asyncio.run(measure(app, route, args.seconds, args.concurrency, revalidate))
+                    print(f"{route:34s} {name:9s} {'repeat' if revalidate else 'first':7s} {result['rps']:8.0f} "
+                          f"{result['bytes']:10.0f} {result['status']:6s} {result['encoding']:9s} {result['cache']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Critical-path report for traces written by the file span exporter.
+
+Usage:
+    AGENT_TRACING_EXPORTER=file AGENT_TRACING_FILE=traces/spans.jsonl python benchmarks/bench_graph.py --runs 3
+    python benchmarks/critical_path.py traces/spans.jsonl [--trace <trace id>]
+
+For every `agent.run` span the critical path is the chain of spans that
+determined its end time: starting from the root, repeatedly follow the child
+that finished last, then the child that finished last before that one
+started, and so on. Time on the path not covered by a child is the span's own
+(self) time. Parallel `web_research` branches that finished early drop out.
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    """Read the spans of a JSON lines span file."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                raw = json.loads(line)
+                spans.append({
+                    "name": raw["name"],
+                    "trace_id": raw["context"]["trace_id"],
+                    "span_id": raw["context"]["span_id"],
+                    "parent_id": raw.get("parent_id"),
+                    "start": _timestamp(raw["start_time"]),
+                    "end": _timestamp(raw["end_time"]),
+                    "attributes": raw.get("attributes", {}),
+                })
+    return spans
+
+
+def critical_path(root: Dict[str, Any], children: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Return (span, self seconds) entries along the critical path below `root`, in time order."""
+    path = []
+    cursor = root["end"]
+    covered = 0.0
+    segments = []
+    for child in sorted(children.get(root["span_id"], []), key=lambda s: s["end"], reverse=True):
+        if child["end"] <= cursor:
+            segments.append(child)
+            covered += child["end"] - child["start"]
+            cursor = child["start"]
+    path.append({"span": root, "self_seconds": max(root["end"] - root["start"] - covered, 0.0)})
+    for child in reversed(segments):
+        path.extend(critical_path(child, children))
+    return path
+
+
+def _label(span: Dict[str, Any]) -> str:
+    attributes = span["attributes"]
+    detail = attributes.get("http.url") or attributes.get("search.query") or attributes.get("gen_ai.request.model") or ""
+    return f"{span['name']} {detail}".strip()
+
+
+def main() -> None:
+    """Print the critical path of each trace in the span file."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--trace", help="only report this trace id")
+    args = parser.parse_args()
+
+    spans = load_spans(args.path)
+    children: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        if span["parent_id"]:
+            children[span["parent_id"]].append(span)
+
+    roots = [s for s in spans if s["name"] == "agent.run" and (not args.trace or s["trace_id"].endswith(args.trace))]
+    if not roots:
+        sys.exit("no agent.run spans found")
+
+    for root in sorted(roots, key=lambda s: s["start"]):
+        total = root["end"] - root["start"]
+        print(f"trace {root['trace_id']} run {root['attributes'].get('agent.run_id')}: {total:.3f}s")
+        for entry in critical_path(root, children):
+            span = entry["span"]
+            offset = span["start"] - root["start"]
+            share = entry["self_seconds"] / total * 100 if total else 0.0
+            print(f"  +{offset:7.3f}s {span['end'] - span['start']:7.3f}s self {entry['self_seconds']:7.3f}s ({share:4.1f}%)  {_label(span)}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
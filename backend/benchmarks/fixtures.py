@@ -0,0 +1,57 @@
+"""Deterministic fixture pages shared by the offline benchmarks.
+
+Pages mimic real articles: boilerplate header and navigation, a long body where
+the query-relevant paragraphs are buried, and a footer.
+"""
+import random
+from typing import List
+
+TOPICS = [
+    "lithium battery recycling capacity in europe",
+    "global semiconductor foundry market share 2024",
+    "electric vehicle adoption rates in norway",
+    "offshore wind turbine installation costs",
+    "retail inflation impact on grocery margins",
+    "hospital staffing shortages and nurse turnover",
+]
+
+_FILLER = (
+    "cookie policy subscribe newsletter sign in account menu home about contact careers "
+    "press advertise terms privacy sitemap share follow latest trending video podcast "
+    "market update analysis opinion weekly briefing partner content sponsored editorial"
+).split()
+
+_PROSE = (
+    "the report notes that analysts expect further growth while regulators review the "
+    "proposal and industry groups publish new estimates based on survey data collected "
+    "across several regions during the previous quarter with mixed results overall"
+).split()
+
+
+def _sentence(rng: random.Random, words: List[str], length: int) -> str:
+    sentence = " ".join(rng.choice(words) for _ in range(length))
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def make_page_text(topic: str, seed: int = 0, paragraphs: int = 40) -> str:
+    """Return plain text for a page where the topic is discussed mid-article."""
+    rng = random.Random(f"{topic}-{seed}")
+    topic_words = topic.split()
+    parts = [_sentence(rng, _FILLER, 30) for _ in range(3)]
+    relevant_at = {paragraphs // 2, paragraphs // 2 + 3, paragraphs - 5}
+    for i in range(paragraphs):
+        words = _PROSE + topic_words * 3 if i in relevant_at else _PROSE
+        parts.append(" ".join(_sentence(rng, words, rng.randint(12, 24)) for _ in range(4)))
+    parts.append(_sentence(rng, _FILLER, 40))
+    return "\n\n".join(parts)
+
+
+def make_page_html(topic: str, seed: int = 0, paragraphs: int = 40) -> str:
+    """Return an HTML page wrapping `make_page_text` with typical page chrome."""
+    body = "".join(f"<p>{p}</p>" for p in make_page_text(topic, seed, paragraphs).split("\n\n"))
+    return (
+        f"<html><head><title>{topic.title()}</title><style>p{{margin:0}}</style>"
+        f"<script>var tracking = true;</script></head><body>"
+        f"<header>Site header</header><nav>Home | News | About</nav>"
+        f"<article>{body}</article><footer>Copyright</footer></body></html>"
+    )
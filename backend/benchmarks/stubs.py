@@ -0,0 +1,287 @@
+"""Local stand-ins for the external services used by the graph.
+
+- StubLLM: an OpenAI/Azure-compatible chat completions server with configurable
+  latency and token distributions. Responses follow the contract of each prompt
+  (JSON for query writing and reflection, decision markers for the answer, ...).
+- Fixture site: serves deterministic article pages for the scraper.
+- fake_search: a search provider returning fixture-site URLs.
+
+Both servers run in a child process so they don't compete with the graph for
+the GIL or skew its memory measurements.
+"""
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import random
+import re
+import socket
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List
+
+from aiohttp import web
+from fixtures import TOPICS, make_page_html
+
+_URL_RE = re.compile(r"https?://[^\s)\]]+")
+EFFORT_LATENCY = {"low": 0.3, "medium": 0.6, "high": 1.0}
+
+
+@dataclass
+class StubSettings:
+    """Latency and output-size distributions of the stub services."""
+
+    llm_latency_ms: float = 800.0  # median latency of a non-reasoning completion
+    reasoning_latency_ms: float = 4000.0  # median latency of reasoning (o-series) models
+    latency_sigma: float = 0.5  # lognormal sigma, controls the tail
+    completion_tokens: int = 350  # mean completion length
+    sufficient_probability: float = 0.5  # chance reflection reports sufficient evidence
+    low_confidence_probability: float = 0.3  # chance reflection reports low confidence (escalates the cascade)
+    scrape_latency_ms: float = 150.0
+    malformed_probability: float = 0.0  # chance a structured reply is wrapped in prose (needs repair)
+    decode_ms_per_token: float = 0.0  # added per completion token, so long generations cost more
+    stall_probability: float = 0.0  # chance a completion stalls for stall_ms (long-tail latency)
+    stall_ms: float = 20000.0
+    rpm_limit: int = 0  # requests per minute per deployment before a 429 with Retry-After (0 = unlimited)
+    seed: int = 0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _words(rng: random.Random, n: int) -> str:
+    vocabulary = "market growth data report analysis revenue share estimate survey region quarter trend".split()
+    return " ".join(rng.choice(vocabulary) for _ in range(n))
+
+
+class StubLLM:
+    """Generates prompt-appropriate chat completions with simulated latency."""
+
+    def __init__(self, settings: StubSettings):
+        """Seed the generator and per-model request windows from `settings`."""
+        self.settings = settings
+        self.rng = random.Random(settings.seed)
+        self.seen_prefixes = set()
+        self.request_times: Dict[str, deque] = {}
+
+    def _latency(self, model: str, effort: str = "") -> float:
+        median = self.settings.reasoning_latency_ms if model.startswith("o") else self.settings.llm_latency_ms
+        # Lower reasoning effort thinks for fewer tokens
+        median *= EFFORT_LATENCY.get(effort, 1.0)
+        return median / 1000 * self.rng.lognormvariate(0, self.settings.latency_sigma)
+
+    def _content(self, body: Dict[str, Any]) -> str:
+        messages = body.get("messages", [])
+        instructions = messages[0]["content"] if messages else ""
+        request = messages[-1]["content"] if messages else ""
+        rng = self.rng
+
+        if "repair malformed model output" in instructions:
+            start, end = request.find("{", request.find("Reply:")), request.rfind("}")
+            return request[start:end + 1] if start >= 0 else "{}"
+        if "research route" in instructions:
+            return json.dumps({"route": "fast" if "capital" in request else "deep", "reason": "stub"})
+        if "web-search queries" in instructions:
+            # Seeded by the thread's first question, so a follow-up turn asks the earlier queries again plus a new one
+            first_question = re.search(r"Context: (?:User: )?(.*)", request)
+            thread_rng = random.Random(first_question.group(1) if first_question else request)
+            queries = [f"{thread_rng.choice(TOPICS)} {_words(thread_rng, 3)}" for _ in range(thread_rng.randint(1, 3))]
+            if "Assistant:" in request:
+                queries.append(f"{rng.choice(TOPICS)} {_words(rng, 3)}")
+            return json.dumps({"rationale": "Cover each facet of the request.", "query": queries})
+        if "single new search summary" in instructions:
+            covered = rng.random() < self.settings.sufficient_probability
+            return json.dumps({
+                "covered": covered,
+                "gap": "" if covered else "Missing recent figures.",
+                "follow_up_query": "" if covered else f"{rng.choice(TOPICS)} latest figures",
+            })
+        if "audit the search summaries" in instructions:
+            sufficient = rng.random() < self.settings.sufficient_probability
+            return json.dumps({
+                "is_sufficient": sufficient,
+                "knowledge_gap": "" if sufficient else "Missing recent figures.",
+                "follow_up_queries": [] if sufficient else [f"{rng.choice(TOPICS)} latest figures"],
+                "conflicting_evidence": False,
+                "confidence": rng.uniform(0.3, 0.6) if rng.random() < self.settings.low_confidence_probability
+                else rng.uniform(0.75, 0.95),
+            })
+        if (body.get("response_format") or {}).get("json_schema", {}).get("name") == "FinalAnswer":
+            urls = list(dict.fromkeys(_URL_RE.findall(request)))[:8]
+            citations = " ".join(f"([source]({url}))" for url in urls)
+            return json.dumps({
+                "report": f"{_words(rng, self.settings.completion_tokens)} {citations}",
+                "code_analysis_needed": False,
+                "analysis_rationale": "Qualitative synthesis.",
+                "analysis_type": "none",
+            })
+        if "CODE_ANALYSIS_NEEDED" in instructions:
+            urls = list(dict.fromkeys(_URL_RE.findall(request)))[:8]
+            citations = " ".join(f"([source]({url}))" for url in urls)
+            return (
+                f"{_words(rng, self.settings.completion_tokens)} {citations}\n\n---\n"
+                "CODE_ANALYSIS_NEEDED: false\nANALYSIS_RATIONALE: Qualitative synthesis.\nANALYSIS_TYPE: none"
+            )
+        if "Code Generation Agent" in instructions:
+            return "import numpy as np\nvalues = np.arange(10)\nprint(values.mean())"
+        return _words(rng, max(10, int(rng.gauss(self.settings.completion_tokens, self.settings.completion_tokens / 4))))
+
+    def _usage(self, body: Dict[str, Any], content: str) -> Dict[str, Any]:
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        # Emulate automatic prefix caching: repeated static prefixes >= 1024 tokens hit in 128-token blocks
+        cached_tokens = 0
+        if messages and messages[0].get("role") == "system":
+            prefix = messages[0]["content"]
+            digest = hashlib.sha1(prefix.encode()).hexdigest()
+            prefix_tokens = len(prefix) // 4
+            if digest in self.seen_prefixes and prefix_tokens >= 1024:
+                cached_tokens = prefix_tokens // 128 * 128
+            self.seen_prefixes.add(digest)
+        completion_tokens = len(content) // 4
+        reasoning_tokens = completion_tokens * 2 if body.get("reasoning_effort") else 0
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens + reasoning_tokens,
+            "total_tokens": prompt_tokens + completion_tokens + reasoning_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            "completion_tokens_details": {"reasoning_tokens": reasoning_tokens},
+        }
+
+    def _throttle(self, deployment: str) -> float:
+        """Seconds until the deployment's sliding one-minute window admits a request (0 = admitted)."""
+        if not self.settings.rpm_limit:
+            return 0.0
+        now = time.monotonic()
+        window = self.request_times.setdefault(deployment, deque())
+        while window and window[0] <= now - 60:
+            window.popleft()
+        if len(window) >= self.settings.rpm_limit:
+            return window[0] + 60 - now
+        window.append(now)
+        return 0.0
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        """Answer a chat completion request, or 429 once the model is over its RPM limit."""
+        body = await request.json()
+        model = request.match_info.get("deployment") or body.get("model", "stub")
+        retry_after = self._throttle(model)
+        if retry_after:
+            return web.json_response(
+                {"error": {"code": "429", "message": "Requests to this deployment exceeded the rate limit."}},
+                status=429,
+                headers={"retry-after": str(int(retry_after) + 1), "retry-after-ms": str(int(retry_after * 1000))},
+            )
+        content = self._content(body)
+        if body.get("response_format") and self.rng.random() < self.settings.malformed_probability:
+            content = f"Here is the result:\n```json\n{content}\n```"
+        usage = self._usage(body, content)
+        latency = self._latency(model, body.get("reasoning_effort") or "") + usage["completion_tokens"] * self.settings.decode_ms_per_token / 1000
+        if self.rng.random() < self.settings.stall_probability:
+            latency += self.settings.stall_ms / 1000
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency)
+            return web.json_response({
+                "id": f"chatcmpl-{self.rng.getrandbits(32):x}",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        # Streaming: most of the latency is spent before the first token
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(latency * 0.7)
+        pieces = re.findall(r"\S+\s*", content) or [content]
+        per_piece = latency * 0.3 / len(pieces)
+        for piece in pieces:
+            chunk = {
+                "id": "chatcmpl-stream", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(per_piece)
+        final = {"id": "chatcmpl-stream", "object": "chat.completion.chunk", "created": created, "model": model, "choices": [], "usage": usage}
+        await response.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+        await response.write_eof()
+        return response
+
+
+def _build_app(settings: StubSettings) -> web.Application:
+    llm = StubLLM(settings)
+    rng = random.Random(settings.seed)
+
+    async def page(request: web.Request) -> web.Response:
+        await asyncio.sleep(settings.scrape_latency_ms / 1000 * rng.lognormvariate(0, settings.latency_sigma))
+        topic = request.match_info["topic"].replace("-", " ")
+        return web.Response(text=make_page_html(topic, seed=int(request.match_info["n"])), content_type="text/html")
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/openai/deployments/{deployment}/chat/completions", llm.handle)
+    app.router.add_post("/v1/chat/completions", llm.handle)
+    app.router.add_get("/pages/{topic}/{n}", page)
+    return app
+
+
+def _serve(settings_dict: Dict[str, Any], port: int) -> None:
+    web.run_app(_build_app(StubSettings(**settings_dict)), host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+class StubServices:
+    """Context manager running the stub LLM and fixture site in a child process."""
+
+    def __init__(self, settings: StubSettings):
+        """Reserve a free local port for the services."""
+        self.settings = settings
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._process = None
+
+    def __enter__(self) -> "StubServices":
+        """Start the services and wait until they accept connections."""
+        self._process = multiprocessing.get_context("spawn").Process(
+            target=_serve, args=(asdict(self.settings), self.port), daemon=True
+        )
+        self._process.start()
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+                    return self
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("stub services did not start")
+
+    def __exit__(self, *exc) -> None:
+        """Stop the services."""
+        self._process.terminate()
+        self._process.join(5)
+
+
+def make_fake_search(base_url: str):
+    """Return a `search_with_serpapi` replacement that yields fixture-site URLs."""
+
+    def fake_search(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
+        digest = int(hashlib.sha1(query.encode()).hexdigest(), 16)
+        topic = TOPICS[digest % len(TOPICS)]
+        slug = topic.replace(" ", "-")
+        return [
+            {
+                "title": f"{topic.title()} ({i})",
+                "url": f"{base_url}/pages/{slug}/{(digest + i) % 50}",
+                "snippet": f"Coverage of {topic}.",
+                "content": "",
+                "position": i + 1,
+            }
+            for i in range(num_results)
+        ]
+
+    return fake_search
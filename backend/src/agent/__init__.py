@@ -1,3 +1,10 @@
-from agent.graph import graph
-
 __all__ = ["graph"]
+
+
+def __getattr__(name):
+    # Import the graph on first access so `import agent.<module>` stays cheap
+    if name == "graph":
+        from agent.graph import graph
+
+        return graph
+    raise AttributeError(f"module 'agent' has no attribute {name!r}")
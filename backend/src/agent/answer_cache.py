@@ -0,0 +1,166 @@
+"""Semantic answer cache for near-duplicate research questions.
+
+Completed runs that answered a standalone question are remembered with their
+final report, UI metadata (sources, artifacts) and evidence. A new standalone
+question is matched against them with a local similarity index: hashed
+unigram and bigram vectors of the question's words, L2-normalized in
+one NumPy matrix, so a lookup is a single matrix-vector product and needs no
+embedding service. Unlike search query terms, the question's words keep
+interrogatives, negations and signed numbers: "When was X born?" and "Where
+was X born?" are different questions. Within the freshness window a close enough match either
+answers the run directly or only seeds it with the cached evidence.
+
+Entries expire after their TTL and the least recently used entries are
+evicted beyond AGENT_ANSWER_CACHE_SIZE. Lookups, stores and evictions are
+counted in the metrics registry.
+"""
+import os
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from agent.metrics import metrics
+
+VECTOR_DIMENSIONS = 4096
+DEFAULT_CACHE_SIZE = int(os.getenv("AGENT_ANSWER_CACHE_SIZE", "1000"))
+
+_WORD_RE = re.compile(r"[+-]?\d+(?:[.,]\d+)*|[a-z]+(?:'[a-z]+)?")
+# Only words that never change what is asked; who/what/when/where/why/which/how,
+# not/no/never/without, vs and numbers are kept
+_FILLER_WORDS = frozenset(
+    "a an and are as at be by did do does for from has have in is it its of on or "
+    "that the this to was were will with".split()
+)
+
+metrics.describe("agent_answer_cache_lookups_total", "Answer cache lookups by outcome (hit, seed or miss).")
+metrics.describe("agent_answer_cache_stores_total", "Completed runs stored in the answer cache.")
+metrics.describe("agent_answer_cache_evictions_total", "Answer cache evictions by reason (ttl or capacity).")
+
+
+def question_words(question: str) -> List[str]:
+    """Return the question's lowercase words without filler words, in order."""
+    return [w for w in _WORD_RE.findall(question.lower()) if w not in _FILLER_WORDS]
+
+
+def question_vector(question: str) -> np.ndarray:
+    """Hashed unigram and bigram vector of the question's words, L2-normalized."""
+    terms = question_words(question)
+    features = terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+    vector = np.zeros(VECTOR_DIMENSIONS, dtype=np.float32)
+    for feature in features:
+        vector[zlib.crc32(feature.encode()) % VECTOR_DIMENSIONS] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@dataclass
+class CachedAnswer:
+    """A completed run's answer to a standalone question, with its UI metadata and evidence."""
+
+    question: str
+    final_report: str
+    metadata: Dict[str, Any]
+    evidence: List[Dict[str, Any]]
+    stored_at: float = field(default_factory=time.time)
+    last_hit: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class AnswerCache:
+    """Thread-safe similarity index over recently answered questions."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        """Keep at most `max_entries` answers."""
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: List[CachedAnswer] = []
+        self._vectors = np.zeros((0, VECTOR_DIMENSIONS), dtype=np.float32)
+
+    def _drop(self, keep: List[int]) -> None:
+        self._entries = [self._entries[i] for i in keep]
+        self._vectors = self._vectors[keep]
+
+    def _expire(self, ttl_hours: float, now: float) -> None:
+        oldest = now - ttl_hours * 3600
+        keep = [i for i, entry in enumerate(self._entries) if entry.stored_at >= oldest]
+        if len(keep) < len(self._entries):
+            metrics.inc("agent_answer_cache_evictions_total", len(self._entries) - len(keep), reason="ttl")
+            self._drop(keep)
+
+    def lookup(self, question: str, threshold: float, ttl_hours: float,
+               outcome: str = "hit") -> Tuple[CachedAnswer | None, float]:
+        """Find the most similar fresh answer at or above `threshold`, and its cosine similarity.
+
+        A match is counted as `outcome` ('hit', or 'seed' when it only seeds the run).
+        """
+        vector = question_vector(question)
+        entry, similarity = None, 0.0
+        with self._lock:
+            self._expire(ttl_hours, time.time())
+            if self._entries and vector.any():
+                similarities = self._vectors @ vector
+                best = int(np.argmax(similarities))
+                similarity = float(similarities[best])
+                if similarity >= threshold:
+                    entry = self._entries[best]
+                    entry.hits += 1
+                    entry.last_hit = time.time()
+        metrics.inc("agent_answer_cache_lookups_total", outcome=outcome if entry else "miss")
+        return entry, similarity
+
+    def store(self, answer: CachedAnswer, ttl_hours: float) -> None:
+        """Remember a completed run, replacing an earlier answer to the same question."""
+        vector = question_vector(answer.question)
+        if not vector.any():
+            return
+        with self._lock:
+            self._expire(ttl_hours, time.time())
+            keep = [i for i, entry in enumerate(self._entries) if entry.question != answer.question]
+            overflow = len(keep) + 1 - self.max_entries
+            if overflow > 0:
+                # Least recently used (stored or hit) go first
+                keep = sorted(sorted(keep, key=lambda i: self._entries[i].last_hit)[overflow:])
+                metrics.inc("agent_answer_cache_evictions_total", overflow, reason="capacity")
+            self._drop(keep)
+            self._entries.append(answer)
+            self._vectors = np.vstack([self._vectors, vector[None, :]])
+        metrics.inc("agent_answer_cache_stores_total")
+
+    def clear(self) -> None:
+        """Forget every answer."""
+        with self._lock:
+            self._drop([])
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit rate since start."""
+        lookups = {dict(key).get("outcome"): value for key, value in metrics.counter("agent_answer_cache_lookups_total").items()}
+        total = sum(lookups.values())
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "lookups": int(total),
+            "hits": int(lookups.get("hit", 0)),
+            "seeds": int(lookups.get("seed", 0)),
+            "hit_rate": round((lookups.get("hit", 0) + lookups.get("seed", 0)) / total, 4) if total else 0.0,
+        }
+
+
+_answer_cache: AnswerCache | None = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get or create the process-wide answer cache."""
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache()
+    return _answer_cache
@@ -1,16 +1,37 @@
 # mypy: disable - error - code = "no-untyped-def,misc"
+import asyncio
 import pathlib
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Response
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import fastapi.exceptions
 
-# Import LangGraph components
-from langgraph_sdk import get_client
-from agent.graph import graph
+from agent.answer_cache import get_answer_cache
+from agent.checkpointing import checkpoint_stats
+from agent.http_middleware import CompressionMiddleware, WireBytesMiddleware
+from agent.knowledge_index import get_knowledge_index, knowledge_index_enabled
+from agent.llm import get_llm
+from agent.metrics import metrics, prompt_cache_stats
+from agent.retention import retention_loop, retention_status
+from agent.static_assets import IMMUTABLE_CACHE, AssetManifest
+from agent.streaming import ARTIFACT_ROUTE, get_artifact_store
+from agent.warmup import status as warm_up_status, warm_up_server
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the warm-up and retention background tasks for the lifetime of the server."""
+    # Warm up in the background once the server is bound instead of on the first request
+    warm_up_task = asyncio.create_task(warm_up_server())
+    # Checkpoint retention passes, when AGENT_RETENTION_INTERVAL_MINUTES is set
+    retention_task = asyncio.create_task(retention_loop())
+    yield
+    warm_up_task.cancel()
+    retention_task.cancel()
+
 
 # Define the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware with more permissive settings for Docker
 app.add_middleware(
@@ -21,33 +42,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add health endpoint
+# Compress API responses, including run streams; the outer middleware counts bytes as sent
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(WireBytesMiddleware)
+
+# Add health endpoint (liveness)
 @app.get("/health")
 async def health():
     return {"status": "healthy", "service": "deep-research-app"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 503 until clients, connections and caches are warm."""
+    report = warm_up_status.as_dict()
+    return fastapi.responses.JSONResponse(report, status_code=200 if warm_up_status.ready else 503)
+
+@app.get("/knowledge-index/stats")
+async def knowledge_index_stats():
+    """Local knowledge index size and latency metrics."""
+    if not knowledge_index_enabled():
+        return {"enabled": False}
+    return {"enabled": True, **get_knowledge_index().stats()}
+
+@app.get("/answer-cache/stats")
+async def answer_cache_stats():
+    """Semantic answer cache size and hit rate."""
+    return get_answer_cache().stats()
+
+@app.get("/llm-pool/stats")
+async def llm_pool_stats():
+    """Quota, load and cooldown per Azure OpenAI deployment."""
+    return get_llm().pool.stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus-style metrics (LLM tokens, latency, retries per node and model)."""
+    return Response(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/prompt-cache/stats")
+async def prompt_cache_statistics():
+    """Prompt cache hit rate and latency per node."""
+    return prompt_cache_stats()
+
+@app.get("/checkpoints/stats")
+async def checkpoint_statistics():
+    """Checkpoint bytes (stored and uncompressed) and write latency per run."""
+    return checkpoint_stats.snapshot()
+
+@app.get("/checkpoints/retention")
+async def checkpoint_retention():
+    """Retention policy and the last pass (checkpoints and bytes reclaimed)."""
+    return retention_status()
+
+@app.get(ARTIFACT_ROUTE + "/{name}")
+async def serve_artifact(name: str):
+    """Images and code referenced from messages instead of inlined (see agent.streaming)."""
+    path = get_artifact_store().path(name)
+    if path is None:
+        raise fastapi.exceptions.HTTPException(status_code=404, detail="Artifact not found")
+    return fastapi.responses.FileResponse(path, headers={"Cache-Control": IMMUTABLE_CACHE, "ETag": f'"{name.split(".")[0][:20]}"'})
+
+# Frontend build and public assets, indexed once at startup (container path first, then development path)
+_container_frontend = pathlib.Path("/deps/frontend")
+_frontend_root = _container_frontend if _container_frontend.exists() else pathlib.Path(__file__).parent.parent.parent / "../frontend"
+frontend_assets = AssetManifest(_frontend_root / "dist")
+public_assets = AssetManifest(_frontend_root / "public")
+
 # Serve public assets like images
 @app.get("/{filename}")
-async def serve_public_assets(filename: str):
+async def serve_public_assets(request: Request, filename: str):
     """Serve public assets like images."""
     # Only serve known image extensions to avoid conflicts
-    allowed_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp'}
-    if not any(filename.endswith(ext) for ext in allowed_extensions):
-        # Not an image file, let other routes handle it
-        raise fastapi.exceptions.HTTPException(status_code=404, detail="File not found")
-    
-    container_public_path = pathlib.Path("/deps/frontend/public")
-    if container_public_path.exists():
-        file_path = container_public_path / filename
-    else:
-        # Development path
-        dev_public_path = pathlib.Path(__file__).parent.parent.parent / "frontend/public"
-        file_path = dev_public_path / filename
-    
-    if file_path.exists() and file_path.is_file():
-        return fastapi.responses.FileResponse(file_path)
-    else:
+    allowed_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp')
+    asset = public_assets.get(filename) if filename.endswith(allowed_extensions) else None
+    if asset is None:
         raise fastapi.exceptions.HTTPException(status_code=404, detail="File not found")
+    return public_assets.response(request, asset)
 
 # Redirect root to frontend
 @app.get("/")
@@ -58,89 +128,12 @@ async def root():
 # Add threads endpoint
 
 
-
-def create_frontend_router(build_dir="../frontend/dist"):
-    """Creates a router to serve the React frontend.
-
-    Args:
-        build_dir: Path to the React build directory relative to this file.
-
-    Returns:
-        A Starlette application serving the frontend.
-    """
-    # Check if we're in a Docker container and use the container path
-    container_build_path = pathlib.Path("/deps/frontend/dist")
-    container_public_path = pathlib.Path("/deps/frontend/public")
-    if container_build_path.exists():
-        build_path = container_build_path
-        public_path = container_public_path
-    else:
-        build_path = pathlib.Path(__file__).parent.parent.parent / build_dir
-        public_path = pathlib.Path(__file__).parent.parent.parent / "frontend/public"
-    
-    static_files_path = build_path / "assets"  # Vite uses 'assets' subdir
-
-    if not build_path.is_dir() or not (build_path / "index.html").is_file():
-        print(
-            f"WARN: Frontend build directory not found or incomplete at {build_path}. Serving frontend will likely fail."
-        )
-        # Return a dummy router if build isn't ready
-        from starlette.routing import Route
-
-        async def dummy_frontend(request):
-            return Response(
-                "Frontend not built. Run 'npm run build' in the frontend directory.",
-                media_type="text/plain",
-                status_code=503,
-            )
-
-        return Route("/{path:path}", endpoint=dummy_frontend)
-
-    react = FastAPI(openapi_url="")
-    
-    # Mount static assets from Vite build
-    react.mount(
-        "/assets", StaticFiles(directory=static_files_path), name="static_assets"
-    )
-    
-    # Mount public assets (images, etc.) at root level
-    if public_path.exists():
-        react.mount(
-            "/", StaticFiles(directory=public_path, html=False), name="public_assets"
-        )
-
-    @react.get("/{path:path}")
-    async def handle_catch_all(request: Request, path: str):
-        fp = build_path / path
-        if not fp.exists() or not fp.is_file():
-            fp = build_path / "index.html"
-        return fastapi.responses.FileResponse(fp)
-
-    return react
-
-
-# Add frontend routes directly to the main app instead of mounting
-frontend_router = create_frontend_router()
-
 # Add the frontend routes to the main app
 @app.get("/app/{path:path}")
 async def serve_frontend(request: Request, path: str):
     """Serve the React frontend files."""
-    # Check if we're in a Docker container and use the container path
-    container_build_path = pathlib.Path("/deps/frontend/dist")
-    if container_build_path.exists():
-        build_path = container_build_path
-    else:
-        build_path = pathlib.Path(__file__).parent.parent.parent / "../frontend/dist"
-    
-    # Handle root path
-    if path == "" or path == "/":
-        fp = build_path / "index.html"
-    else:
-        fp = build_path / path
-        
-    # If file doesn't exist, serve index.html for SPA routing
-    if not fp.exists() or not fp.is_file():
-        fp = build_path / "index.html"
-        
-    return fastapi.responses.FileResponse(fp)
+    # Unknown paths (and the root) get index.html for SPA routing
+    asset = frontend_assets.get(path.strip("/")) or frontend_assets.get("index.html")
+    if asset is None:
+        raise fastapi.exceptions.HTTPException(status_code=404, detail="Frontend not built")
+    return frontend_assets.response(request, asset)
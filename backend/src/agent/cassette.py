@@ -0,0 +1,165 @@
+"""Record-and-replay of the graph's external I/O for deterministic performance runs.
+
+In record mode every LLM completion, search and scrape is captured with its real
+timing into a compact cassette (gzip-compressed JSON lines). In replay mode the
+same calls are answered from the cassette, with the original timings scaled by
+a configurable factor, so slow production runs can be profiled offline.
+
+Enable with environment variables:
+    AGENT_CASSETTE_MODE=record|replay
+    AGENT_CASSETTE_PATH=path/to/run.cassette.gz
+    AGENT_CASSETTE_TIME_SCALE=1.0   (0 replays instantly, 0.1 compresses 10x)
+"""
+import asyncio
+import functools
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Tuple
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a call has no recorded response."""
+
+
+class Cassette:
+    """Recorded responses keyed by call kind and request fingerprint."""
+
+    def __init__(self, path: str, mode: str, time_scale: float = 1.0):
+        """Open the cassette at `path` to "record" or "replay", scaling replayed timings by `time_scale`."""
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        # Exact fingerprint first; a "loose" fingerprint (e.g. ignoring the date in a prompt) as fallback
+        self._exact: Dict[Tuple[str, str], deque] = defaultdict(deque)
+        self._loose: Dict[Tuple[str, str], deque] = defaultdict(deque)
+        if mode == "replay":
+            self._load()
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @property
+    def replaying(self) -> bool:
+        """Whether calls are answered from the cassette."""
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                self._exact[(entry["kind"], entry["key"])].append(entry)
+                self._loose[(entry["kind"], entry["loose_key"])].append(entry)
+
+    def record(self, kind: str, key: str, loose_key: str, response: Any, elapsed: float) -> None:
+        """Append the response of a call and how long it took."""
+        entry = {"kind": kind, "key": key, "loose_key": loose_key, "elapsed": round(elapsed, 4), "response": response}
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        # Each write appends a gzip member; multi-member files read back as one stream
+        with self._lock, gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write(line)
+
+    def next(self, kind: str, key: str, loose_key: str) -> Dict[str, Any]:
+        """Take the next recorded entry for a call, matching `key` first and `loose_key` otherwise."""
+        with self._lock:
+            queue = self._exact.get((kind, key)) or self._loose.get((kind, loose_key))
+            if not queue:
+                raise CassetteMiss(f"No recorded {kind} response for {key}")
+            entry = queue.popleft()
+            # Keep both indexes consistent so an entry is only replayed once
+            for index, k in ((self._exact, (kind, entry["key"])), (self._loose, (kind, entry["loose_key"]))):
+                if entry in index[k]:
+                    index[k].remove(entry)
+            return entry
+
+    def delay(self, entry: Dict[str, Any]) -> float:
+        """Seconds to wait before replaying `entry`."""
+        return entry["elapsed"] * self.time_scale
+
+
+_cassette: Cassette | None = None
+_cassette_loaded = False
+
+
+def configure_cassette(path: str | None, mode: str = "record", time_scale: float = 1.0) -> Cassette | None:
+    """Install (or with `path=None` remove) the process-wide cassette."""
+    global _cassette, _cassette_loaded
+    _cassette = Cassette(path, mode, time_scale) if path else None
+    _cassette_loaded = True
+    return _cassette
+
+
+def get_cassette() -> Cassette | None:
+    """Return the active cassette, configuring it from the environment on first use."""
+    global _cassette_loaded
+    if not _cassette_loaded:
+        mode = os.getenv("AGENT_CASSETTE_MODE")
+        path = os.getenv("AGENT_CASSETTE_PATH")
+        if mode and path:
+            configure_cassette(path, mode, float(os.getenv("AGENT_CASSETTE_TIME_SCALE", "1.0")))
+        _cassette_loaded = True
+    return _cassette
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable short hash of JSON-serialisable request parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def recorded(
+    kind: str,
+    keys: Callable[..., Tuple[str, str]],
+    encode: Callable[[Any], Any] = lambda r: r,
+    decode: Callable[[Any], Any] = lambda r: r,
+):
+    """Decorate a sync or async call so it is captured or replayed by the active cassette.
+
+    `keys` receives the call's arguments and returns (exact key, loose key).
+    `encode`/`decode` convert the return value to and from JSON-compatible data.
+    Without an active cassette the wrapped function is called directly.
+    """
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                cassette = get_cassette()
+                if cassette is None:
+                    return await fn(*args, **kwargs)
+                key, loose_key = keys(*args, **kwargs)
+                if cassette.replaying:
+                    entry = cassette.next(kind, key, loose_key)
+                    await asyncio.sleep(cassette.delay(entry))
+                    return decode(entry["response"])
+                start = time.perf_counter()
+                result = await fn(*args, **kwargs)
+                cassette.record(kind, key, loose_key, encode(result), time.perf_counter() - start)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cassette = get_cassette()
+            if cassette is None:
+                return fn(*args, **kwargs)
+            key, loose_key = keys(*args, **kwargs)
+            if cassette.replaying:
+                entry = cassette.next(kind, key, loose_key)
+                time.sleep(cassette.delay(entry))
+                return decode(entry["response"])
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            cassette.record(kind, key, loose_key, encode(result), time.perf_counter() - start)
+            return result
+
+        return wrapper
+
+    return decorator
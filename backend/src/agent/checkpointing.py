@@ -0,0 +1,222 @@
+"""Compact checkpoint serialization and checkpoint write metrics.
+
+`CompactSerializer` keeps LangGraph's msgpack encoding and compresses payloads
+above MIN_COMPRESS_BYTES with zstd (the `zstandard` package, `pip install -e .[checkpoint]`)
+or zlib when it is not installed. Together with the write-once state fields
+(`AppendOnlyList` in agent.state) a checkpoint stores only what a super-step
+changed, compressed.
+
+`with_checkpoint_metrics` extends a saver class so every checkpoint and
+pending-writes put records stored bytes, uncompressed bytes and write latency,
+per run and as Prometheus metrics.
+
+Use it as the server's checkpointer by adding to langgraph.json:
+    "checkpointer": {"path": "./src/agent/checkpointing.py:make_checkpointer"}
+`make_checkpointer` opens a Postgres saver on DATABASE_URI (or POSTGRES_URL)
+and falls back to an in-memory saver for local development.
+Stored types are tagged (`msgpack.zstd`), so checkpoints written by the
+default serializer stay readable.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.metrics import metrics
+from agent.utils import get_run_id
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+# Smaller payloads (most channel versions and writes) are not worth a compression frame
+MIN_COMPRESS_BYTES = int(os.getenv("AGENT_CHECKPOINT_MIN_COMPRESS_BYTES", "512"))
+ZSTD_LEVEL = int(os.getenv("AGENT_CHECKPOINT_ZSTD_LEVEL", "3"))
+ZLIB_LEVEL = 6
+MAX_TRACKED_RUNS = 512
+BYTES_BUCKETS = (256, 1e3, 4e3, 16e3, 64e3, 256e3, 1e6, 4e6, 16e6)
+WRITE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("agent_checkpoint_bytes_total", "Checkpoint bytes written, after compression (stored) and before (raw).")
+metrics.describe("agent_checkpoint_put_bytes", "Stored bytes per checkpoint or pending-writes put.")
+metrics.describe("agent_checkpoint_put_seconds", "Latency of checkpoint and pending-writes puts, serialization included.")
+
+# Bytes serialized by the current put: [stored, raw]
+_put_bytes: contextvars.ContextVar[List[int] | None] = contextvars.ContextVar("checkpoint_put_bytes", default=None)
+
+
+class CompactSerializer(JsonPlusSerializer):
+    """msgpack serializer that compresses larger payloads with zstd (or zlib)."""
+
+    def __init__(self, *, compression: str | None = None, min_compress_bytes: int = MIN_COMPRESS_BYTES, **kwargs):
+        """Compress msgpack payloads of at least `min_compress_bytes` with `compression` (default zstd, else zlib)."""
+        super().__init__(**kwargs)
+        # "zstd", "zlib", or "none" (plain msgpack, still measured)
+        self.compression = compression or ("zstd" if ZSTD_AVAILABLE else "zlib")
+        if self.compression == "zstd" and not ZSTD_AVAILABLE:
+            raise ValueError("zstd compression needs the zstandard package: pip install -e .[checkpoint]")
+        self.min_compress_bytes = min_compress_bytes
+        # zstd contexts are not thread-safe; the saver may serialize from several threads
+        self._local = threading.local()
+
+    def _zstd(self) -> Tuple[Any, Any]:
+        if not hasattr(self._local, "zstd"):
+            self._local.zstd = (zstandard.ZstdCompressor(level=ZSTD_LEVEL), zstandard.ZstdDecompressor())
+        return self._local.zstd
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        """Serialize `obj`, compressing it when that makes it smaller, and count the bytes for the current put."""
+        type_, data = super().dumps_typed(obj)
+        raw_size = len(data)
+        if type_ == "msgpack" and raw_size >= self.min_compress_bytes and self.compression != "none":
+            if self.compression == "zstd":
+                compressed = self._zstd()[0].compress(data)
+            else:
+                compressed = zlib.compress(data, ZLIB_LEVEL)
+            if len(compressed) < raw_size:
+                type_, data = f"msgpack.{self.compression}", compressed
+        counter = _put_bytes.get()
+        if counter is not None:
+            counter[0] += len(data)
+            counter[1] += raw_size
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        """Deserialize compressed and plain payloads."""
+        type_, payload = data
+        if type_ == "msgpack.zstd":
+            if not ZSTD_AVAILABLE:
+                raise ValueError("Checkpoint is zstd-compressed but zstandard is not installed")
+            return super().loads_typed(("msgpack", self._zstd()[1].decompress(payload)))
+        if type_ == "msgpack.zlib":
+            return super().loads_typed(("msgpack", zlib.decompress(payload)))
+        return super().loads_typed(data)
+
+
+class CheckpointStats:
+    """Checkpoint bytes and write latency per run (most recent MAX_TRACKED_RUNS runs)."""
+
+    def __init__(self):
+        """Start without any tracked runs."""
+        self._lock = threading.Lock()
+        self._runs: OrderedDict[str, Dict[str, float]] = OrderedDict()
+
+    def record(self, run_key: str, kind: str, stored: int, raw: int, seconds: float) -> None:
+        """Add one checkpoint or pending-writes put to the run's totals."""
+        with self._lock:
+            run = self._runs.get(run_key)
+            if run is None:
+                run = {"checkpoints": 0, "writes": 0, "stored_bytes": 0, "raw_bytes": 0, "write_seconds": 0.0}
+                self._runs[run_key] = run
+                while len(self._runs) > MAX_TRACKED_RUNS:
+                    self._runs.popitem(last=False)
+            run["checkpoints" if kind == "checkpoint" else "writes"] += 1
+            run["stored_bytes"] += stored
+            run["raw_bytes"] += raw
+            run["write_seconds"] += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-run totals and the totals over all tracked runs."""
+        with self._lock:
+            runs = {k: dict(v, write_seconds=round(v["write_seconds"], 4)) for k, v in self._runs.items()}
+        stored = sum(r["stored_bytes"] for r in runs.values())
+        raw = sum(r["raw_bytes"] for r in runs.values())
+        return {
+            "runs": runs,
+            "totals": {
+                "runs": len(runs),
+                "stored_bytes": stored,
+                "raw_bytes": raw,
+                "compression_ratio": round(raw / stored, 2) if stored else None,
+                "mean_stored_bytes_per_run": round(stored / len(runs)) if runs else 0,
+            },
+        }
+
+
+checkpoint_stats = CheckpointStats()
+
+
+def _run_key(config: dict | None, metadata: dict | None = None) -> str:
+    run_id = (metadata or {}).get("run_id") or get_run_id(config)
+    return str(run_id or ((config or {}).get("configurable") or {}).get("thread_id") or "adhoc")
+
+
+@contextlib.contextmanager
+def _measure(kind: str, config: dict | None, metadata: dict | None = None):
+    if _put_bytes.get() is not None:
+        # An async put delegating to its sync variant is measured once, by the outer call
+        yield
+        return
+    counter = [0, 0]
+    token = _put_bytes.set(counter)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _put_bytes.reset(token)
+        stored, raw = counter
+        metrics.inc("agent_checkpoint_bytes_total", stored, kind=kind, size="stored")
+        metrics.inc("agent_checkpoint_bytes_total", raw, kind=kind, size="raw")
+        metrics.observe("agent_checkpoint_put_bytes", stored, buckets=BYTES_BUCKETS, kind=kind)
+        metrics.observe("agent_checkpoint_put_seconds", elapsed, buckets=WRITE_BUCKETS, kind=kind)
+        checkpoint_stats.record(_run_key(config, metadata), kind, stored, raw, elapsed)
+
+
+def with_checkpoint_metrics(saver_cls: type) -> type:
+    """Subclass `saver_cls` so its puts record bytes and latency.
+
+    Bytes are counted by `CompactSerializer`; with another serializer only latency is recorded.
+    """
+
+    class MeasuredSaver(saver_cls):
+        def put(self, config, checkpoint, metadata, new_versions):
+            with _measure("checkpoint", config, metadata):
+                return super().put(config, checkpoint, metadata, new_versions)
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            with _measure("checkpoint", config, metadata):
+                return await super().aput(config, checkpoint, metadata, new_versions)
+
+        def put_writes(self, config, writes, task_id, task_path=""):
+            with _measure("writes", config):
+                return super().put_writes(config, writes, task_id, task_path)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            with _measure("writes", config):
+                return await super().aput_writes(config, writes, task_id, task_path)
+
+    MeasuredSaver.__name__ = MeasuredSaver.__qualname__ = f"Measured{saver_cls.__name__}"
+    return MeasuredSaver
+
+
+@contextlib.asynccontextmanager
+async def make_checkpointer():
+    """Checkpointer for the LangGraph server: Postgres when configured, in-memory otherwise."""
+    serde = CompactSerializer()
+    conn_string = os.getenv("DATABASE_URI") or os.getenv("POSTGRES_URL")
+    if conn_string:
+        try:
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        except ImportError as e:
+            raise ImportError("The Postgres checkpointer needs langgraph-checkpoint-postgres: pip install -e .[checkpoint]") from e
+        async with with_checkpoint_metrics(AsyncPostgresSaver).from_conn_string(conn_string, serde=serde) as saver:
+            await saver.setup()
+            logger.info("Postgres checkpointer with %s compression", serde.compression)
+            yield saver
+    else:
+        logger.info("In-memory checkpointer with %s compression", serde.compression)
+        yield with_checkpoint_metrics(InMemorySaver)(serde=serde)
@@ -18,7 +18,35 @@ class Configuration(BaseModel):
     reflection_model: str = Field(
         default="o3",
         metadata={
-            "description": "The name of the Azure OpenAI o3 model to use for reflection."
+            "description": "The name of the Azure OpenAI model for the first reflection pass of the cascade (a fast model, or o3 at low effort)."
+        },
+    )
+
+    reflection_effort: str = Field(
+        default="low",
+        metadata={
+            "description": "Reasoning effort of the first reflection pass when reflection_model is an o-series model. Options: 'low', 'medium', 'high'."
+        },
+    )
+
+    reflection_cascade: bool = Field(
+        default=True,
+        metadata={
+            "description": "Run reflection on reflection_model first and escalate to reasoning_model at high effort only on low confidence or conflicting evidence. When disabled, every reflection runs on reasoning_model at high effort."
+        },
+    )
+
+    reflection_escalation_confidence: float = Field(
+        default=0.7,
+        metadata={
+            "description": "Escalate the reflection when the first pass reports a confidence (0-1) below this threshold."
+        },
+    )
+
+    reflection_escalate_on_conflict: bool = Field(
+        default=True,
+        metadata={
+            "description": "Escalate the reflection when the first pass reports conflicting evidence between sources."
         },
     )
 
@@ -34,7 +62,166 @@ class Configuration(BaseModel):
         metadata={
             "description": "The name of the Azure OpenAI o3 model to use for reasoning and reflection."
         },
-    )    # Web research settings
+    )
+
+    stream_llm_calls: bool = Field(
+        default=False,
+        metadata={
+            "description": "Stream LLM completions so time-to-first-token is measured; without streaming it equals wall time."
+        },
+    )
+
+    run_deadline_seconds: float = Field(
+        default=1200.0,
+        metadata={
+            "description": "Latency budget of a run; LLM call deadlines are capped by what is left of it (see agent.deadlines). 0 disables it."
+        },
+    )
+
+    llm_timeout_seconds: float = Field(
+        default=120.0,
+        metadata={
+            "description": "Deadline of an LLM call (all attempts, retries and backoff) for nodes not listed in llm_node_timeouts."
+        },
+    )
+
+    llm_node_timeouts: str = Field(
+        default=(
+            "classify_question=20,history_summary=30,generate_query=45,web_research=45,branch_gap_check=20,"
+            "reflection=240,finalize_answer=300,report_generator=180,code_generator=120"
+        ),
+        metadata={
+            "description": "Per-node LLM call deadlines in seconds, as 'node=seconds' pairs separated by commas. Reflection and finalize_answer run on o3 at high effort and get minutes."
+        },
+    )
+
+    llm_hedge_after_seconds: float = Field(
+        default=8.0,
+        metadata={
+            "description": "Send a duplicate request for idempotent async LLM calls that have not answered after this long; the slower one is cancelled. 0 disables hedging."
+        },
+    )
+
+    llm_hedge_max_temperature: float = Field(
+        default=0.2,
+        metadata={
+            "description": "Only calls with at most this temperature are considered idempotent and hedged."
+        },
+    )
+
+    enable_profiling: bool = Field(
+        default=False,
+        metadata={
+            "description": "Profile every node of the run (sampled stacks, CPU vs wait time, allocations) into AGENT_PROFILE_DIR. Also enabled per request by the 'x-agent-profile: 1' header."
+        },
+    )
+
+    slim_stream: bool = Field(
+        default=True,
+        metadata={
+            "description": "Keep streamed state small: visualization images and executed code are stored as artifacts and referenced by URL, and message metadata carries trimmed sources."
+        },
+    )
+
+    research_route: str = Field(
+        default="auto",
+        metadata={
+            "description": "Research route. Options: 'auto' (classify each question), 'fast' (single search and answer), 'deep' (full research loop)."
+        },
+    )
+
+    route_classifier: str = Field(
+        default="heuristic",
+        metadata={
+            "description": "How 'auto' routing classifies questions. Options: 'heuristic' (local, no LLM call), 'llm' (the query generator model, falling back to the heuristic)."
+        },
+    )
+
+    incremental_reflection: bool = Field(
+        default=False,
+        metadata={
+            "description": "Check each web research branch's new summary for gaps on the query generator model as soon as it finishes and run its follow-up search right away, instead of waiting for the whole wave to reach reflection."
+        },
+    )
+
+    branch_follow_ups: int = Field(
+        default=1,
+        metadata={
+            "description": "Maximum number of follow-up searches a web research branch runs on its own in incremental reflection."
+        },
+    )
+
+    structured_output_repairs: int = Field(
+        default=1,
+        metadata={
+            "description": "Maximum number of query generator model calls that repair a structured reply which is malformed beyond local cleanup."
+        },
+    )
+
+    history_token_budget: int = Field(
+        default=3000,
+        metadata={
+            "description": "Token budget of the conversation history kept verbatim in prompts of multi-turn threads; older turns are folded into a rolling summary."
+        },
+    )
+
+    summarize_history: bool = Field(
+        default=True,
+        metadata={
+            "description": "Summarize turns that leave the history window on the query generator model (cached in the thread); when disabled, only the earlier user questions are kept."
+        },
+    )
+
+    reuse_evidence: bool = Field(
+        default=True,
+        metadata={
+            "description": "Answer search queries of follow-up turns from the thread's stored evidence (sources, passages and timestamps of earlier searches) when it covers them, searching only for the rest."
+        },
+    )
+
+    evidence_reuse_threshold: float = Field(
+        default=0.75,
+        metadata={
+            "description": "Share of a query's terms that stored evidence must cover to be reused instead of searching."
+        },
+    )
+
+    evidence_max_age_hours: float = Field(
+        default=24,
+        metadata={
+            "description": "Stored evidence older than this is searched again."
+        },
+    )
+
+    answer_cache_mode: str = Field(
+        default="off",
+        metadata={
+            "description": "Semantic answer cache for standalone questions. Options: 'off', 'answer' (return the cached report of a near-identical recent question), 'seed' (run, but reuse the cached evidence)."
+        },
+    )
+
+    answer_cache_threshold: float = Field(
+        default=0.9,
+        metadata={
+            "description": "Cosine similarity (0-1) a cached question must reach to match."
+        },
+    )
+
+    answer_cache_ttl_hours: float = Field(
+        default=6,
+        metadata={
+            "description": "Freshness window of cached answers; older answers are evicted."
+        },
+    )
+
+    merged_finalize: bool = Field(
+        default=True,
+        metadata={
+            "description": "Write the user-facing report and the code analysis decision in one structured-output call in finalize_answer; report_generator then only runs to fold in code analysis results."
+        },
+    )
+
+    # Web research settings
     use_web_research: bool = Field(
         default=True,
         metadata={
@@ -45,7 +232,28 @@ class Configuration(BaseModel):
     search_engine: str = Field(
         default="tavily",
         metadata={
-            "description": "Search engine to use for web research. Options: 'serpapi', 'tavily'."
+            "description": "Search engine to use for web research. Options: 'serpapi', 'tavily', 'local'."
+        },
+    )
+
+    knowledge_index_mode: str = Field(
+        default="off",
+        metadata={
+            "description": "How the local knowledge index of previously fetched pages is searched. Options: 'off', 'local_first' (live search only when the index has too few fresh pages), 'mixed' (merge fresh local pages with live results)."
+        },
+    )
+
+    knowledge_index_max_age_hours: float = Field(
+        default=168,
+        metadata={
+            "description": "Freshness window for local knowledge index results; older pages are ignored."
+        },
+    )
+
+    knowledge_index_ingest: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether pages fetched by live search or scraping are added to the local knowledge index (pruned by KNOWLEDGE_INDEX_MAX_AGE_DAYS and KNOWLEDGE_INDEX_MAX_PAGES)."
         },
     )
 
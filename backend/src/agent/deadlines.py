@@ -0,0 +1,120 @@
+"""Deadlines and hedging policy for LLM calls.
+
+A run gets a latency budget (`run_deadline_seconds`) when it starts. Every LLM
+call then gets a deadline of its own: the node's timeout (`llm_node_timeouts`,
+else `llm_timeout_seconds`) capped by what is left of the run's budget. The
+deadline bounds all attempts of the call, including retries and their backoff.
+Nodes that run out of time degrade rather than fail the run: web_research keeps
+its search results, reflection treats the research as sufficient, and
+finalize_answer answers with the findings gathered so far.
+
+Idempotent calls (temperature at most `llm_hedge_max_temperature`) that have
+not answered after `llm_hedge_after_seconds` are hedged: a duplicate request is
+sent and whichever answers first wins, the other one is cancelled. Hedging is
+off while a cassette records or replays, so cassettes stay one entry per call.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict
+
+from langchain_core.runnables import RunnableConfig
+
+from agent.cassette import get_cassette
+from agent.configuration import Configuration
+from agent.metrics import metrics
+from agent.utils import get_run_id
+
+# Calls made after the run budget is spent still get this long, so the run can end with an answer
+MIN_CALL_SECONDS = 15.0
+MAX_TRACKED_RUNS = 1024
+
+metrics.describe("llm_timeouts_total", "LLM calls that ran out of time, by scope (attempt timeout or call deadline).")
+metrics.describe("llm_hedges_total", "Hedged duplicate LLM requests sent, by node, model and winner.")
+
+
+class DeadlineExceeded(TimeoutError):
+    """An LLM call did not finish before its deadline; `usage` is its (error) usage record."""
+
+    def __init__(self, message: str, usage: Dict[str, Any] | None = None):
+        """Fail with `message`, keeping the call's usage record."""
+        super().__init__(message)
+        self.usage = usage
+
+
+@dataclass
+class CallPolicy:
+    """Deadline (on the monotonic clock) and hedge delay of one LLM call."""
+
+    deadline: float
+    hedge_after: float | None = None
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline (negative once it has passed)."""
+        return self.deadline - time.monotonic()
+
+
+# Run deadlines are looked up by run id, like the run spans of agent.tracing
+_run_deadlines: "OrderedDict[str, float]" = OrderedDict()
+_run_deadlines_lock = threading.Lock()
+
+
+def _run_key(config: RunnableConfig | None) -> str | None:
+    return get_run_id(config) or ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+def start_run_deadline(config: RunnableConfig | None, budget_seconds: float) -> None:
+    """Start the run's latency budget; a budget of 0 leaves the run without a deadline."""
+    key = _run_key(config)
+    if key is None:
+        return
+    with _run_deadlines_lock:
+        _run_deadlines.pop(key, None)
+        if budget_seconds > 0:
+            _run_deadlines[key] = time.monotonic() + budget_seconds
+            while len(_run_deadlines) > MAX_TRACKED_RUNS:
+                _run_deadlines.popitem(last=False)
+
+
+def end_run_deadline(config: RunnableConfig | None) -> None:
+    """Forget the run's latency budget once the run is over."""
+    key = _run_key(config)
+    with _run_deadlines_lock:
+        _run_deadlines.pop(key, None)
+
+
+def run_time_left(config: RunnableConfig | None) -> float | None:
+    """Seconds left of the run's budget, or None when the run has no deadline."""
+    key = _run_key(config)
+    with _run_deadlines_lock:
+        deadline = _run_deadlines.get(key)
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@lru_cache(maxsize=32)
+def parse_node_timeouts(spec: str) -> Dict[str, float]:
+    """'web_research=45,reflection=90' -> {'web_research': 45.0, 'reflection': 90.0}."""
+    timeouts = {}
+    for item in spec.split(","):
+        node, _, seconds = item.partition("=")
+        if node.strip() and seconds.strip():
+            timeouts[node.strip()] = float(seconds)
+    return timeouts
+
+
+def call_policy(node: str, config: RunnableConfig | None, kwargs: Dict[str, Any],
+                hedge: bool = True) -> CallPolicy:
+    """Deadline and hedge delay of a call from `node` with request `kwargs`."""
+    configurable = Configuration.from_runnable_config(config)
+    timeout = parse_node_timeouts(configurable.llm_node_timeouts).get(node, configurable.llm_timeout_seconds)
+    left = run_time_left(config)
+    if left is not None:
+        timeout = min(timeout, max(left, MIN_CALL_SECONDS))
+
+    hedge_after = configurable.llm_hedge_after_seconds
+    idempotent = kwargs.get("temperature", 1.0) <= configurable.llm_hedge_max_temperature
+    if not hedge or hedge_after <= 0 or hedge_after >= timeout or not idempotent or get_cassette() is not None:
+        hedge_after = None
+    return CallPolicy(deadline=time.monotonic() + timeout, hedge_after=hedge_after)
@@ -0,0 +1,76 @@
+"""Per-thread evidence store for follow-up turns.
+
+Every web_research branch records what it found for its query (the summary,
+its sources with a trimmed snippet, and when it was fetched) in `evidence` in
+thread state. When a follow-up turn generates its search queries, a query that
+earlier evidence of the thread already covers and that is still fresh is
+answered from the store; only the uncovered queries are searched again.
+Only entries from before the turn (`evidence_turn_start` in thread state) are
+candidates, so a turn never "reuses" its own searches.
+"""
+import time
+from typing import Any, Dict, List, Tuple
+
+from agent.metrics import metrics
+from agent.passage_ranker import query_terms
+
+# Snippets kept per stored source; the summary already carries the source excerpts
+EVIDENCE_SNIPPET_CHARS = 300
+
+metrics.describe("agent_evidence_queries_total", "Search queries of follow-up turns, by outcome (reused from thread evidence or searched).")
+
+
+def make_entry(query: str, summary: str, sources: List[Dict[str, Any]], run_id: str | None = None) -> Dict[str, Any]:
+    """Build the evidence of one searched query, for `evidence` in thread state."""
+    return {
+        "query": query,
+        "summary": summary,
+        "sources": [{**source, "snippet": (source.get("snippet") or "")[:EVIDENCE_SNIPPET_CHARS]} for source in sources],
+        "fetched_at": time.time(),
+        "run_id": run_id,
+    }
+
+
+def coverage(query: str, entry: Dict[str, Any]) -> float:
+    """Share of the query's terms found in the stored query or the titles of its sources."""
+    terms = set(query_terms(query))
+    if not terms:
+        return 0.0
+    known = set(query_terms(" ".join([entry["query"], *(s.get("label", "") for s in entry["sources"])])))
+    return len(terms & known) / len(terms)
+
+
+def find_evidence(
+    query: str,
+    entries: List[Dict[str, Any]],
+    threshold: float,
+    max_age_hours: float,
+) -> Dict[str, Any] | None:
+    """Return the best-covering fresh entry of `entries`, or None."""
+    oldest = time.time() - max_age_hours * 3600
+    best, best_score = None, threshold
+    for entry in entries:
+        if entry["fetched_at"] < oldest:
+            continue
+        score = coverage(query, entry)
+        if score >= best_score:
+            best, best_score = entry, score
+    return best
+
+
+def partition_queries(
+    queries: List[str],
+    entries: List[Dict[str, Any]],
+    threshold: float,
+    max_age_hours: float,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Split queries into those to search and the stored entries that answer the rest."""
+    to_search, reused = [], []
+    for query in queries:
+        entry = find_evidence(query, entries, threshold, max_age_hours)
+        if entry is None:
+            to_search.append(query)
+        elif entry not in reused:
+            reused.append(entry)
+        metrics.inc("agent_evidence_queries_total", outcome="searched" if entry is None else "reused")
+    return to_search, reused
@@ -5,26 +5,21 @@ import subprocess
 import sys
 import io
 import base64
+import importlib.util
+import logging
+import time
 from typing import Dict, Any, List
-from agent.tools_and_schemas import SearchQueryList, Reflection
+from agent.tools_and_schemas import FinalAnswer, SearchQueryList, Reflection, structured_output
 from dotenv import load_dotenv
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from langgraph.types import Send
 from langgraph.graph import StateGraph
 from langgraph.graph import START, END
 from langchain_core.runnables import RunnableConfig
-from openai import AzureOpenAI
-
-# Azure Container Apps dynamic sessions import
-try:
-    from langchain_azure_dynamic_sessions import SessionsPythonREPLTool
-    AZURE_SESSIONS_AVAILABLE = True
-except ImportError:
-    SessionsPythonREPLTool = None
-    AZURE_SESSIONS_AVAILABLE = False
 
 from agent.state import (
     OverallState,
+    OutputState,
     QueryGenerationState,
     ReflectionState,
     WebSearchState,
@@ -32,39 +27,84 @@ from agent.state import (
     CodeExecutorState,
     ReportGeneratorState,
 )
+from agent.answer_cache import CachedAnswer, get_answer_cache
 from agent.configuration import Configuration
+from agent.deadlines import DeadlineExceeded, end_run_deadline, start_run_deadline
+from agent.evidence import make_entry, partition_queries
+from agent.history import build_research_topic
+from agent.incremental_reflection import format_gap_notes, new_queries, parse_gap_note, record_gap_note
+from agent.llm import get_llm, summarize_llm_usage
+from agent.profiling import profiled
+from agent.reflection_cascade import (
+    ReflectionVerdict,
+    escalation_reason,
+    is_reasoning_model,
+    record_pass,
+    summarize_passes,
+    to_verdict,
+)
+from agent.routing import (
+    ROUTES,
+    RouteDecision,
+    classify_heuristic,
+    count_route,
+    latest_question,
+    needs_conversation,
+    parse_route,
+    record_route,
+)
+from agent.streaming import emit_progress, slim_code_result, slim_sources
+from agent.structured_outputs import parse_structured, structured_chat
+from agent.tracing import span, traced_node
 from agent.prompts import (
+    build_prompt,
     get_current_date,
     query_writer_instructions,
+    query_writer_context,
     web_searcher_instructions,
+    web_searcher_context,
     reflection_instructions,
+    reflection_context,
+    branch_gap_instructions,
+    branch_gap_context,
     answer_instructions,
+    answer_context,
+    final_report_instructions,
+    route_classifier_instructions,
+    route_classifier_context,
+    history_summary_instructions,
+    history_summary_context,
+    quick_answer_instructions,
+    quick_answer_context,
     code_generator_instructions,
+    code_generator_context,
     code_executor_instructions,
     report_generator_instructions,
+    report_generator_context,
 )
 from agent.utils import (
     get_citations,
     get_research_topic,
     insert_citation_markers,
+    get_run_id,
     resolve_urls,
+    rewrite_source_urls,
 )
 from agent.web_research import enhance_ai_research_with_real_data
 
 load_dotenv()
 
-if os.getenv("AZURE_OPENAI_API_KEY") is None:
-    raise ValueError("AZURE_OPENAI_API_KEY is not set")
+logger = logging.getLogger(__name__)
 
-# Azure OpenAI client
-openai_client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-)
+# Azure Container Apps dynamic sessions; imported on first use, it is slow to import
+AZURE_SESSIONS_AVAILABLE = importlib.util.find_spec("langchain_azure_dynamic_sessions") is not None
+
+# Azure OpenAI clients are created on first use by get_llm(), which raises if AZURE_OPENAI_API_KEY is not set
 
 # Global Azure Sessions tool instance
 _azure_sessions_tool = None
+# Set by resolve_sandbox_backend() when the warm-up probe of Azure sessions failed
+_azure_sessions_unavailable = False
 
 def _is_actual_python_code(code_content: str) -> bool:
     """Validate that the provided content is actual executable Python code."""
@@ -121,35 +161,288 @@ def get_azure_sessions_tool(pool_management_endpoint: str = None):
         raise ValueError("Azure Pool Management Endpoint not configured. Set AZURE_POOL_MANAGEMENT_ENDPOINT environment variable.")
     
     if _azure_sessions_tool is None:
+        from langchain_azure_dynamic_sessions import SessionsPythonREPLTool
+
+        # No connection test here: this runs on the request path, the probe happens during warm-up
         try:
-            # Try to create the tool without explicit credentials first (for public endpoints)
             _azure_sessions_tool = SessionsPythonREPLTool(
                 pool_management_endpoint=pool_management_endpoint
             )
-            # Test the connection with a simple operation
-            test_result = _azure_sessions_tool.execute("print('Connection test successful')")
-            print(f"✅ Azure Container Apps sessions connected successfully")
-            
-        except Exception as auth_error:
-            print(f"⚠️  Azure sessions authentication failed: {str(auth_error)}")
-            print("   This may be normal for public endpoints. Trying without authentication...")
-            
-            # For public endpoints that don't require authentication,
-            # we might need to handle this differently
-            try:
-                # Try creating with minimal configuration
-                _azure_sessions_tool = SessionsPythonREPLTool(
-                    pool_management_endpoint=pool_management_endpoint
-                )
-                print(f"✅ Azure Container Apps sessions initialized (public endpoint)")
-            except Exception as e:
-                print(f"❌ Failed to initialize Azure sessions: {str(e)}")
-                raise e
+            logger.info("Azure Container Apps sessions initialized")
+        except Exception as e:
+            logger.error("Failed to initialize Azure sessions: %s", e)
+            raise e
     
     return _azure_sessions_tool
 
 
+def resolve_sandbox_backend(probe: bool = True) -> str:
+    """Create and probe the Azure sessions tool once, off the request path.
+
+    When the probe fails, code_executor goes straight to the subprocess backend
+    instead of failing over on every request.
+    """
+    global _azure_sessions_unavailable
+    if not AZURE_SESSIONS_AVAILABLE or not os.getenv("AZURE_POOL_MANAGEMENT_ENDPOINT"):
+        return "subprocess"
+    try:
+        sessions_tool = get_azure_sessions_tool()
+        if probe:
+            sessions_tool.execute("print('Connection test successful')")
+        logger.info("Azure Container Apps sessions connected successfully")
+        _azure_sessions_unavailable = False
+        return "azure_sessions"
+    except Exception as e:
+        logger.warning("Azure sessions probe failed, code will run in a local subprocess: %s", e)
+        _azure_sessions_unavailable = True
+        return "subprocess"
+
+
+def _history_summarizer(configurable: Configuration, config: RunnableConfig, usage: List[Dict[str, Any]]):
+    """Return the summarizer of turns that left the history window, on the query generator model."""
+    def summarize(previous_summary: str, turns: str) -> str:
+        result = get_llm().chat(
+            "history_summary",
+            config,
+            model=configurable.query_generator_model,
+            messages=build_prompt(
+                history_summary_instructions,
+                history_summary_context,
+                previous_summary=previous_summary or "(none)",
+                turns=turns,
+            ),
+            temperature=0,
+            max_tokens=400,
+        )
+        usage.append(result.usage)
+        return result.content.strip()
+
+    return summarize
+
+
+def _research_topic(state: OverallState) -> str:
+    """Return the run's research topic, built once by classify_question (see agent.history)."""
+    return state.get("research_topic") or get_research_topic(state["messages"])
+
+
 # Nodes
+def check_answer_cache(state: OverallState, config: RunnableConfig) -> OverallState:
+    """LangGraph node that answers a standalone question from a recent run of a near-identical one (see agent.answer_cache).
+
+    In 'seed' mode a match only hands its evidence to the run, which then reuses it in generate_query.
+    """
+    configurable = Configuration.from_runnable_config(config)
+    # First node of every run: LLM call deadlines count down from here (see agent.deadlines)
+    start_run_deadline(config, configurable.run_deadline_seconds)
+    # Where this turn's research starts in the thread's append-only lists (see agent.evidence)
+    turn_start = {
+        "results_turn_start": len(state.get("web_research_result", [])),
+        "evidence_turn_start": len(state.get("evidence", [])),
+    }
+    if configurable.answer_cache_mode not in ("answer", "seed") or len(state["messages"]) > 1:
+        return {"answer_cache": {}, **turn_start}
+    started = time.time()
+    question = latest_question(state["messages"])
+    outcome = "hit" if configurable.answer_cache_mode == "answer" else "seed"
+    cached, similarity = get_answer_cache().lookup(
+        question, configurable.answer_cache_threshold, configurable.answer_cache_ttl_hours, outcome
+    )
+    if cached is None:
+        return {"answer_cache": {"outcome": "miss", "similarity": round(similarity, 4)}, **turn_start}
+
+    summary = {
+        "outcome": outcome,
+        "similarity": round(similarity, 4),
+        "cached_question": cached.question,
+        "age_seconds": round(started - cached.stored_at, 1),
+    }
+    logger.info("Answer cache %s: '%s' (similarity %.3f)", summary["outcome"], cached.question, similarity)
+    if summary["outcome"] == "seed":
+        # Seeded entries count as earlier evidence of the thread
+        return {
+            "answer_cache": summary,
+            "evidence": cached.evidence,
+            **turn_start,
+            "evidence_turn_start": turn_start["evidence_turn_start"] + len(cached.evidence),
+        }
+
+    emit_progress("check_answer_cache", "Answer Cache", "Answered from a recent run of a near-identical question.")
+    route = record_route({"route": "cached", "route_reason": "answer cache", "run_started_at": started})
+    return {
+        "answer_cache": summary,
+        "final_report": cached.final_report,
+        **turn_start,
+        "messages": [AIMessage(content=cached.final_report, additional_kwargs={**cached.metadata, "answer_cache": summary, "route": route})],
+    }
+
+
+def answered_from_cache(state: OverallState) -> str:
+    """Routing function that finishes cache hits and sends everything else to classify_question."""
+    return "store_answer" if state.get("answer_cache", {}).get("outcome") == "hit" else "classify_question"
+
+
+def store_answer(state: OverallState, config: RunnableConfig) -> OverallState:
+    """LangGraph node that remembers the answer to a standalone question in the answer cache."""
+    configurable = Configuration.from_runnable_config(config)
+    end_run_deadline(config)
+    if configurable.answer_cache_mode not in ("answer", "seed") or not state.get("final_report"):
+        return {}
+    questions = [m for m in state["messages"] if isinstance(m, HumanMessage)]
+    if len(questions) != 1 or state.get("answer_cache", {}).get("outcome") == "hit":
+        return {}
+    metadata = state["messages"][-1].additional_kwargs if isinstance(state["messages"][-1], AIMessage) else {}
+    get_answer_cache().store(
+        CachedAnswer(
+            question=latest_question(state["messages"]),
+            final_report=state["final_report"],
+            metadata={k: v for k, v in metadata.items() if k not in ("route", "answer_cache", "llm_usage")},
+            evidence=list(state.get("evidence", [])),
+        ),
+        configurable.answer_cache_ttl_hours,
+    )
+    return {}
+
+
+def classify_question(state: OverallState, config: RunnableConfig) -> OverallState:
+    """LangGraph node that picks the fast path or deep research for the question (see agent.routing)."""
+    configurable = Configuration.from_runnable_config(config)
+    started = time.time()
+    question = latest_question(state["messages"])
+    has_history = len(state["messages"]) > 1
+    usage = []
+    research_topic, history_summary = build_research_topic(
+        state["messages"],
+        configurable.history_token_budget,
+        state.get("history_summary"),
+        _history_summarizer(configurable, config, usage) if configurable.summarize_history else None,
+    )
+    decision = None
+    if configurable.research_route in ROUTES:
+        decision = RouteDecision(configurable.research_route, "set in configuration", "override")
+    else:
+        if configurable.route_classifier == "llm":
+            try:
+                result = get_llm().chat(
+                    "classify_question",
+                    config,
+                    model=configurable.query_generator_model,
+                    messages=build_prompt(
+                        route_classifier_instructions,
+                        route_classifier_context,
+                        research_topic=research_topic,
+                        question=question,
+                    ),
+                    temperature=0,
+                    max_tokens=60,
+                )
+                usage.append(result.usage)
+                decision = parse_route(result.content)
+            except Exception as e:
+                logger.warning("Route classifier failed, using the heuristic: %s", e)
+            # quick_answer searches the question as it is, which a follow-up cannot be
+            if decision and decision.route == "fast" and needs_conversation(question, has_history):
+                decision = RouteDecision("deep", "follow-up needing the conversation", decision.classifier)
+        decision = decision or classify_heuristic(question, has_history)
+
+    count_route(decision)
+    emit_progress(
+        "classify_question",
+        "Planning",
+        "Simple question, answering from a single search." if decision.route == "fast" else "Starting in-depth research.",
+        route=decision.route,
+    )
+    return {
+        "route": decision.route,
+        "route_reason": decision.reason,
+        "run_started_at": started,
+        "research_topic": research_topic,
+        "history_summary": history_summary,
+        # Thread state outlives the run; follow-up turns get their own research loops
+        "research_loop_count": 0,
+        "llm_usage": usage,
+    }
+
+
+def route_question(state: OverallState) -> str:
+    """Routing function that sends simple questions to quick_answer and the rest to the research loop."""
+    return "quick_answer" if state.get("route") == "fast" else "generate_query"
+
+
+async def quick_answer(state: OverallState, config: RunnableConfig) -> OverallState:
+    """LangGraph node for the fast path: one search and one answer-and-report call on the answer model."""
+    configurable = Configuration.from_runnable_config(config)
+    question = latest_question(state["messages"])
+    research_topic = _research_topic(state)
+
+    search_results, sources_gathered = "", []
+    if configurable.use_web_research:
+        try:
+            found = await enhance_ai_research_with_real_data(
+                question,
+                "",
+                search_engine=configurable.search_engine,
+                knowledge_mode=configurable.knowledge_index_mode,
+                max_age_hours=configurable.knowledge_index_max_age_hours,
+                ingest=configurable.knowledge_index_ingest,
+            )
+            search_results = found["enhanced_content"]
+            for source in found["sources"]:
+                sources_gathered.append({
+                    "label": source["title"][:50] + "..." if len(source["title"]) > 50 else source["title"],
+                    "short_url": source["url"],
+                    "value": source["url"],
+                    "snippet": source["snippet"],
+                    "scraped_successfully": source.get("scraped_successfully", False),
+                })
+                search_results += f"\nURL: {source['url']}"
+        except Exception as e:
+            logger.warning("Error in quick search: %s", e)
+    emit_progress(
+        "web_research",
+        "Web Research",
+        f"Found {len(sources_gathered)} sources." if sources_gathered else "AI-based answer (no external sources)",
+        sources=len(sources_gathered),
+    )
+
+    result = await get_llm().achat(
+        "quick_answer",
+        config,
+        stream=configurable.stream_llm_calls,
+        model=configurable.answer_model,
+        messages=build_prompt(
+            quick_answer_instructions,
+            quick_answer_context,
+            research_topic=research_topic,
+            current_date=get_current_date(),
+            search_results=search_results.strip() or "No search results available.",
+        ),
+        temperature=0.2,
+        max_tokens=600,
+    )
+    emit_progress("quick_answer", "Finalizing Answer", "Composing and presenting the answer.")
+    content, unique_sources = rewrite_source_urls(result.content, sources_gathered)
+    metadata = {
+        "sources": slim_sources(unique_sources) if configurable.slim_stream else unique_sources,
+        "research_summary": {
+            "total_queries": 1 if configurable.use_web_research else 0,
+            "research_loops": 0,
+            "sources_found": len(unique_sources),
+            "research_steps": [{"step": 1, "type": "search", "description": f"Searched for: {question}", "status": "completed"}],
+        },
+        "report_type": "quick_answer",
+        "route": record_route(state),
+        "llm_usage": summarize_llm_usage(state.get("llm_usage", []) + [result.usage], get_run_id(config)),
+    }
+    return {
+        "final_report": content,
+        "messages": [AIMessage(content=content, additional_kwargs=metadata)],
+        "search_query": [question],
+        "web_research_result": [search_results] if search_results else [],
+        "sources_gathered": unique_sources,
+        "llm_usage": [result.usage],
+    }
+
+
 def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerationState:
     """LangGraph node that generates a search queries based on the User's question using Azure OpenAI."""
     configurable = Configuration.from_runnable_config(config)
@@ -157,61 +450,111 @@ def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerati
         state["initial_search_query_count"] = configurable.number_of_initial_queries
 
     current_date = get_current_date()
-    formatted_prompt = query_writer_instructions.format(
+    research_topic = _research_topic(state)
+    messages = build_prompt(
+        query_writer_instructions,
+        query_writer_context,
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
+        research_topic=research_topic,
         number_queries=state["initial_search_query_count"],
     )
 
-    completion = openai_client.chat.completions.create(
+    parsed, _, usage = structured_chat(
+        "generate_query",
+        config,
+        SearchQueryList,
+        repair_model=configurable.query_generator_model,
+        max_repairs=configurable.structured_output_repairs,
+        stream=configurable.stream_llm_calls,
         model=configurable.query_generator_model,
-        messages=[{"role": "user", "content": formatted_prompt}],
+        messages=messages,
         temperature=1.0,
         max_tokens=500,
     )
-    # Parse output (assuming output is a JSON list of queries)
-    import json
-    try:
-        queries = json.loads(completion.choices[0].message.content)
-    except Exception:
-        queries = [completion.choices[0].message.content]
-    return {"query_list": queries }
+    queries = [q for q in parsed.query if q.strip()][:state["initial_search_query_count"]] if parsed else []
+    if not queries:
+        # Searching for the question itself beats searching for malformed model output
+        logger.warning("Generate Query - no usable queries, searching for the question")
+        queries = [latest_question(state["messages"])]
+    emit_progress("generate_query", "Generating Search Queries", ", ".join(str(q) for q in queries), queries=len(queries))
+    update = {"query_list": queries, "research_topic": research_topic, "llm_usage": usage}
+
+    # Follow-up turns answer covered queries from the thread's evidence store (see agent.evidence)
+    earlier_evidence = state.get("evidence", [])[:state.get("evidence_turn_start", 0)]
+    if configurable.reuse_evidence and earlier_evidence:
+        to_search, reused = partition_queries(
+            queries,
+            earlier_evidence,
+            configurable.evidence_reuse_threshold,
+            configurable.evidence_max_age_hours,
+        )
+        if reused:
+            # Only this turn's results: summaries from earlier turns must still reach this turn's prompts
+            known = set(state.get("web_research_result", [])[state.get("results_turn_start", 0):])
+            emit_progress(
+                "generate_query",
+                "Reusing Evidence",
+                f"Reusing earlier findings for {len(queries) - len(to_search)} of {len(queries)} queries.",
+                reused=len(queries) - len(to_search),
+            )
+            update.update({
+                "query_list": to_search,
+                "search_query": [entry["query"] for entry in reused],
+                "web_research_result": list(dict.fromkeys(entry["summary"] for entry in reused if entry["summary"] not in known)),
+                "sources_gathered": [source for entry in reused for source in entry["sources"]],
+            })
+    return update
 
 
 def continue_to_web_research(state: QueryGenerationState):
     """LangGraph node that sends the search queries to the web research node.
 
     This is used to spawn n number of web research nodes, one for each search query.
+    When the thread's evidence already covers every query, research goes straight to reflection.
     """
+    if not state["query_list"]:
+        return "reflection"
     return [
-        Send("web_research", {"search_query": search_query, "id": int(idx)})
+        Send("web_research", {"search_query": search_query, "id": int(idx), "research_topic": state["research_topic"]})
         for idx, search_query in enumerate(state["query_list"])
     ]
 
 
-async def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
-    """LangGraph node that performs web research using Azure OpenAI with optional SerpAPI enhancement."""
-    configurable = Configuration.from_runnable_config(config)
-    formatted_prompt = web_searcher_instructions.format(
+async def _research_query(search_query: str, configurable: Configuration, config: RunnableConfig):
+    """Summarize one search query, enhanced with real web data when enabled; returns (text, sources, usage)."""
+    messages = build_prompt(
+        web_searcher_instructions,
+        web_searcher_context,
         current_date=get_current_date(),
-        research_topic=state["search_query"],
+        research_topic=search_query,
     )
     
-    completion = openai_client.chat.completions.create(
-        model=configurable.query_generator_model,
-        messages=[{"role": "user", "content": formatted_prompt}],
-        temperature=0,
-        max_tokens=1024,
-    )
-    ai_generated_text = completion.choices[0].message.content
+    try:
+        result = await get_llm().achat(
+            "web_research",
+            config,
+            stream=configurable.stream_llm_calls,
+            model=configurable.query_generator_model,
+            messages=messages,
+            temperature=0,
+            max_tokens=1024,
+        )
+        ai_generated_text, usage = result.content, result.usage
+    except DeadlineExceeded as e:
+        # A slow summary must not hold up the fan-out; the search results below still count
+        logger.warning("Web Research - summary of '%s' timed out, keeping the search results only", search_query)
+        ai_generated_text, usage = "", e.usage
       # Enhance with real web data if search engines are available and enabled
     sources_gathered = []
     if configurable.use_web_research:
         try:
             enhanced_result = await enhance_ai_research_with_real_data(
-                state["search_query"], 
+                search_query, 
                 ai_generated_text,
-                search_engine=configurable.search_engine
+                search_engine=configurable.search_engine,
+                knowledge_mode=configurable.knowledge_index_mode,
+                max_age_hours=configurable.knowledge_index_max_age_hours,
+                ingest=configurable.knowledge_index_ingest,
             )
             final_text = enhanced_result["enhanced_content"]
             
@@ -229,47 +572,174 @@ async def web_research(state: WebSearchState, config: RunnableConfig) -> Overall
             final_text = ai_generated_text
     else:
         final_text = ai_generated_text
-    
+    return final_text, sources_gathered, usage
+
+
+async def _check_branch_gap(research_topic: str, search_query: str, summary: str,
+                            configurable: Configuration, config: RunnableConfig):
+    """Gap check of one new summary on the cheap model; returns (GapNote or None, usage)."""
+    result = await get_llm().achat(
+        "branch_gap_check",
+        config,
+        model=configurable.query_generator_model,
+        messages=build_prompt(
+            branch_gap_instructions,
+            branch_gap_context,
+            research_topic=research_topic,
+            search_query=search_query,
+            summary=summary,
+        ),
+        temperature=0,
+        max_tokens=200,
+    )
+    return parse_gap_note(result.content), result.usage
+
+
+async def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
+    """LangGraph node that performs web research using Azure OpenAI with optional SerpAPI enhancement.
+
+    With `incremental_reflection` the branch checks its new summary for gaps and runs up to
+    `branch_follow_ups` follow-up searches itself, while the rest of the wave is still running.
+    """
+    configurable = Configuration.from_runnable_config(config)
+    query = state["search_query"]
+    final_text, sources_gathered, usage = await _research_query(query, configurable, config)
+    queries, results, usages, gap_notes = [query], [final_text], [usage], []
+    evidence = [make_entry(query, final_text, sources_gathered, get_run_id(config))]
+
+    if configurable.incremental_reflection and state.get("research_topic"):
+        for _ in range(configurable.branch_follow_ups):
+            try:
+                note, check_usage = await _check_branch_gap(state["research_topic"], query, final_text, configurable, config)
+            except Exception as e:
+                logger.warning("Branch gap check failed for '%s': %s", query, e)
+                break
+            usages.append(check_usage)
+            if note is None:
+                break
+            gap_notes.append(record_gap_note(query, note, get_run_id(config)))
+            if not note.follow_up_query:
+                break
+            logger.info("Web Research - follow-up within the wave: %s", note.follow_up_query)
+            query = note.follow_up_query
+            final_text, follow_up_sources, usage = await _research_query(query, configurable, config)
+            queries.append(query)
+            results.append(final_text)
+            usages.append(usage)
+            sources_gathered.extend(follow_up_sources)
+            evidence.append(make_entry(query, final_text, follow_up_sources, get_run_id(config)))
+
+    scraped = sum(1 for source in sources_gathered if source["scraped_successfully"])
+    labels = list(dict.fromkeys(source["label"] for source in sources_gathered if source["label"]))[:3]
+    emit_progress(
+        "web_research",
+        "Web Research",
+        f"Found {len(sources_gathered)} sources{f' ({scraped} analyzed)' if scraped else ''}. Related to: {', '.join(labels) or 'N/A'}."
+        if sources_gathered else "AI-based research (no external sources)",
+        sources=len(sources_gathered),
+        scraped=scraped,
+        follow_ups=len(queries) - 1,
+    )
     return {
         "sources_gathered": sources_gathered,
-        "search_query": [state["search_query"]],
-        "web_research_result": [final_text],
+        "search_query": queries,
+        "web_research_result": results,
+        "gap_notes": gap_notes,
+        "evidence": evidence,
+        "llm_usage": usages,
     }
 
 
+def _reflect(messages, model: str, effort: str, config: RunnableConfig, configurable: Configuration):
+    """One reflection call bound to `Reflection`; `reasoning_effort` is only sent to o-series models.
+
+    Returns (verdict, wall seconds of the reflection call, usage records including repairs).
+    """
+    parsed, result, usage = structured_chat(
+        "reflection",
+        config,
+        Reflection,
+        repair_model=configurable.query_generator_model,
+        max_repairs=configurable.structured_output_repairs,
+        stream=configurable.stream_llm_calls,
+        model=model,
+        messages=messages,
+        # max_tokens=100000,
+        # temperature=0.7,
+        **({"reasoning_effort": effort} if is_reasoning_model(model) else {}),
+    )
+    return to_verdict(parsed), result.usage["wall_seconds"], usage
+
+
+def _gap_notes_section(state: OverallState, config: RunnableConfig) -> str:
+    """Format the running gap analysis of incremental reflection for the reflection prompt, or ""."""
+    notes = format_gap_notes(state.get("gap_notes", []), get_run_id(config))
+    if not notes:
+        return ""
+    return f"\n\nRunning gap analysis per search (follow-ups listed were already searched):\n{notes}"
+
+
 def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
-    """LangGraph node that identifies knowledge gaps and generates potential follow-up queries using Azure OpenAI."""
+    """LangGraph node that identifies knowledge gaps and generates potential follow-up queries using Azure OpenAI.
+
+    With `reflection_cascade` the first pass runs on `reflection_model` at `reflection_effort`
+    and is repeated on `reasoning_model` at high effort only when it reports low confidence
+    or conflicting evidence (see agent.reflection_cascade).
+    """
     configurable = Configuration.from_runnable_config(config)
     state["research_loop_count"] = state.get("research_loop_count", 0) + 1
     reasoning_model = configurable.reasoning_model
-    current_date = get_current_date()
-    formatted_prompt = reflection_instructions.format(
-        current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
+    messages = build_prompt(
+        reflection_instructions,
+        reflection_context,
+        research_topic=_research_topic(state),
         summaries="\n\n---\n\n".join(state["web_research_result"]),
+        gap_notes=_gap_notes_section(state, config),
     )
-    completion = openai_client.chat.completions.create(
-        model=reasoning_model,
-        messages=[{"role": "user", "content": formatted_prompt}],
-        # max_tokens=100000,
-        # temperature=0.7,
-        reasoning_effort="high",
-    )
-    import json
+    usage, passes = [], []
     try:
-        result = json.loads(completion.choices[0].message.content)
-    except Exception:
-        result = {
-            "is_sufficient": False,
-            "knowledge_gap": "",
-            "follow_up_queries": [],
-        }
+        if configurable.reflection_cascade:
+            verdict, first_seconds, first_usage = _reflect(
+                messages, configurable.reflection_model, configurable.reflection_effort, config, configurable
+            )
+            usage += first_usage
+            reason = escalation_reason(
+                verdict, configurable.reflection_escalation_confidence, configurable.reflection_escalate_on_conflict
+            )
+            escalated_seconds = None
+            if reason:
+                logger.info("Reflection - escalating to %s (high): %s", reasoning_model, reason)
+                verdict, escalated_seconds, escalated_usage = _reflect(messages, reasoning_model, "high", config, configurable)
+                usage += escalated_usage
+            passes.append(record_pass(first_seconds, escalated_seconds, reason, get_run_id(config)))
+        else:
+            verdict, _, usage = _reflect(messages, reasoning_model, "high", config, configurable)
+    except DeadlineExceeded as e:
+        # Out of time (see agent.deadlines): answer from the research so far instead of failing the run
+        logger.warning("Reflection - timed out, finalizing with the research so far")
+        verdict = ReflectionVerdict(True, "", [], None, False, False)
+        if e.usage:
+            usage.append(e.usage)
+    follow_up_queries = verdict.follow_up_queries
+    if configurable.incremental_reflection:
+        follow_up_queries = new_queries(follow_up_queries, state["search_query"])
+    emit_progress(
+        "reflection",
+        "Reflection",
+        "Search successful, generating final answer." if verdict.is_sufficient
+        else f"Need more information, searching for {', '.join(map(str, follow_up_queries))}" if follow_up_queries
+        else "Need more information, continuing research...",
+        is_sufficient=verdict.is_sufficient,
+        follow_up_queries=len(follow_up_queries),
+    )
     return {
-        "is_sufficient": result.get("is_sufficient", False),
-        "knowledge_gap": result.get("knowledge_gap", ""),
-        "follow_up_queries": result.get("follow_up_queries", []),
+        "is_sufficient": verdict.is_sufficient,
+        "knowledge_gap": verdict.knowledge_gap,
+        "follow_up_queries": follow_up_queries,
         "research_loop_count": state["research_loop_count"],
         "number_of_ran_queries": len(state["search_query"]),
+        "llm_usage": usage,
+        "reflection_passes": passes,
     }
 
 
@@ -307,36 +777,111 @@ def evaluate_research(
                 {
                     "search_query": follow_up_query,
                     "id": state["number_of_ran_queries"] + int(idx),
+                    "research_topic": state.get("research_topic", ""),
                 },
             )
             for idx, follow_up_query in enumerate(state["follow_up_queries"])
         ]
 
 
-def finalize_answer(state: OverallState, config: RunnableConfig):
-    """LangGraph node that finalizes the research summary and determines if code analysis is needed."""
+def _parse_final_answer(content: str, model: str):
+    """Parse the structured finalize_answer reply; None when it is not valid FinalAnswer JSON."""
+    final_answer = parse_structured(FinalAnswer, content, "finalize_answer", model)
+    if final_answer is None:
+        logger.warning("Finalize Answer - structured output not parsed, recovering the report")
+    return final_answer
+
+
+def _report_from_reply(content: str) -> str | None:
+    """Recover the report from a finalize_answer reply whose JSON did not validate as a whole."""
+    start = content.find('"report"')
+    colon = content.find(":", start) if start >= 0 else -1
+    if colon < 0:
+        return None
+    try:
+        report, _ = json.JSONDecoder().raw_decode(content[colon + 1:].lstrip())
+    except json.JSONDecodeError:
+        # Cut off inside the report itself
+        return None
+    return report if isinstance(report, str) and report.strip() else None
+
+
+def _findings_report(state: OverallState) -> str:
+    """Build the fallback answer when finalize_answer runs out of time: this turn's research summaries as they are."""
+    summaries = state["web_research_result"][state.get("results_turn_start", 0):] or state["web_research_result"]
+    findings = "\n\n---\n\n".join(summaries) or "No research findings were gathered."
+    return (
+        f"The full answer on {latest_question(state['messages'])} could not be composed in time. "
+        f"These are the research findings gathered so far:\n\n{findings}"
+    )
+
+
+def _compose_answer(state: OverallState, config: RunnableConfig, merged: bool):
+    """Call the reasoning model for the answer; returns (content, usage, timed_out).
+
+    A merged call asks for a structured FinalAnswer, otherwise the answer carries
+    CODE_ANALYSIS_NEEDED markers. Out of time, the content is the research findings.
+    """
     configurable = Configuration.from_runnable_config(config)
-    reasoning_model = configurable.reasoning_model
-    current_date = get_current_date()
-    formatted_prompt = answer_instructions.format(
-        current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
+    messages = build_prompt(
+        final_report_instructions if merged else answer_instructions,
+        answer_context,
+        current_date=get_current_date(),
+        research_topic=_research_topic(state),
         summaries="\n---\n\n".join(state["web_research_result"]),
     )
-    completion = openai_client.chat.completions.create(
-        model=reasoning_model,
-        messages=[{"role": "user", "content": formatted_prompt}],
-        # temperature=0.4,
-        reasoning_effort="high",
-    )
-    content = completion.choices[0].message.content
+    try:
+        result = get_llm().chat(
+            "finalize_answer",
+            config,
+            stream=configurable.stream_llm_calls,
+            model=configurable.reasoning_model,
+            messages=messages,
+            # temperature=0.4,
+            reasoning_effort="high",
+            **({"response_format": structured_output(FinalAnswer)} if merged else {}),
+        )
+        return result.content, result.usage, False
+    except DeadlineExceeded as e:
+        # Out of time (see agent.deadlines): the run still ends with what research found
+        logger.warning("Finalize Answer - timed out, answering with the research findings")
+        return _findings_report(state), e.usage, True
+
+
+def finalize_answer(state: OverallState, config: RunnableConfig):
+    """LangGraph node that finalizes the research summary and determines if code analysis is needed.
+
+    With `merged_finalize` the answer is the user-facing report, written together with
+    the code analysis decision in one structured-output call; when no code analysis
+    follows, the run ends here without a separate report_generator call.
+    """
+    configurable = Configuration.from_runnable_config(config)
+    reasoning_model = configurable.reasoning_model
+    merged = configurable.merged_finalize and configurable.enable_report_generator
+    content, usage, timed_out = _compose_answer(state, config, merged)
+    usages = [usage]
     
     # Parse the response to extract code analysis decision
     code_analysis_needed = False
     analysis_rationale = ""
     analysis_type = "none"
-    
-    if "CODE_ANALYSIS_NEEDED:" in content:
+    final_answer = _parse_final_answer(content, reasoning_model) if merged and not timed_out else None
+    if merged and not timed_out and final_answer is None:
+        report = _report_from_reply(content)
+        if report is not None:
+            # The decision fields are lost; answer without code analysis
+            content = report
+        else:
+            logger.warning("Finalize Answer - no report in the structured reply, answering without structured output")
+            content, usage, timed_out = _compose_answer(state, config, merged=False)
+            usages.append(usage)
+
+    if final_answer is not None:
+        content = final_answer.report
+        code_analysis_needed = final_answer.code_analysis_needed
+        analysis_rationale = final_answer.analysis_rationale
+        analysis_type = final_answer.analysis_type
+    elif "CODE_ANALYSIS_NEEDED:" in content:
         lines = content.split('\n')
         main_content = []
         
@@ -359,11 +904,8 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
     if analysis_type != "none":
         print(f"   Analysis Type: {analysis_type}")
     
-    unique_sources = []
-    for source in state["sources_gathered"]:
-        if source.get("short_url") and source["short_url"] in content:
-            content = content.replace(source["short_url"], source["value"])
-            unique_sources.append(source)
+    emit_progress("finalize_answer", "Finalizing Answer", "Composing and presenting the final answer.")
+    content, unique_sources = rewrite_source_urls(content, state["sources_gathered"])
       # Create research steps for frontend display (metadata only, no message)
     research_steps = []
     search_queries = state.get("search_query", [])
@@ -387,24 +929,45 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
     
     # Store metadata for the final report (no message creation here)
     structured_data = {
-        "sources": unique_sources,
+        "sources": slim_sources(unique_sources) if configurable.slim_stream else unique_sources,
         "research_summary": {
             "total_queries": len(state.get("search_query", [])),
             "research_loops": state.get("research_loop_count", 0),
             "sources_found": len(unique_sources),
             "research_steps": research_steps
-        }
+        },
+        "llm_usage": summarize_llm_usage(state.get("llm_usage", []) + [u for u in usages if u], get_run_id(config)),
+        "reflection_cascade": summarize_passes(state.get("reflection_passes", []), get_run_id(config)),
     }
     
-    return {
-        # Don't create a message here - let report_generator handle final output
+    update = {
         "sources_gathered": unique_sources,
         "code_analysis_needed": code_analysis_needed,
         "analysis_rationale": analysis_rationale,
         "analysis_type": analysis_type,
         "finalize_metadata": structured_data,  # Store for report_generator
         "finalized_content": content,  # Store content for report_generator
+        "report_complete": False,
+        "llm_usage": [u for u in usages if u],
     }
+    # Merged mode: this answer is the report unless code analysis results have to be folded in;
+    # a timed-out run has no time left for report_generator either
+    if (merged or timed_out) and not (code_analysis_needed and configurable.enable_code_interpreter):
+        ui_metadata = {
+            **structured_data,
+            "has_visualizations": False,
+            "analysis_performed": False,
+            "report_type": "user_friendly",
+            "code_analysis_results": [],
+            "route": record_route(state),
+        }
+        update.update({
+            "final_report": content,
+            "messages": [AIMessage(content=content, additional_kwargs=ui_metadata)],
+            "report_complete": True,
+        })
+    # Otherwise don't create a message here - let report_generator handle final output
+    return update
 
 
 def code_generator(state: OverallState, config: RunnableConfig) -> OverallState:
@@ -428,7 +991,7 @@ def code_generator(state: OverallState, config: RunnableConfig) -> OverallState:
     
     # Get research content and analysis requirements
     research_content = "\n".join(state["web_research_result"])
-    research_topic = get_research_topic(state["messages"])
+    research_topic = _research_topic(state)
     analysis_type = state.get("analysis_type", "none")
     analysis_rationale = state.get("analysis_rationale", "")
     
@@ -442,7 +1005,9 @@ def code_generator(state: OverallState, config: RunnableConfig) -> OverallState:
     print(f"🤖 Generating {analysis_type} code based on finalize_answer decision...")
     
     # Use Azure OpenAI to generate the specific code requested
-    formatted_prompt = code_generator_instructions.format(
+    messages = build_prompt(
+        code_generator_instructions,
+        code_generator_context,
         research_topic=research_topic,
         research_content=research_content,
         analysis_type=analysis_type,
@@ -450,13 +1015,16 @@ def code_generator(state: OverallState, config: RunnableConfig) -> OverallState:
     )
     
     try:
-        completion = openai_client.chat.completions.create(
+        result = get_llm().chat(
+            "code_generator",
+            config,
+            stream=configurable.stream_llm_calls,
             model=configurable.code_interpreter_model,
-            messages=[{"role": "user", "content": formatted_prompt}],
+            messages=messages,
             temperature=0.1,
             max_tokens=2000,        )
         
-        python_code = completion.choices[0].message.content.strip()
+        python_code = result.content.strip()
         
         # Strip markdown formatting if present
         if "```python" in python_code:
@@ -489,12 +1057,14 @@ def code_generator(state: OverallState, config: RunnableConfig) -> OverallState:
             return {
                 "code_analysis_needed": True,
                 "generated_code": python_code,
+                "llm_usage": [result.usage],
             }
         else:
             print("⚠️  Generated content is not valid Python code")
             return {
                 "code_analysis_needed": False,
                 "generated_code": "",
+                "llm_usage": [result.usage],
             }
         
     except Exception as e:
@@ -524,11 +1094,11 @@ def code_executor(state: OverallState, config: RunnableConfig) -> OverallState:
     
     try:
         # Try to use Azure Container Apps dynamic sessions first
-        if configurable.use_azure_sessions and AZURE_SESSIONS_AVAILABLE:
-            return _execute_code_with_azure_sessions(python_code, configurable)
+        if configurable.use_azure_sessions and AZURE_SESSIONS_AVAILABLE and not _azure_sessions_unavailable:
+            update = _execute_code_with_azure_sessions(python_code, configurable)
         else:
             # Fallback to subprocess execution
-            return _execute_code_with_subprocess(python_code, configurable)
+            update = _execute_code_with_subprocess(python_code, configurable)
     
     except Exception as e:
         error_result = {
@@ -539,7 +1109,15 @@ def code_executor(state: OverallState, config: RunnableConfig) -> OverallState:
             "errors": str(e),
             "execution_method": "failed"
         }
-        return {"code_analysis_results": [error_result]}
+        update = {"code_analysis_results": [error_result]}
+
+    results = update["code_analysis_results"]
+    if configurable.slim_stream:
+        # Images go to the artifact store so state, checkpoints and stream events carry only URLs
+        results = [slim_code_result(result, inline_code=True) for result in results]
+    visualizations = sum(len(r.get("visualizations", [])) for r in results if isinstance(r, dict))
+    emit_progress("code_executor", "Code Analysis", f"Ran the analysis code, generated {visualizations} visualization(s).", visualizations=visualizations)
+    return {"code_analysis_results": results}
 
 
 def _execute_code_with_azure_sessions(python_code: str, configurable) -> OverallState:
@@ -564,7 +1142,8 @@ def _execute_code_with_azure_sessions(python_code: str, configurable) -> Overall
         print(f"🚀 Executing code in Azure Container Apps sandbox...")
         
         try:
-            execution_result = sessions_tool.execute(python_code)
+            with span("sandbox.execute", **{"sandbox.backend": "azure_sessions", "sandbox.code_bytes": len(python_code)}):
+                execution_result = sessions_tool.execute(python_code)
             print(f"✅ Code execution completed successfully")
         except Exception as exec_error:
             error_msg = str(exec_error)
@@ -597,7 +1176,12 @@ def _execute_code_with_subprocess(python_code: str, configurable) -> OverallStat
     
     try:
         # Execute the code
-        execution_result = _execute_python_code(python_code)
+        with span("sandbox.execute", **{"sandbox.backend": "subprocess", "sandbox.code_bytes": len(python_code)}) as exec_span:
+            execution_result = _execute_python_code(python_code)
+            exec_span.set_attributes({
+                "sandbox.success": bool(execution_result.get("success")),
+                "sandbox.visualizations": len(execution_result.get("visualizations", [])),
+            })
         
         analysis_result = {
             "code_executed": python_code,
@@ -697,24 +1281,33 @@ def report_generator(state: OverallState, config: RunnableConfig) -> OverallStat
         if finalized_content:
             return {
                 "final_report": finalized_content,
-                "messages": [AIMessage(content=finalized_content, additional_kwargs=finalize_metadata)],
+                "messages": [AIMessage(content=finalized_content, additional_kwargs={**finalize_metadata, "route": record_route(state)})],
             }
         else:
             return {"final_report": "Report generation failed - no content available"}
     
-    research_topic = get_research_topic(state["messages"])
+    research_topic = _research_topic(state)
     current_date = get_current_date()
+    code_results = state.get("code_analysis_results", [])
+    # Merged mode: finalize_answer already wrote the report; only code results are folded in here
+    merged_draft = state.get("finalized_content", "") if configurable.merged_finalize else ""
+    if merged_draft and not code_results:
+        return {
+            "final_report": merged_draft,
+            "messages": [AIMessage(content=merged_draft, additional_kwargs={
+                **state.get("finalize_metadata", {}), "report_type": "user_friendly", "route": record_route(state),
+            })],
+        }
     
     # Prepare research data (summarized)
     research_summary = {
-        "key_findings": state.get("web_research_result", []),
+        "key_findings": [merged_draft] if merged_draft else state.get("web_research_result", []),
         "total_sources": len(state.get("sources_gathered", [])),
         "research_completeness": "comprehensive" if state.get("research_loop_count", 0) > 1 else "focused"
     }
     
     # Prepare code analysis results (clean summary)
     code_analysis_summary = []
-    code_results = state.get("code_analysis_results", [])
     has_visualizations = False
     
     for result in code_results:
@@ -742,7 +1335,9 @@ def report_generator(state: OverallState, config: RunnableConfig) -> OverallStat
                 "relevance": "high" if source.get("snippet") else "medium"
             })
     
-    formatted_prompt = report_generator_instructions.format(
+    messages = build_prompt(
+        report_generator_instructions,
+        report_generator_context,
         research_topic=research_topic,
         research_data=json.dumps(research_summary, indent=2),
         code_results=json.dumps(code_analysis_summary, indent=2),
@@ -751,14 +1346,17 @@ def report_generator(state: OverallState, config: RunnableConfig) -> OverallStat
     )
     
     try:
-        completion = openai_client.chat.completions.create(
+        result = get_llm().chat(
+            "report_generator",
+            config,
+            stream=configurable.stream_llm_calls,
             model=configurable.report_generator_model,
-            messages=[{"role": "user", "content": formatted_prompt}],
+            messages=messages,
             temperature=0.2,
             max_tokens=3000,  # Reduced for cleaner output
         )
         
-        report_content = completion.choices[0].message.content
+        report_content = result.content
         
         # If there were visualizations created, add a note about them
         if has_visualizations:
@@ -769,16 +1367,20 @@ def report_generator(state: OverallState, config: RunnableConfig) -> OverallStat
             # Merge with existing metadata from finalize_answer
             **finalize_metadata,
             # Add report-specific metadata
-            "sources": state.get("sources_gathered", []),
+            "sources": slim_sources(state.get("sources_gathered", [])) if configurable.slim_stream else state.get("sources_gathered", []),
             "has_visualizations": has_visualizations,
             "analysis_performed": bool(code_analysis_summary),
             "report_type": "user_friendly",
-            "code_analysis_results": code_results  # Include full code results for visualization access
+            # Full code results for visualization access; by reference in the slim profile
+            "code_analysis_results": [slim_code_result(r) for r in code_results] if configurable.slim_stream else code_results,
+            "llm_usage": summarize_llm_usage(state.get("llm_usage", []) + [result.usage], get_run_id(config)),
+            "route": record_route(state),
         }
         
         return {
             "final_report": report_content,
             "messages": [AIMessage(content=report_content, additional_kwargs=ui_metadata)],
+            "llm_usage": [result.usage],
         }
         
     except Exception as e:
@@ -798,6 +1400,7 @@ def report_generator(state: OverallState, config: RunnableConfig) -> OverallStat
                 if result.get("insights"):
                     fallback_content += f"• {result['insights'][:200]}...\n"
         
+        record_route(state)
         return {
             "final_report": fallback_content,
             "messages": [AIMessage(content=f"Research completed with some limitations: {str(e)}\n\n{fallback_content}")]
@@ -923,6 +1526,10 @@ def should_generate_code(state: OverallState, config: RunnableConfig) -> str:
     """Routing function to determine if code generation is needed."""
     configurable = Configuration.from_runnable_config(config)
     
+    if state.get("report_complete"):
+        logger.info("Routing to store_answer: finalize_answer wrote the final report")
+        return "store_answer"
+
     if not configurable.enable_code_interpreter:
         return "report_generator"
     
@@ -957,24 +1564,41 @@ def should_execute_code(state: OverallState, config: RunnableConfig) -> str:
         return "report_generator"
 
 
+def _instrumented(node: str, fn, **trace_options):
+    """Wrap a node with tracing spans and opt-in profiling."""
+    return traced_node(node, **trace_options)(profiled(node)(fn))
+
+
 # Create our Agent Graph
-builder = StateGraph(OverallState, config_schema=Configuration)
-
-# Define the nodes we will cycle between
-builder.add_node("generate_query", generate_query)
-builder.add_node("web_research", web_research)
-builder.add_node("reflection", reflection)
-builder.add_node("finalize_answer", finalize_answer)
-builder.add_node("code_generator", code_generator)
-builder.add_node("code_executor", code_executor)
-builder.add_node("report_generator", report_generator)
-
-# Set the entrypoint as `generate_query`
-# This means that this node is the first one called
-builder.add_edge(START, "generate_query")
+builder = StateGraph(OverallState, config_schema=Configuration, output_schema=OutputState)
+
+# Define the nodes we will cycle between; a run starts at check_answer_cache and ends at store_answer (or a cache hit)
+builder.add_node("check_answer_cache", _instrumented("check_answer_cache", check_answer_cache, starts_run=True))
+builder.add_node("classify_question", _instrumented("classify_question", classify_question))
+builder.add_node("quick_answer", _instrumented("quick_answer", quick_answer))
+builder.add_node("generate_query", _instrumented("generate_query", generate_query))
+builder.add_node("web_research", _instrumented("web_research", web_research))
+builder.add_node("reflection", _instrumented("reflection", reflection))
+builder.add_node("finalize_answer", _instrumented("finalize_answer", finalize_answer))
+builder.add_node("code_generator", _instrumented("code_generator", code_generator))
+builder.add_node("code_executor", _instrumented("code_executor", code_executor))
+builder.add_node("report_generator", _instrumented("report_generator", report_generator))
+builder.add_node("store_answer", _instrumented("store_answer", store_answer, ends_run=True))
+
+# Set the entrypoint as `check_answer_cache`
+# Near-identical recent questions are answered from the cache, the rest is classified
+builder.add_edge(START, "check_answer_cache")
+builder.add_conditional_edges(
+    "check_answer_cache", answered_from_cache, ["classify_question", "store_answer"]
+)
+# Simple questions take the fast path, everything else the research loop
+builder.add_conditional_edges(
+    "classify_question", route_question, ["quick_answer", "generate_query"]
+)
+builder.add_edge("quick_answer", "store_answer")
 # Add conditional edge to continue with search queries in a parallel branch
 builder.add_conditional_edges(
-    "generate_query", continue_to_web_research, ["web_research"]
+    "generate_query", continue_to_web_research, ["web_research", "reflection"]
 )
 # Reflect on the web research
 builder.add_edge("web_research", "reflection")
@@ -984,7 +1608,7 @@ builder.add_conditional_edges(
 )
 # After finalizing answer, decide whether to generate code
 builder.add_conditional_edges(
-    "finalize_answer", should_generate_code, ["code_generator", "report_generator"]
+    "finalize_answer", should_generate_code, ["code_generator", "report_generator", "store_answer"]
 )
 # After code generation, decide whether to execute code
 builder.add_conditional_edges(
@@ -993,6 +1617,8 @@ builder.add_conditional_edges(
 # After code execution, generate the final report
 builder.add_edge("code_executor", "report_generator")
 # Final report generation ends the flow
-builder.add_edge("report_generator", END)
+builder.add_edge("report_generator", "store_answer")
+# Completed answers are remembered for near-identical questions
+builder.add_edge("store_answer", END)
 
 graph = builder.compile(name="azureai-deepsearch-agent")
@@ -0,0 +1,104 @@
+"""Token-budgeted conversation history for multi-turn threads.
+
+The research topic (the conversation as prompt text) is built once per run by
+the first node and kept in run state, instead of every node re-concatenating
+the whole thread including earlier full reports. Only the newest turns that
+fit `history_token_budget` are kept verbatim; older turns are folded into a
+rolling summary that is stored in the thread state (`history_summary`) and
+only extended with the turns that newly fell out of the window.
+"""
+import logging
+from typing import Any, Callable, Dict, List, Tuple
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+
+from agent.metrics import metrics
+
+HISTORY_TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+# Older user questions are kept this long in the extractive fallback summary
+EXTRACT_CHARS = 200
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("agent_history_topic_tokens", "Estimated tokens of the research topic built from the conversation per run.")
+metrics.describe("agent_history_summaries_total", "Rolling history summaries by method (cached, llm or extractive).")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token), enough for budgeting."""
+    return len(text) // 4
+
+
+def render_message(message: AnyMessage, max_tokens: int | None = None) -> str:
+    """One turn as prompt text; long assistant turns (earlier reports) are clipped to `max_tokens`."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if isinstance(message, AIMessage) and max_tokens is not None and estimate_tokens(content) > max_tokens:
+        content = content[:max_tokens * 4].rstrip() + " […]"
+    role = "User" if isinstance(message, HumanMessage) else "Assistant"
+    return f"{role}: {content}\n"
+
+
+def window_start(messages: List[AnyMessage], budget: int) -> int:
+    """Index of the oldest message kept verbatim; the newest message is always kept."""
+    used = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        if not isinstance(messages[i], (HumanMessage, AIMessage)):
+            continue
+        cost = estimate_tokens(render_message(messages[i], budget // 2))
+        if start < len(messages) and used + cost > budget:
+            break
+        used += cost
+        start = i
+    return start
+
+
+def extractive_summary(previous: str, turns: List[AnyMessage]) -> str:
+    """Summary without an LLM call: the earlier summary plus each folded user question."""
+    asked = [
+        render_message(m).removeprefix("User: ").strip()[:EXTRACT_CHARS]
+        for m in turns if isinstance(m, HumanMessage)
+    ]
+    lines = [previous] if previous else []
+    lines += [f"- The user asked: {question}" for question in asked]
+    return "\n".join(lines)
+
+
+def build_research_topic(
+    messages: List[AnyMessage],
+    budget: int,
+    previous: Dict[str, Any] | None = None,
+    summarize: Callable[[str, str], str] | None = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Build the windowed research topic and the updated rolling summary state.
+
+    `previous` is the thread's stored summary ({"covered": messages folded, "text": ...});
+    `summarize(previous_text, new_turns_text)` extends it, falling back to an extractive summary.
+    """
+    summary = dict(previous or {"covered": 0, "text": ""})
+    if len(messages) == 1:
+        topic = render_message(messages[0]).removeprefix("User: ").rstrip("\n")
+        return topic, summary
+
+    start = max(window_start(messages, budget), min(summary["covered"], len(messages) - 1))
+    folded = messages[summary["covered"]:start]
+    if folded:
+        new_turns = "".join(render_message(m, budget // 2) for m in folded)
+        method = "llm"
+        try:
+            text = summarize(summary["text"], new_turns) if summarize else None
+        except Exception as e:
+            logger.warning("History summary failed, keeping an extractive summary: %s", e)
+            text = None
+        if not text:
+            method = "extractive"
+            text = extractive_summary(summary["text"], folded)
+        summary = {"covered": start, "text": text}
+        metrics.inc("agent_history_summaries_total", method=method)
+    elif summary["text"]:
+        metrics.inc("agent_history_summaries_total", method="cached")
+
+    topic = f"Summary of the earlier conversation:\n{summary['text']}\n\n" if summary["text"] else ""
+    topic += "".join(render_message(m, budget // 2) for m in messages[start:] if isinstance(m, (HumanMessage, AIMessage)))
+    metrics.observe("agent_history_topic_tokens", estimate_tokens(topic), buckets=HISTORY_TOKEN_BUCKETS)
+    return topic, summary
@@ -0,0 +1,178 @@
+"""ASGI middleware for API responses: on-the-fly compression and bytes-on-the-wire metrics.
+
+Both wrap the LangGraph API routes as well as the custom routes, because
+langgraph-api applies the custom app's middleware to every request.
+
+Compression picks brotli (when the `brotli` package is installed) or gzip from
+Accept-Encoding. Streamed responses, including the `text/event-stream` run
+streams, are flushed after every chunk so events are not held back by the
+compressor. Responses that are already encoded (static assets) pass through.
+"""
+import re
+import time
+import zlib
+
+from agent.metrics import metrics
+from agent.static_assets import BROTLI_AVAILABLE, brotli, parse_accept_encoding
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/",
+    "application/javascript",
+    "application/x-ndjson",
+    "image/svg+xml",
+)
+MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+# Mid-range quality: close to the best ratio for JSON at a fraction of the CPU cost of 11
+BROTLI_QUALITY = 5
+
+# Routes whose response is one run's output, and routes that reload a thread
+ROUTE_GROUPS = (
+    ("run_stream", re.compile(r"^/(threads/[^/]+/)?runs(/[^/]+)?/(stream|wait|join)$")),
+    ("thread_state", re.compile(r"^/threads/[^/]+(/state(/.*)?|/history)?$")),
+)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7)
+
+metrics.describe("agent_http_response_bytes_total", "Response bytes sent on the wire (after compression) per route group and encoding.")
+metrics.describe("agent_run_wire_bytes", "Bytes on the wire per run stream or thread reload response.")
+metrics.describe("agent_run_stream_seconds", "Duration of run stream responses.")
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _choose_encoding(accept_encoding: str) -> str | None:
+    accepted = parse_accept_encoding(accept_encoding)
+    if BROTLI_AVAILABLE and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress `data` and flush, so the client can decode everything sent so far."""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """Compress JSON, text and event-stream responses with brotli or gzip."""
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        """Wrap `app`, leaving complete responses under `minimum_size` bytes uncompressed."""
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        """Serve the request, compressing the response when the client accepts it."""
+        encoding = _choose_encoding(_header(scope, b"accept-encoding")) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: _Compressor | None = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                media_type = headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = b"content-encoding" in headers or not media_type.startswith(COMPRESSIBLE_TYPES)
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                start, start_message = start_message, None
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    body = compressor.finish(body)
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start, "headers": headers})
+
+            body = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class WireBytesMiddleware:
+    """Count response bytes as sent to the client, per route group and encoding.
+
+    Place it outside `CompressionMiddleware` so the compressed size is counted.
+    """
+
+    def __init__(self, app):
+        """Wrap `app`."""
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Serve the request, counting the response bytes of run streams and thread reloads."""
+        group = None
+        if scope["type"] == "http":
+            group = next((name for name, pattern in ROUTE_GROUPS if pattern.match(scope["path"])), None)
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        sent = 0
+        encoding = "identity"
+        started = time.perf_counter()
+
+        async def counting_send(message):
+            nonlocal sent, encoding
+            if message["type"] == "http.response.start":
+                for key, value in message.get("headers", []):
+                    if key.lower() == b"content-encoding":
+                        encoding = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, counting_send)
+        finally:
+            metrics.inc("agent_http_response_bytes_total", sent, route=group, encoding=encoding)
+            metrics.observe("agent_run_wire_bytes", sent, buckets=BYTES_BUCKETS, route=group, encoding=encoding)
+            if group == "run_stream":
+                metrics.observe("agent_run_stream_seconds", time.perf_counter() - started)
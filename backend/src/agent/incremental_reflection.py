@@ -0,0 +1,69 @@
+"""Incremental reflection inside the web research branches.
+
+With `incremental_reflection`, every web_research branch checks its own new
+summary for gaps on the cheap query generator model as soon as it finishes,
+and runs the follow-up search right away, while the other branches of the
+same wave are still searching. The gap notes are kept in run state
+(`gap_notes`) and handed to the reflection node, which then only has to
+judge what is still open, and follow-ups already run are not searched again.
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from agent.metrics import metrics
+
+metrics.describe("agent_branch_gap_checks_total", "Per-branch gap checks in incremental reflection, by outcome (covered or follow_up).")
+
+
+@dataclass
+class GapNote:
+    """A branch gap check: whether the summary covers its query, and the follow-up search if not."""
+
+    covered: bool
+    gap: str
+    follow_up_query: str
+
+
+def parse_gap_note(content: str) -> GapNote | None:
+    """Read the branch gap check JSON; None when it is unusable."""
+    try:
+        answer = json.loads(content.strip().removeprefix("```json").removesuffix("```"))
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(answer, dict):
+        return None
+    follow_up = str(answer.get("follow_up_query") or "").strip()
+    covered = bool(answer.get("covered", not follow_up))
+    return GapNote(covered, str(answer.get("gap", "")), "" if covered else follow_up)
+
+
+def record_gap_note(query: str, note: GapNote, run_id: str | None = None) -> Dict[str, Any]:
+    """Count one gap check; returns its entry for `gap_notes` in run state."""
+    metrics.inc("agent_branch_gap_checks_total", outcome="follow_up" if note.follow_up_query else "covered")
+    return {"run_id": run_id, "query": query, "gap": note.gap, "follow_up_query": note.follow_up_query}
+
+
+def format_gap_notes(notes: List[Dict[str, Any]], run_id: str | None = None) -> str:
+    """Format the running gap analysis of this run, one line per search, for the reflection prompt."""
+    if run_id is not None:
+        notes = [n for n in notes if n.get("run_id") in (run_id, None)]
+    lines = []
+    for note in notes:
+        status = f"gap: {note['gap']}" if note["gap"] else "covered"
+        if note["follow_up_query"]:
+            status += f" (already searched: {note['follow_up_query']})"
+        lines.append(f"- {note['query']}: {status}")
+    return "\n".join(lines)
+
+
+def new_queries(queries: List[str], ran: List[str]) -> List[str]:
+    """Drop follow-up queries that a branch already searched."""
+    seen = {q.strip().lower() for q in ran}
+    fresh = []
+    for query in queries:
+        key = str(query).strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            fresh.append(query)
+    return fresh
@@ -0,0 +1,271 @@
+"""Persistent local full-text index of every page the agent has read.
+
+Pages returned by Tavily or scraped successfully are ingested into a SQLite FTS5
+corpus in the background, so later runs can answer from what was already
+fetched before (or alongside) paying for a live search. A page only matches a
+query when it contains most of the query's content words, and the writer
+prunes pages older than KNOWLEDGE_INDEX_MAX_AGE_DAYS or beyond
+KNOWLEDGE_INDEX_MAX_PAGES (oldest first).
+"""
+import contextlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List
+
+from agent.configuration import Configuration
+from agent.passage_ranker import query_terms, tokenize
+
+DEFAULT_INDEX_PATH = ".knowledge_index/knowledge.db"
+MAX_AGE_DAYS = float(os.getenv("KNOWLEDGE_INDEX_MAX_AGE_DAYS", "30"))
+MAX_PAGES = int(os.getenv("KNOWLEDGE_INDEX_MAX_PAGES", "10000"))
+# Pages written between two pruning passes
+PRUNE_EVERY = 256
+# Share of the query's content words a page must contain to count as a match
+MIN_TERM_COVERAGE = 0.6
+# Candidates fetched by bm25 per requested result, before the coverage filter
+CANDIDATES_PER_RESULT = 4
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(title, content);
+"""
+
+
+def term_coverage(terms: List[str], text: str) -> float:
+    """Share of `terms` that occur in `text`."""
+    words = set(tokenize(text))
+    return sum(1 for term in terms if term in words) / len(terms) if terms else 0.0
+
+
+class KnowledgeIndex:
+    """SQLite FTS5 corpus with a background writer thread.
+
+    `ingest` never blocks on disk I/O: pages are queued and written in batches
+    by a single writer thread. Searches use a per-thread read connection.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, batch_size: int = 64,
+                 max_age_days: float = MAX_AGE_DAYS, max_pages: int = MAX_PAGES):
+        """Open (or create) the index at `path`; the writer thread starts with the first ingest."""
+        self.path = path
+        self.batch_size = batch_size
+        self.max_age_days = max_age_days
+        self.max_pages = max_pages
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._queue: queue.Queue[Dict[str, Any]] = queue.Queue()
+        self._local = threading.local()
+        self._writer: threading.Thread | None = None
+        self._writer_lock = threading.Lock()
+        self._query_latencies_ms: deque = deque(maxlen=1000)
+        self._ingested = 0
+        self._pruned = 0
+        self._since_prune = PRUNE_EVERY
+        self._last_ingest_ms = 0.0
+
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def ingest(self, url: str, title: str, content: str, source: str, fetched_at: float | None = None) -> None:
+        """Queue a page for indexing; returns immediately."""
+        if not url or not content:
+            return
+        self._queue.put({
+            "url": url,
+            "title": title or "",
+            "content": content,
+            "source": source,
+            "fetched_at": fetched_at or time.time(),
+        })
+        self._ensure_writer()
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="knowledge-index-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            start = time.perf_counter()
+            try:
+                with conn:
+                    for page in batch:
+                        self._upsert(conn, page)
+                self._ingested += len(batch)
+                self._since_prune += len(batch)
+                if self._since_prune >= PRUNE_EVERY:
+                    self._since_prune = 0
+                    self._pruned += self.prune(conn)
+            except sqlite3.Error as e:
+                logger.warning("Knowledge index ingest failed: %s", e)
+            finally:
+                self._last_ingest_ms = (time.perf_counter() - start) * 1000
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, page: Dict[str, Any]) -> None:
+        row = conn.execute("SELECT id FROM pages WHERE url = ?", (page["url"],)).fetchone()
+        if row is None:
+            cursor = conn.execute(
+                "INSERT INTO pages (url, source, fetched_at) VALUES (?, ?, ?)",
+                (page["url"], page["source"], page["fetched_at"]),
+            )
+            page_id = cursor.lastrowid
+        else:
+            page_id = row[0]
+            conn.execute(
+                "UPDATE pages SET source = ?, fetched_at = ? WHERE id = ?",
+                (page["source"], page["fetched_at"], page_id),
+            )
+            conn.execute("DELETE FROM pages_fts WHERE rowid = ?", (page_id,))
+        conn.execute(
+            "INSERT INTO pages_fts (rowid, title, content) VALUES (?, ?, ?)",
+            (page_id, page["title"], page["content"]),
+        )
+
+    def prune(self, conn: sqlite3.Connection | None = None) -> int:
+        """Delete pages older than `max_age_days` and the oldest pages beyond `max_pages`; returns pages deleted."""
+        if conn is None:
+            with contextlib.closing(self._connect()) as conn:
+                return self.prune(conn)
+        cutoff = time.time() - self.max_age_days * 86400
+        # Ties on fetched_at are broken by id so both deletes pick the same pages
+        stale = """
+            SELECT id FROM pages WHERE fetched_at < ?
+            UNION SELECT id FROM (SELECT id FROM pages ORDER BY fetched_at DESC, id DESC LIMIT -1 OFFSET ?)
+        """
+        with conn:
+            conn.execute(f"DELETE FROM pages_fts WHERE rowid IN ({stale})", (cutoff, self.max_pages))
+            deleted = conn.execute(f"DELETE FROM pages WHERE id IN ({stale})", (cutoff, self.max_pages)).rowcount
+        return deleted
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until every queued page has been written (used by tests and shutdown)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+
+    def search(self, query: str, num_results: int = 10, max_age_hours: float | None = None) -> List[Dict[str, Any]]:
+        """Return the best matching pages in the same shape as live search results.
+
+        bm25 ranks pages containing any of the query's content words; only pages with at
+        least MIN_TERM_COVERAGE of those words are returned.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        min_fetched_at = time.time() - max_age_hours * 3600 if max_age_hours else 0.0
+
+        start = time.perf_counter()
+        try:
+            rows = self._reader().execute(
+                """
+                SELECT p.url, f.title, f.content, p.fetched_at, p.source,
+                       snippet(pages_fts, 1, '', '', '...', 48)
+                FROM pages_fts f JOIN pages p ON p.id = f.rowid
+                WHERE pages_fts MATCH ? AND p.fetched_at >= ?
+                ORDER BY bm25(pages_fts)
+                LIMIT ?
+                """,
+                (match, min_fetched_at, num_results * CANDIDATES_PER_RESULT),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Knowledge index query failed: %s", e)
+            rows = []
+        finally:
+            self._query_latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        rows = [row for row in rows if term_coverage(terms, f"{row[1]} {row[2]}") >= MIN_TERM_COVERAGE][:num_results]
+        return [
+            {
+                "title": title,
+                "url": url,
+                "snippet": snippet,
+                "content": content,
+                "position": i + 1,
+                "fetched_at": fetched_at,
+                "index_source": source,
+            }
+            for i, (url, title, content, fetched_at, source, snippet) in enumerate(rows)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size and latency metrics."""
+        size_bytes = sum(
+            os.path.getsize(p) for p in (self.path, f"{self.path}-wal") if os.path.exists(p)
+        )
+        documents = self._reader().execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        latencies = sorted(self._query_latencies_ms)
+        return {
+            "documents": documents,
+            "size_bytes": size_bytes,
+            "ingested": self._ingested,
+            "pruned": self._pruned,
+            "pending_ingest": self._queue.qsize(),
+            "last_ingest_batch_ms": round(self._last_ingest_ms, 2),
+            "queries": len(latencies),
+            "query_latency_p50_ms": round(latencies[len(latencies) // 2], 2) if latencies else 0.0,
+            "query_latency_p95_ms": round(latencies[int(len(latencies) * 0.95)], 2) if latencies else 0.0,
+        }
+
+
+_knowledge_index: KnowledgeIndex | None = None
+_knowledge_index_lock = threading.Lock()
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """Get or create the process-wide knowledge index."""
+    global _knowledge_index
+    if _knowledge_index is None:
+        with _knowledge_index_lock:
+            if _knowledge_index is None:
+                _knowledge_index = KnowledgeIndex(os.getenv("KNOWLEDGE_INDEX_PATH", DEFAULT_INDEX_PATH))
+    return _knowledge_index
+
+
+def knowledge_index_enabled() -> bool:
+    """Whether the index is in use: opened by a run, or switched on by the environment's configuration."""
+    if _knowledge_index is not None:
+        return True
+    configurable = Configuration.from_runnable_config()
+    return configurable.knowledge_index_mode != "off" or configurable.knowledge_index_ingest
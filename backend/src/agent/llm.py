@@ -0,0 +1,428 @@
+"""Instrumented wrapper around the Azure OpenAI chat completions API.
+
+Every call records prompt, completion, reasoning and cached tokens, wall time,
+time-to-first-token, retries and hedges per node and model, both in the process-wide
+metrics registry and as a usage record that the node returns into run state.
+Calls are routed through the deployment pool of `agent.llm_pool`, which picks
+a deployment of the requested model and fails over between deployments.
+"""
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import cache
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from agent.cassette import fingerprint, get_cassette, recorded
+from agent.deadlines import CallPolicy, DeadlineExceeded, call_policy
+from agent.llm_pool import (
+    DeploymentPool,
+    Lease,
+    estimate_request_tokens,
+    retry_after_seconds,
+)
+from agent.metrics import metrics, record_prompt_cache
+from agent.tracing import span
+from agent.utils import get_run_id
+
+
+@cache
+def retriable_errors() -> tuple:
+    """OpenAI errors worth retrying (resolved lazily, importing openai is slow)."""
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+metrics.describe("llm_requests_total", "LLM requests by node, model and final status.")
+metrics.describe("llm_retries_total", "LLM request retries after retriable errors.")
+metrics.describe("llm_completion_tokens_total", "Completion tokens generated by the LLM (including reasoning).")
+metrics.describe("llm_reasoning_tokens_total", "Reasoning tokens generated by reasoning models.")
+metrics.describe("llm_time_to_first_token_seconds", "Time until the first content token (equals wall time without streaming).")
+
+
+@dataclass
+class LLMResult:
+    """Text of a completion together with its usage record."""
+
+    content: str
+    usage: Dict[str, Any]
+    raw_usage: Any = field(default=None, repr=False)
+
+
+def _cassette_keys(self, stream: bool = False, timeout: float | None = None, **kwargs) -> Tuple[str, str]:
+    messages = kwargs.get("messages") or [{}]
+    # Loose key ignores per-call data (dates, topics) so a replay on another day still matches by node
+    # (the timeout is left out: it depends on how much of the run's deadline is left)
+    return fingerprint(kwargs), fingerprint(kwargs.get("model"), messages[0].get("content"))
+
+
+def _namespace(value: Any) -> Any:
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _namespace(v) for k, v in value.items()})
+    return value
+
+
+def _encode_call(result: Tuple[str, Any, float | None]) -> List[Any]:
+    content, usage, ttft = result
+    return [content, usage.model_dump() if hasattr(usage, "model_dump") else usage, ttft]
+
+
+def _decode_call(data: List[Any]) -> Tuple[str, Any, float | None]:
+    content, usage, ttft = data
+    cassette = get_cassette()
+    if ttft is not None and cassette is not None:
+        ttft *= cassette.time_scale
+    return content, _namespace(usage), ttft
+
+
+def _span_attributes(node: str, stream: bool, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    return {"agent.node": node, "gen_ai.request.model": kwargs.get("model"), "llm.stream": stream}
+
+
+def _usage_attributes(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "gen_ai.usage.input_tokens": record["prompt_tokens"],
+        "gen_ai.usage.output_tokens": record["completion_tokens"],
+        "llm.reasoning_tokens": record["reasoning_tokens"],
+        "llm.cached_tokens": record["cached_tokens"],
+        "llm.prompt_cache_hit": record["cached_tokens"] > 0,
+        "llm.ttft_seconds": record["ttft_seconds"],
+        "llm.retries": record["retries"],
+        "llm.hedged": record["hedged"],
+    }
+
+
+def _total_tokens(usage) -> int | None:
+    """Prompt plus completion tokens of a call, None when the API reported no usage."""
+    if usage is None:
+        return None
+    tokens = _token_details(usage)
+    return tokens["prompt_tokens"] + tokens["completion_tokens"]
+
+
+def _is_timeout(error: Exception) -> bool:
+    import openai
+
+    return isinstance(error, openai.APITimeoutError)
+
+
+def _left(deadline: float | None) -> float | None:
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _token_details(usage) -> Dict[str, int]:
+    completion_details = getattr(usage, "completion_tokens_details", None)
+    prompt_details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "reasoning_tokens": getattr(completion_details, "reasoning_tokens", None) or 0,
+        "cached_tokens": getattr(prompt_details, "cached_tokens", None) or 0,
+    }
+
+
+class InstrumentedLLM:
+    """Chat completions with usage, latency and retry accounting.
+
+    A retriable error fails over to another deployment of the model right away;
+    once every deployment failed, the call is retried with jittered backoff
+    until its deadline (see agent.deadlines), and slow idempotent async calls
+    are hedged with a duplicate request. The pool's
+    clients are created with ``max_retries=0`` so that retries are counted here
+    rather than hidden inside the SDK.
+    """
+
+    def __init__(self, pool: DeploymentPool, max_retries: int = 2, backoff_seconds: float = 1.0):
+        """Route calls through `pool`, retrying each at most `max_retries` times after `backoff_seconds`."""
+        self.pool = pool
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+    def _release(self, lease: Lease, error: BaseException, tried: List[str]) -> bool:
+        """Release a failed lease; True when the call should fail over to another deployment."""
+        import openai
+
+        if isinstance(error, retriable_errors()):
+            throttled = isinstance(error, openai.RateLimitError)
+            self.pool.release(lease, "throttled" if throttled else "error", retry_after=retry_after_seconds(error))
+            tried.append(lease.deployment.name)
+            if self.pool.untried(lease.deployment.model, tried):
+                metrics.inc("llm_pool_failovers_total", model=lease.deployment.model)
+                return True
+            return False
+        self.pool.release(lease, "cancelled" if isinstance(error, asyncio.CancelledError) else "rejected")
+        return False
+
+    def _routed(self, lease: Lease, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {**kwargs, "model": self.pool.deployment_name(lease.deployment, kwargs["model"])}
+
+    def _record(self, node: str, model: str, config: RunnableConfig | None, usage,
+                wall: float, ttft: float | None, retries: int, status: str, hedged: bool = False) -> Dict[str, Any]:
+        tokens = _token_details(usage)
+        record = {
+            "node": node,
+            "model": model,
+            "run_id": get_run_id(config),
+            **tokens,
+            "wall_seconds": round(wall, 4),
+            "ttft_seconds": round(ttft if ttft is not None else wall, 4),
+            "retries": retries,
+            "hedged": hedged,
+            "status": status,
+        }
+        metrics.inc("llm_requests_total", node=node, model=model, status=status)
+        if retries:
+            metrics.inc("llm_retries_total", retries, node=node, model=model)
+        if status == "ok":
+            record_prompt_cache(node, model, usage, wall)
+            metrics.inc("llm_completion_tokens_total", tokens["completion_tokens"], node=node, model=model)
+            metrics.inc("llm_reasoning_tokens_total", tokens["reasoning_tokens"], node=node, model=model)
+            metrics.observe("llm_time_to_first_token_seconds", record["ttft_seconds"], node=node, model=model)
+        return record
+
+    def _backoff(self, retries: int) -> float:
+        """Exponential backoff with equal jitter, so retries of concurrent calls spread out."""
+        delay = self.backoff_seconds * 2 ** (retries - 1)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _deadline_exceeded(self, node: str, config: RunnableConfig | None, model: str, start: float,
+                           retries: int) -> DeadlineExceeded:
+        metrics.inc("llm_timeouts_total", node=node, model=model, scope="deadline")
+        record = self._record(node, model, config, None, time.perf_counter() - start, None, retries, "timeout")
+        return DeadlineExceeded(f"{node}: LLM call did not finish within its deadline", record)
+
+    def chat(self, node: str, config: RunnableConfig | None = None, stream: bool = False, **kwargs) -> LLMResult:
+        """Create a chat completion for `node` within its deadline, retrying retriable errors."""
+        with span("llm.chat", **_span_attributes(node, stream, kwargs)) as llm_span:
+            result = self._chat(node, config, stream, **kwargs)
+            llm_span.set_attributes(_usage_attributes(result.usage))
+            return result
+
+    def _chat(self, node: str, config: RunnableConfig | None, stream: bool, **kwargs) -> LLMResult:
+        # A blocking call cannot be cancelled, so only async calls are hedged
+        policy = call_policy(node, config, kwargs, hedge=False)
+        start = time.perf_counter()
+        retries = 0
+        while True:
+            if policy.remaining() <= 0:
+                raise self._deadline_exceeded(node, config, kwargs["model"], start, retries)
+            try:
+                content, usage, ttft = self._invoke(stream, policy.remaining(), **kwargs)
+                break
+            except retriable_errors() as e:
+                if _is_timeout(e):
+                    metrics.inc("llm_timeouts_total", node=node, model=kwargs["model"], scope="attempt")
+                delay = self._backoff(retries + 1)
+                if delay >= policy.remaining() and _is_timeout(e):
+                    raise self._deadline_exceeded(node, config, kwargs["model"], start, retries) from e
+                if retries >= self.max_retries or delay >= policy.remaining():
+                    self._record(node, kwargs["model"], config, None, time.perf_counter() - start, None, retries, "error")
+                    raise
+                retries += 1
+                time.sleep(delay)
+            except Exception:
+                self._record(node, kwargs["model"], config, None, time.perf_counter() - start, None, retries, "error")
+                raise
+
+        wall = time.perf_counter() - start
+        record = self._record(node, kwargs["model"], config, usage, wall, ttft, retries, "ok")
+        return LLMResult(content=content or "", usage=record, raw_usage=usage)
+
+    @recorded("llm", _cassette_keys, _encode_call, _decode_call)
+    def _invoke(self, stream: bool = False, timeout: float | None = None, **kwargs) -> Tuple[str, Any, float | None]:
+        """One logical API call; returns (content, usage, time to first token or None)."""
+        tokens = estimate_request_tokens(kwargs)
+        tried: List[str] = []
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            lease = self.pool.acquire(kwargs["model"], tokens, tried, max_wait=_left(deadline))
+            try:
+                result = self._create(self.pool.client(lease.deployment), stream, self._routed(lease, kwargs), _left(deadline))
+            except BaseException as e:
+                if self._release(lease, e, tried):
+                    continue
+                raise
+            self.pool.release(lease, used_tokens=_total_tokens(result[1]))
+            return result
+
+    @staticmethod
+    def _create(client, stream: bool, kwargs: Dict[str, Any], timeout: float | None) -> Tuple[str, Any, float | None]:
+        options = {"timeout": max(timeout, 0.001)} if timeout is not None else {}
+        if not stream:
+            completion = client.chat.completions.create(**kwargs, **options)
+            return completion.choices[0].message.content, completion.usage, None
+
+        start = time.perf_counter()
+        chunks = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs, **options)
+        parts: List[str] = []
+        ttft = None
+        usage = None
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(chunk.choices[0].delta.content)
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+        return "".join(parts), usage, ttft
+
+    async def achat(self, node: str, config: RunnableConfig | None = None, stream: bool = False, **kwargs) -> LLMResult:
+        """Async variant of `chat`; idempotent calls are also hedged (see agent.deadlines)."""
+        with span("llm.chat", **_span_attributes(node, stream, kwargs)) as llm_span:
+            result = await self._achat(node, config, stream, **kwargs)
+            llm_span.set_attributes(_usage_attributes(result.usage))
+            return result
+
+    async def _achat(self, node: str, config: RunnableConfig | None, stream: bool, **kwargs) -> LLMResult:
+        policy = call_policy(node, config, kwargs)
+        start = time.perf_counter()
+        retries = 0
+        while True:
+            if policy.remaining() <= 0:
+                raise self._deadline_exceeded(node, config, kwargs["model"], start, retries)
+            try:
+                (content, usage, ttft), hedged = await asyncio.wait_for(
+                    self._hedged(node, policy, stream, kwargs), policy.remaining()
+                )
+                break
+            except TimeoutError:
+                raise self._deadline_exceeded(node, config, kwargs["model"], start, retries) from None
+            except retriable_errors() as e:
+                if _is_timeout(e):
+                    metrics.inc("llm_timeouts_total", node=node, model=kwargs["model"], scope="attempt")
+                delay = self._backoff(retries + 1)
+                if delay >= policy.remaining() and _is_timeout(e):
+                    raise self._deadline_exceeded(node, config, kwargs["model"], start, retries) from e
+                if retries >= self.max_retries or delay >= policy.remaining():
+                    self._record(node, kwargs["model"], config, None, time.perf_counter() - start, None, retries, "error")
+                    raise
+                retries += 1
+                await asyncio.sleep(delay)
+            except Exception:
+                self._record(node, kwargs["model"], config, None, time.perf_counter() - start, None, retries, "error")
+                raise
+
+        wall = time.perf_counter() - start
+        record = self._record(node, kwargs["model"], config, usage, wall, ttft, retries, "ok", hedged)
+        return LLMResult(content=content or "", usage=record, raw_usage=usage)
+
+    async def _hedged(self, node: str, policy: CallPolicy, stream: bool,
+                      kwargs: Dict[str, Any]) -> Tuple[Tuple[str, Any, float | None], bool]:
+        """One attempt and whether it was hedged: past `policy.hedge_after` a duplicate request races it."""
+        if policy.hedge_after is None:
+            return await self._ainvoke(stream, policy.remaining(), **kwargs), False
+        primary = asyncio.ensure_future(self._ainvoke(stream, policy.remaining(), **kwargs))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=policy.hedge_after)
+            if done:
+                return primary.result(), False
+            # The pool counts the primary as in flight, so the duplicate usually goes to another deployment
+            hedge = asyncio.ensure_future(self._ainvoke(stream, policy.remaining(), **kwargs))
+            pending = {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = "hedge" if task is hedge else "primary"
+                        metrics.inc("llm_hedges_total", node=node, model=kwargs["model"], winner=winner)
+                        return task.result(), True
+                    error = task.exception()
+            metrics.inc("llm_hedges_total", node=node, model=kwargs["model"], winner="none")
+            raise error
+        finally:
+            # The loser is cancelled; its lease is released as 'cancelled' (see _release)
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    @recorded("llm", _cassette_keys, _encode_call, _decode_call)
+    async def _ainvoke(self, stream: bool = False, timeout: float | None = None, **kwargs) -> Tuple[str, Any, float | None]:
+        """Async variant of `_invoke`."""
+        tokens = estimate_request_tokens(kwargs)
+        tried: List[str] = []
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            lease = await self.pool.aacquire(kwargs["model"], tokens, tried, max_wait=_left(deadline))
+            try:
+                result = await self._acreate(
+                    self.pool.client(lease.deployment, asynchronous=True), stream, self._routed(lease, kwargs), _left(deadline)
+                )
+            except BaseException as e:
+                if self._release(lease, e, tried):
+                    continue
+                raise
+            self.pool.release(lease, used_tokens=_total_tokens(result[1]))
+            return result
+
+    @staticmethod
+    async def _acreate(client, stream: bool, kwargs: Dict[str, Any], timeout: float | None) -> Tuple[str, Any, float | None]:
+        options = {"timeout": max(timeout, 0.001)} if timeout is not None else {}
+        if not stream:
+            completion = await client.chat.completions.create(**kwargs, **options)
+            return completion.choices[0].message.content, completion.usage, None
+
+        start = time.perf_counter()
+        chunks = await client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs, **options)
+        parts: List[str] = []
+        ttft = None
+        usage = None
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(chunk.choices[0].delta.content)
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+        return "".join(parts), usage, ttft
+
+
+def summarize_llm_usage(records: List[Dict[str, Any]], run_id: str | None = None) -> Dict[str, Any]:
+    """Aggregate usage records into run totals plus per-node and per-model breakdowns.
+
+    When `run_id` is given, records from earlier runs on the same thread are ignored.
+    """
+    if run_id is not None:
+        records = [r for r in records if r.get("run_id") in (run_id, None)]
+
+    fields = ("prompt_tokens", "completion_tokens", "reasoning_tokens", "cached_tokens", "wall_seconds", "retries", "hedged")
+
+    def _empty() -> Dict[str, Any]:
+        return {"calls": 0, **{f: 0 for f in fields}}
+
+    totals = _empty()
+    by_node: Dict[str, Dict[str, Any]] = {}
+    by_model: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        for bucket in (totals, by_node.setdefault(record["node"], _empty()), by_model.setdefault(record["model"], _empty())):
+            bucket["calls"] += 1
+            for f in fields:
+                bucket[f] += record.get(f, 0)
+    for bucket in [totals, *by_node.values(), *by_model.values()]:
+        bucket["wall_seconds"] = round(bucket["wall_seconds"], 3)
+    return {"totals": totals, "by_node": by_node, "by_model": by_model}
+
+
+_llm: InstrumentedLLM | None = None
+_llm_lock = threading.Lock()
+
+
+def get_llm() -> InstrumentedLLM:
+    """Return the shared Azure OpenAI wrapper over the deployment pool; clients are created on first use."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = InstrumentedLLM(DeploymentPool.from_env())
+    return _llm
@@ -0,0 +1,334 @@
+"""Client pool spanning several Azure OpenAI endpoints and deployments per model.
+
+Each deployment serves one logical model name (the `model` the nodes ask for)
+and has token buckets for its TPM and RPM quota. A request goes to the least
+loaded deployment that has quota for it: an RPM token plus the estimated
+prompt and completion tokens are reserved up front, and the reservation is
+corrected with the actual usage when the call returns. A 429 puts the
+deployment in cooldown for its `Retry-After`, other retriable errors for an
+exponential backoff, and the call fails over to the next deployment. When
+every deployment is throttled the caller waits for the earliest one, at most
+AZURE_OPENAI_POOL_MAX_WAIT_SECONDS.
+
+Deployments come from AZURE_OPENAI_DEPLOYMENTS (a JSON list) or the JSON file
+named by AZURE_OPENAI_DEPLOYMENTS_FILE, e.g.
+    [{"endpoint": "https://eastus.openai.azure.com", "model": "o3", "deployment": "o3", "tpm": 200000, "rpm": 1200},
+     {"endpoint": "https://swedencentral.openai.azure.com", "model": "o3", "deployment": "o3-global", "tpm": 500000}]
+`api_key` and `api_version` default to AZURE_OPENAI_API_KEY and
+AZURE_OPENAI_API_VERSION (or the SDK's OPENAI_API_VERSION); `model` "*" serves
+every model under its own name. Without a list, AZURE_OPENAI_ENDPOINT alone
+serves every model, without quotas. A missing key, endpoint or API version is
+a configuration error raised when the pool is built.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+from agent.metrics import metrics
+
+POOL_MAX_WAIT_SECONDS = float(os.getenv("AZURE_OPENAI_POOL_MAX_WAIT_SECONDS", "30"))
+# Cooldown of a throttled deployment when the 429 carries no Retry-After
+DEFAULT_RETRY_AFTER_SECONDS = 2.0
+MAX_ERROR_COOLDOWN_SECONDS = 30.0
+# Completion budget assumed for requests without max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+# Each in-flight request counts as this much quota utilization when ranking deployments
+INFLIGHT_WEIGHT = 0.05
+
+metrics.describe("llm_pool_requests_total", "Requests per pooled deployment and outcome (ok, throttled, error, rejected or cancelled).")
+metrics.describe("llm_pool_failovers_total", "Requests retried on another deployment after a retriable error.")
+metrics.describe("llm_pool_wait_seconds", "Time spent waiting for deployment quota or cooldown.")
+
+
+class TokenBucket:
+    """Per-minute quota refilled continuously; may go into debt when actual usage exceeds the reservation."""
+
+    def __init__(self, per_minute: float):
+        """Start full, with `per_minute` tokens."""
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def utilization(self, now: float) -> float:
+        """Share of the bucket in use (0 when full, 1 when empty or in debt)."""
+        self._refill(now)
+        return 1.0 - max(self.tokens, 0.0) / self.capacity
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (capped at the bucket size)."""
+        self._refill(now)
+        deficit = min(amount, self.capacity) - self.tokens
+        return max(0.0, deficit / self.rate)
+
+    def take(self, amount: float, now: float) -> None:
+        """Remove `amount` tokens; a negative amount gives tokens back."""
+        self._refill(now)
+        self.tokens -= amount
+
+
+@dataclass
+class Deployment:
+    """One Azure OpenAI deployment serving `model`, with its quota and health."""
+
+    model: str
+    deployment: str
+    endpoint: str
+    api_key: str
+    api_version: str
+    tpm: TokenBucket | None = None
+    rpm: TokenBucket | None = None
+    inflight: int = 0
+    cooldown_until: float = 0.0
+    failures: int = 0
+    clients: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @property
+    def name(self) -> str:
+        """Endpoint host and deployment, e.g. for metric labels."""
+        return f"{self.endpoint.split('//')[-1].rstrip('/')}/{self.deployment}"
+
+    def wait_time(self, tokens: float, now: float) -> float:
+        """Seconds until this deployment can take a request of `tokens`."""
+        wait = max(0.0, self.cooldown_until - now)
+        if self.rpm is not None:
+            wait = max(wait, self.rpm.wait_time(1, now))
+        if self.tpm is not None:
+            wait = max(wait, self.tpm.wait_time(tokens, now))
+        return wait
+
+    def load(self, now: float) -> float:
+        """Quota utilization plus in-flight requests, used to pick the least loaded deployment."""
+        utilization = max(
+            self.tpm.utilization(now) if self.tpm is not None else 0.0,
+            self.rpm.utilization(now) if self.rpm is not None else 0.0,
+        )
+        return utilization + self.inflight * INFLIGHT_WEIGHT
+
+
+@dataclass
+class Lease:
+    """A deployment reserved for one request."""
+
+    deployment: Deployment
+    reserved_tokens: float
+
+
+def estimate_request_tokens(kwargs: Dict[str, Any]) -> int:
+    """Prompt tokens (4 characters per token) plus the completion budget of a chat request."""
+    prompt_chars = sum(len(str(m.get("content") or "")) for m in kwargs.get("messages") or [])
+    completion = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    return prompt_chars // 4 + int(completion)
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """`retry-after-ms` or `retry-after` (seconds) of an OpenAI API error, if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            continue
+    return None
+
+
+class DeploymentPool:
+    """Least-loaded routing with quota accounting and failover across deployments."""
+
+    def __init__(self, deployments: Sequence[Deployment]):
+        """Route over `deployments`; clients are created on first use."""
+        if not deployments:
+            raise ValueError("the Azure OpenAI deployment pool is empty")
+        self.deployments = list(deployments)
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, str, str, bool], Any] = {}
+
+    @classmethod
+    def from_env(cls) -> "DeploymentPool":
+        """Build the pool from AZURE_OPENAI_DEPLOYMENTS(_FILE), or AZURE_OPENAI_ENDPOINT without them."""
+        api_key = os.getenv("AZURE_OPENAI_API_KEY") or ""
+        api_version = os.getenv("AZURE_OPENAI_API_VERSION") or os.getenv("OPENAI_API_VERSION") or ""
+        raw = os.getenv("AZURE_OPENAI_DEPLOYMENTS")
+        path = os.getenv("AZURE_OPENAI_DEPLOYMENTS_FILE")
+        if not raw and path:
+            with open(path) as f:
+                raw = f.read()
+        if not raw:
+            if not api_key:
+                raise ValueError("AZURE_OPENAI_API_KEY is not set")
+            if not os.getenv("AZURE_OPENAI_ENDPOINT"):
+                raise ValueError("AZURE_OPENAI_ENDPOINT is not set")
+            pool = cls([Deployment("*", "*", os.environ["AZURE_OPENAI_ENDPOINT"], api_key, api_version)])
+        else:
+            pool = cls([
+                Deployment(
+                    model=spec["model"],
+                    deployment=spec.get("deployment", spec["model"]),
+                    endpoint=spec["endpoint"],
+                    api_key=spec.get("api_key", api_key),
+                    api_version=spec.get("api_version", api_version),
+                    tpm=TokenBucket(spec["tpm"]) if spec.get("tpm") else None,
+                    rpm=TokenBucket(spec["rpm"]) if spec.get("rpm") else None,
+                )
+                for spec in json.loads(raw)
+            ])
+        for deployment in pool.deployments:
+            if not deployment.api_key:
+                raise ValueError(f"no API key for Azure OpenAI deployment {deployment.name} (set AZURE_OPENAI_API_KEY)")
+            if not deployment.api_version:
+                raise ValueError(f"no API version for Azure OpenAI deployment {deployment.name} (set AZURE_OPENAI_API_VERSION)")
+        return pool
+
+    def client(self, deployment: Deployment, asynchronous: bool = False):
+        """Return the (shared per endpoint) OpenAI client for `deployment`, created on first use."""
+        key = (deployment.endpoint, deployment.api_key, deployment.api_version, asynchronous)
+        client = self._clients.get(key)
+        if client is None:
+            from openai import AsyncAzureOpenAI, AzureOpenAI
+
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = (AsyncAzureOpenAI if asynchronous else AzureOpenAI)(
+                        api_key=deployment.api_key,
+                        api_version=deployment.api_version,
+                        azure_endpoint=deployment.endpoint,
+                        # Retries are handled (and counted) by InstrumentedLLM and the pool
+                        max_retries=0,
+                    )
+        return client
+
+    def clients(self, asynchronous: bool = False) -> List[Any]:
+        """One client per endpoint, e.g. to open connections at warm-up."""
+        endpoints = {}
+        for deployment in self.deployments:
+            endpoints.setdefault(deployment.endpoint, deployment)
+        return [self.client(d, asynchronous) for d in endpoints.values()]
+
+    def candidates(self, model: str) -> List[Deployment]:
+        """Deployments serving `model`, or the wildcard deployments when none serves it by name."""
+        exact = [d for d in self.deployments if d.model == model]
+        return exact or [d for d in self.deployments if d.model == "*"]
+
+    def deployment_name(self, deployment: Deployment, model: str) -> str:
+        """Azure deployment to call for `model` (wildcard deployments use the model name)."""
+        return model if deployment.deployment == "*" else deployment.deployment
+
+    def _try_acquire(self, model: str, tokens: float, exclude: Sequence[str]) -> Tuple[Lease | None, float]:
+        """Reserve the least loaded ready deployment, or return the shortest wait."""
+        candidates = self.candidates(model)
+        if not candidates:
+            raise ValueError(f"no Azure OpenAI deployment serves model '{model}'")
+        # Prefer deployments this request has not failed on yet
+        untried = [d for d in candidates if d.name not in exclude] or candidates
+        with self._lock:
+            now = time.monotonic()
+            ready = [d for d in untried if d.wait_time(tokens, now) == 0.0]
+            if not ready:
+                return None, min(d.wait_time(tokens, now) for d in untried)
+            deployment = min(ready, key=lambda d: d.load(now))
+            if deployment.rpm is not None:
+                deployment.rpm.take(1, now)
+            if deployment.tpm is not None:
+                deployment.tpm.take(tokens, now)
+            deployment.inflight += 1
+            return Lease(deployment, tokens), 0.0
+
+    def acquire(self, model: str, tokens: float, exclude: Sequence[str] = (), max_wait: float | None = None) -> Lease:
+        """Reserve a deployment, waiting (at most `max_wait` or the pool's limit) for quota or cooldown."""
+        max_wait = POOL_MAX_WAIT_SECONDS if max_wait is None else min(POOL_MAX_WAIT_SECONDS, max_wait)
+        waited = 0.0
+        while True:
+            lease, wait = self._try_acquire(model, tokens, exclude)
+            if lease is not None:
+                break
+            if waited + wait > max_wait:
+                lease = self._force(model, tokens, exclude)
+                break
+            time.sleep(wait)
+            waited += wait
+        if waited:
+            metrics.observe("llm_pool_wait_seconds", waited, model=model)
+        return lease
+
+    async def aacquire(self, model: str, tokens: float, exclude: Sequence[str] = (),
+                       max_wait: float | None = None) -> Lease:
+        """Async variant of `acquire`."""
+        max_wait = POOL_MAX_WAIT_SECONDS if max_wait is None else min(POOL_MAX_WAIT_SECONDS, max_wait)
+        waited = 0.0
+        while True:
+            lease, wait = self._try_acquire(model, tokens, exclude)
+            if lease is not None:
+                break
+            if waited + wait > max_wait:
+                lease = self._force(model, tokens, exclude)
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        if waited:
+            metrics.observe("llm_pool_wait_seconds", waited, model=model)
+        return lease
+
+    def _force(self, model: str, tokens: float, exclude: Sequence[str]) -> Lease:
+        """Past the wait budget: take the deployment that frees up first and let the API decide."""
+        untried = [d for d in self.candidates(model) if d.name not in exclude] or self.candidates(model)
+        with self._lock:
+            now = time.monotonic()
+            deployment = min(untried, key=lambda d: d.wait_time(tokens, now))
+            deployment.inflight += 1
+        return Lease(deployment, 0.0)
+
+    def release(self, lease: Lease, outcome: str = "ok", used_tokens: float | None = None,
+                retry_after: float | None = None) -> None:
+        """Return a lease: correct the token reservation and put a failing deployment in cooldown.
+
+        `outcome` is 'ok', 'throttled' (429), 'error' (other retriable errors), or 'rejected' and
+        'cancelled', which say nothing about the deployment's health.
+        """
+        deployment = lease.deployment
+        with self._lock:
+            now = time.monotonic()
+            deployment.inflight -= 1
+            if deployment.tpm is not None and used_tokens is not None:
+                deployment.tpm.take(used_tokens - lease.reserved_tokens, now)
+            if outcome == "throttled":
+                deployment.cooldown_until = now + (retry_after if retry_after is not None else DEFAULT_RETRY_AFTER_SECONDS)
+            elif outcome == "error":
+                deployment.failures += 1
+                deployment.cooldown_until = now + min(MAX_ERROR_COOLDOWN_SECONDS, 2.0 ** (deployment.failures - 1))
+            elif outcome == "ok":
+                deployment.failures = 0
+        metrics.inc("llm_pool_requests_total", deployment=deployment.name, model=deployment.model, outcome=outcome)
+
+    def untried(self, model: str, tried: Sequence[str]) -> bool:
+        """Whether a deployment for `model` is left to fail over to."""
+        return any(d.name not in tried for d in self.candidates(model))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Quota, load and cooldown per deployment."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "deployment": d.name,
+                    "model": d.model,
+                    "inflight": d.inflight,
+                    "tpm_available": round(d.tpm.tokens) if d.tpm is not None else None,
+                    "rpm_available": round(d.rpm.tokens) if d.rpm is not None else None,
+                    "load": round(d.load(now), 3),
+                    "cooldown_seconds": round(max(0.0, d.cooldown_until - now), 2),
+                    "consecutive_failures": d.failures,
+                }
+                for d in self.deployments
+            ]
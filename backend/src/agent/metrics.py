@@ -0,0 +1,156 @@
+"""Process-wide metrics registry for LLM usage and pipeline timings.
+
+Counters and histograms are keyed by label sets so they can be summarised per
+node and model, and rendered in the Prometheus text exposition format.
+"""
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Tuple
+
+# Default latency buckets in seconds, sized for LLM round-trips
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0)
+
+# Fraction of the input price saved on cached prompt tokens (deployment specific)
+PROMPT_CACHE_DISCOUNT = float(os.getenv("PROMPT_CACHE_DISCOUNT", "0.75"))
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[str, str] | None = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    rendered = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+    return "{" + rendered + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms with Prometheus text rendering."""
+
+    def __init__(self):
+        """Create an empty registry."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: Dict[str, Dict[LabelKey, Dict[str, Any]]] = defaultdict(dict)
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        """Set the HELP text rendered for metric `name`."""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        """Add `value` to the counter series of `name` with `labels`."""
+        with self._lock:
+            self._counters[name][_label_key(labels)] += value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels) -> None:
+        """Record `value` in the histogram series of `name` with `labels`; the first call fixes the buckets."""
+        with self._lock:
+            buckets = self._buckets.setdefault(name, buckets)
+            series = self._histograms[name].get(_label_key(labels))
+            if series is None:
+                series = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+                self._histograms[name][_label_key(labels)] = series
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def counter(self, name: str) -> Dict[LabelKey, float]:
+        """Return a snapshot of every series of a counter."""
+        with self._lock:
+            return dict(self._counters.get(name, {}))
+
+    def histogram(self, name: str) -> Dict[LabelKey, Dict[str, Any]]:
+        """Return a snapshot (count and sum) of every series of a histogram."""
+        with self._lock:
+            return {k: {"count": v["count"], "sum": v["sum"]} for k, v in self._histograms.get(name, {}).items()}
+
+    def render_prometheus(self) -> str:
+        """Render every counter and histogram in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                buckets = self._buckets[name]
+                for key, data in sorted(series.items()):
+                    for bound, count in zip(buckets, data["buckets"]):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {data['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {data['sum']:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {data['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+metrics.describe("llm_prompt_tokens_total", "Prompt tokens sent to the LLM.")
+metrics.describe("llm_cached_prompt_tokens_total", "Prompt tokens served from the provider prompt cache.")
+metrics.describe("llm_request_duration_seconds", "Wall time of LLM requests, split by prompt cache hit.")
+
+
+def _cached_tokens(usage) -> int:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def record_prompt_cache(node: str, model: str, usage, elapsed_seconds: float) -> Dict[str, Any]:
+    """Record prompt and cached-token usage (`completion.usage`) of one completion for `node`."""
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    cached_tokens = _cached_tokens(usage)
+
+    metrics.inc("llm_prompt_tokens_total", prompt_tokens, node=node, model=model)
+    metrics.inc("llm_cached_prompt_tokens_total", cached_tokens, node=node, model=model)
+    metrics.observe(
+        "llm_request_duration_seconds",
+        elapsed_seconds,
+        node=node,
+        model=model,
+        cache="hit" if cached_tokens else "miss",
+    )
+    return {"prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens}
+
+
+def prompt_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-node prompt cache hit rate and latency of cache hits vs misses."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    prompt = metrics.counter("llm_prompt_tokens_total")
+    cached = metrics.counter("llm_cached_prompt_tokens_total")
+    for key, prompt_tokens in prompt.items():
+        labels = dict(key)
+        entry = stats.setdefault(labels["node"], {"prompt_tokens": 0, "cached_tokens": 0})
+        entry["prompt_tokens"] += int(prompt_tokens)
+        entry["cached_tokens"] += int(cached.get(key, 0))
+
+    for key, data in metrics.histogram("llm_request_duration_seconds").items():
+        labels = dict(key)
+        entry = stats.setdefault(labels["node"], {"prompt_tokens": 0, "cached_tokens": 0})
+        bucket = entry.setdefault(f"cache_{labels['cache']}", {"requests": 0, "total_seconds": 0.0})
+        bucket["requests"] += data["count"]
+        bucket["total_seconds"] += data["sum"]
+
+    for entry in stats.values():
+        entry["cached_token_ratio"] = round(entry["cached_tokens"] / entry["prompt_tokens"], 4) if entry["prompt_tokens"] else 0.0
+        entry["prompt_cost_saved_ratio"] = round(entry["cached_token_ratio"] * PROMPT_CACHE_DISCOUNT, 4)
+        for name in ("cache_hit", "cache_miss"):
+            if name in entry:
+                bucket = entry[name]
+                bucket["avg_seconds"] = round(bucket["total_seconds"] / bucket["requests"], 3) if bucket["requests"] else 0.0
+        if "cache_hit" in entry and "cache_miss" in entry:
+            entry["avg_latency_saved_seconds"] = round(entry["cache_miss"]["avg_seconds"] - entry["cache_hit"]["avg_seconds"], 3)
+    return stats
@@ -0,0 +1,147 @@
+"""Local passage ranking for scraped and search-provided page content.
+
+Pages are split into sentence-aligned passages which are scored against the
+branch's search query with a NumPy-vectorized BM25, so the most relevant evidence
+fits the prompt budget instead of whatever happens to sit at the top of the page.
+"""
+import re
+from typing import List
+
+import numpy as np
+
+# Rough characters-per-token ratio for English prose with the GPT tokenizers
+CHARS_PER_TOKEN = 4
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the "
+    "this to was were what when where which who why will with vs versus".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenizer used for both queries and passages."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct query tokens without stopwords, in query order."""
+    return list(dict.fromkeys(t for t in tokenize(query) if t not in _STOPWORDS))
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting (no tokenizer dependency)."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def chunk_passages(text: str, passage_chars: int = 600) -> List[str]:
+    """Split text into passages of roughly `passage_chars`, keeping sentences whole."""
+    if not text:
+        return []
+
+    passages = []
+    current = []
+    current_len = 0
+    for sentence in _SENTENCE_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        # Hard-split run-on "sentences" (tables, menus) so one chunk can't eat the budget
+        while len(sentence) > passage_chars:
+            if current:
+                passages.append(" ".join(current))
+                current, current_len = [], 0
+            passages.append(sentence[:passage_chars])
+            sentence = sentence[passage_chars:]
+        if current and current_len + len(sentence) + 1 > passage_chars:
+            passages.append(" ".join(current))
+            current, current_len = [], 0
+        if sentence:
+            current.append(sentence)
+            current_len += len(sentence) + 1
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def score_passages(passages: List[str], query: str, k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """Score passages against the query with BM25.
+
+    Only query terms are indexed, so the term-frequency matrix is
+    (passages x query terms) and scoring is a single matrix-vector product.
+    """
+    n = len(passages)
+    terms = query_terms(query)
+    if n == 0 or not terms:
+        return np.zeros(n)
+
+    term_index = {term: i for i, term in enumerate(terms)}
+    lengths = np.empty(n, dtype=np.float64)
+    rows: List[int] = []
+    cols: List[int] = []
+    for row, passage in enumerate(passages):
+        tokens = tokenize(passage)
+        lengths[row] = len(tokens)
+        for token in tokens:
+            col = term_index.get(token)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+
+    tf = np.zeros((n, len(terms)), dtype=np.float64)
+    if rows:
+        np.add.at(tf, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    avgdl = lengths.mean() or 1.0
+    norm = k1 * (1.0 - b + b * lengths / avgdl)
+    return (tf * (k1 + 1.0) / (tf + norm[:, None])) @ idf
+
+
+def select_passages(
+    text: str,
+    query: str,
+    token_budget: int = 500,
+    passage_chars: int = 600,
+    separator: str = " … ",
+) -> str:
+    """Return the most query-relevant passages of `text` that fit in `token_budget`.
+
+    Selected passages are re-joined in document order. When nothing matches the
+    query this degrades to keeping the leading passages, i.e. plain truncation.
+    """
+    if not text:
+        return ""
+    char_budget = token_budget * CHARS_PER_TOKEN
+    if len(text) <= char_budget:
+        return text
+
+    passages = chunk_passages(text, passage_chars=min(passage_chars, char_budget))
+    scores = score_passages(passages, query)
+
+    # Stable sort keeps document order among equally scored passages
+    order = np.argsort(-scores, kind="stable")
+    selected = []
+    used = 0
+    for idx in order:
+        cost = len(passages[idx]) + len(separator)
+        if used + cost > char_budget:
+            continue
+        selected.append(int(idx))
+        used += cost
+
+    if not selected:
+        return text[:char_budget]
+    return separator.join(passages[i] for i in sorted(selected))
+
+
+def best_passage(text: str, query: str, max_chars: int = 200) -> str | None:
+    """Return the single highest-scoring passage, trimmed to `max_chars`."""
+    passages = chunk_passages(text, passage_chars=max_chars)
+    if not passages:
+        return None
+    scores = score_passages(passages, query)
+    return passages[int(np.argmax(scores))]
@@ -0,0 +1,129 @@
+"""Reasoning-effort cascade for the reflection node.
+
+The first reflection pass runs on `reflection_model` at `reflection_effort`
+(a fast model or low effort). Only when that pass reports low confidence,
+conflicting evidence or an unreadable verdict is the reflection repeated on
+`reasoning_model` at high effort.
+
+Every pass is recorded in run state (`reflection_passes`) so escalation rate
+and the latency saved by accepting the first pass can be reported per run,
+and counted process-wide in the metrics registry.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from agent.metrics import metrics
+from agent.tools_and_schemas import Reflection
+
+REFLECTION_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+# Escalated calls observed before the latency an accepted first pass saves is estimated from their mean
+MIN_ESCALATIONS_FOR_ESTIMATE = 5
+
+metrics.describe("agent_reflection_passes_total", "Reflection passes per cascade outcome (accepted or escalated) and reason.")
+metrics.describe("agent_reflection_seconds", "Wall time of reflection calls per cascade tier (first or escalated).")
+metrics.describe("agent_reflection_saved_seconds_total", "Estimated reflection latency saved by accepting the first pass.")
+metrics.describe("agent_reflection_overhead_seconds_total", "Latency of first passes that were escalated anyway.")
+
+
+@dataclass
+class ReflectionVerdict:
+    """A reflection pass's assessment, whether or not its reply could be parsed."""
+
+    is_sufficient: bool
+    knowledge_gap: str
+    follow_up_queries: List[str]
+    # None only for unparsed verdicts
+    confidence: float | None
+    conflicting_evidence: bool
+    parsed: bool
+
+
+def is_reasoning_model(model: str) -> bool:
+    """o-series deployments accept `reasoning_effort`; gpt-4.x models reject it."""
+    return re.match(r"o\d", model.lower()) is not None
+
+
+def to_verdict(reflection: Reflection | None) -> ReflectionVerdict:
+    """Convert a parsed reflection to a verdict; an unusable reply is an insufficient, unparsed verdict."""
+    if reflection is None:
+        return ReflectionVerdict(False, "", [], None, False, False)
+    return ReflectionVerdict(
+        is_sufficient=reflection.is_sufficient,
+        knowledge_gap=reflection.knowledge_gap,
+        follow_up_queries=list(reflection.follow_up_queries),
+        confidence=min(1.0, max(0.0, reflection.confidence)),
+        conflicting_evidence=reflection.conflicting_evidence,
+        parsed=True,
+    )
+
+
+def escalation_reason(verdict: ReflectionVerdict, min_confidence: float, escalate_on_conflict: bool) -> str:
+    """Return why the first pass must be redone on the reasoning model, or "" to accept it."""
+    if not verdict.parsed:
+        return "unparsed"
+    if escalate_on_conflict and verdict.conflicting_evidence:
+        return "conflicting_evidence"
+    if verdict.confidence < min_confidence:
+        return "low_confidence"
+    return ""
+
+
+def _mean_escalated_seconds() -> float | None:
+    """Mean latency of escalated reflection calls in this process, once enough were observed to estimate with."""
+    for key, series in metrics.histogram("agent_reflection_seconds").items():
+        if dict(key).get("tier") == "escalated" and series["count"] >= MIN_ESCALATIONS_FOR_ESTIMATE:
+            return series["sum"] / series["count"]
+    return None
+
+
+def record_pass(first_seconds: float, escalated_seconds: float | None, reason: str,
+                run_id: str | None = None) -> Dict[str, Any]:
+    """Count one reflection pass; returns its record for `reflection_passes` in run state.
+
+    An escalated pass measures its overhead (the first pass, which was wasted). An accepted
+    pass only has an estimate of what it saved, from the mean escalated latency in this
+    process, and none until MIN_ESCALATIONS_FOR_ESTIMATE escalations were observed.
+    """
+    metrics.observe("agent_reflection_seconds", first_seconds, buckets=REFLECTION_BUCKETS, tier="first")
+    overhead_seconds = estimated_saved_seconds = None
+    if escalated_seconds is not None:
+        metrics.observe("agent_reflection_seconds", escalated_seconds, buckets=REFLECTION_BUCKETS, tier="escalated")
+        metrics.inc("agent_reflection_passes_total", outcome="escalated", reason=reason)
+        overhead_seconds = first_seconds
+        metrics.inc("agent_reflection_overhead_seconds_total", overhead_seconds)
+    else:
+        metrics.inc("agent_reflection_passes_total", outcome="accepted", reason="confident")
+        baseline = _mean_escalated_seconds()
+        if baseline is not None:
+            estimated_saved_seconds = max(baseline - first_seconds, 0.0)
+            metrics.inc("agent_reflection_saved_seconds_total", estimated_saved_seconds)
+    return {
+        "run_id": run_id,
+        "escalated": escalated_seconds is not None,
+        "reason": reason,
+        "first_seconds": round(first_seconds, 3),
+        "escalated_seconds": round(escalated_seconds, 3) if escalated_seconds is not None else None,
+        "overhead_seconds": round(overhead_seconds, 3) if overhead_seconds is not None else None,
+        "estimated_saved_seconds": round(estimated_saved_seconds, 3) if estimated_saved_seconds is not None else None,
+    }
+
+
+def summarize_passes(passes: List[Dict[str, Any]], run_id: str | None = None) -> Dict[str, Any]:
+    """Per-run escalation rate, measured escalation overhead and estimated latency saved by the cascade.
+
+    When `run_id` is given, passes from earlier runs on the same thread are ignored. The
+    estimate is None when no accepted pass of the run had one.
+    """
+    if run_id is not None:
+        passes = [p for p in passes if p.get("run_id") in (run_id, None)]
+    escalations = sum(1 for p in passes if p["escalated"])
+    overhead = sum(p.get("overhead_seconds") or 0.0 for p in passes)
+    saved = [p["estimated_saved_seconds"] for p in passes if p.get("estimated_saved_seconds") is not None]
+    return {
+        "passes": len(passes),
+        "escalations": escalations,
+        "escalation_rate": round(escalations / len(passes), 3) if passes else 0.0,
+        "escalation_overhead_seconds": round(overhead, 3),
+        "estimated_saved_seconds": round(sum(saved), 3) if saved else None,
+    }
@@ -0,0 +1,591 @@
+"""Checkpoint retention: keep what a thread needs and reclaim the rest.
+
+Every super-step of a run writes a checkpoint; once the run is over only its
+final checkpoint is needed to show, resume or fork the thread. `RetentionJob`
+walks the checkpoint tables incrementally and applies a `RetentionPolicy`:
+
+* keep only the final checkpoint of every completed run, dropping the run's
+  intermediate checkpoints, their pending writes and channel blobs nothing
+  references any more. A run is complete once the next run has started or
+  its last checkpoint is older than `settle_seconds`, so in-flight runs are
+  never touched;
+* delete threads whose last checkpoint is older than `abandoned_thread_ttl_hours`.
+
+Write-once state fields (`DeltaChannel`, see agent.state) are stored as writes
+between snapshots, so before a run's intermediate checkpoints go, the full
+value of each such field is materialized into the kept final checkpoint.
+
+The job never holds long locks: threads are visited in keyset-paginated
+batches, each thread is compacted in its own short transaction with a lock
+timeout (a thread that is being written to is skipped until the next pass),
+and it pauses between batches. Reclaimed bytes are reported per pass and as
+metrics; they are logical row bytes, which Postgres (autovacuum) and SQLite
+(VACUUM) turn into free space on their own schedule.
+
+Backends: Postgres (`langgraph-checkpoint-postgres`, `pip install -e .[checkpoint]`)
+for DATABASE_URI-style connection strings, and SQLite (`langgraph-checkpoint-sqlite`)
+for file paths, which makes policies easy to try locally:
+    python -m agent.retention checkpoints.sqlite --dry-run
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+from agent.checkpointing import CompactSerializer
+from agent.metrics import metrics
+
+RETENTION_DATABASE = os.getenv("AGENT_RETENTION_DATABASE") or os.getenv("DATABASE_URI") or os.getenv("POSTGRES_URL")
+# Minutes between background passes; 0 disables the background job
+RETENTION_INTERVAL_MINUTES = float(os.getenv("AGENT_RETENTION_INTERVAL_MINUTES", "0"))
+# Added to the metadata of a compacted run's kept checkpoint, so later passes see where the run ended
+RETAINED_MARK = {"retention": "final"}
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("agent_retention_reclaimed_bytes_total", "Checkpoint bytes deleted by the retention job, per table.")
+metrics.describe("agent_retention_rows_total", "Checkpoint rows deleted by the retention job, per table.")
+metrics.describe("agent_retention_threads_total", "Threads visited by the retention job, per action.")
+metrics.describe("agent_retention_pass_seconds", "Duration of retention passes.")
+
+
+@dataclass
+class RetentionPolicy:
+    """What the retention job keeps."""
+
+    keep_final_checkpoint_per_run: bool = True
+    # A run whose last checkpoint is at least this old (and not followed by another run) is complete
+    settle_seconds: float = 900
+    # Threads idle for longer are deleted entirely; 0 keeps threads forever
+    abandoned_thread_ttl_hours: float = 0
+    # Threads per batch, and per pass (the next pass continues where this one stopped)
+    batch_size: int = 50
+    max_threads_per_pass: int = 1000
+    pause_seconds: float = 0.05
+    lock_timeout_ms: int = 200
+    dry_run: bool = False
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        """Build the policy from the AGENT_RETENTION_* environment variables."""
+        return cls(
+            keep_final_checkpoint_per_run=os.getenv("AGENT_RETENTION_KEEP_FINAL_ONLY", "true").lower() == "true",
+            settle_seconds=float(os.getenv("AGENT_RETENTION_SETTLE_SECONDS", "900")),
+            abandoned_thread_ttl_hours=float(os.getenv("AGENT_RETENTION_THREAD_TTL_HOURS", "0")),
+            batch_size=int(os.getenv("AGENT_RETENTION_BATCH_SIZE", "50")),
+            max_threads_per_pass=int(os.getenv("AGENT_RETENTION_MAX_THREADS_PER_PASS", "1000")),
+            dry_run=os.getenv("AGENT_RETENTION_DRY_RUN", "false").lower() == "true",
+        )
+
+
+@dataclass
+class Reclaimed:
+    """Rows and bytes deleted (or, in a dry run, deletable) per table."""
+
+    rows: Dict[str, int] = field(default_factory=dict)
+    bytes: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, table: str, rows: int, nbytes: int) -> None:
+        """Count `rows` rows and `nbytes` bytes of `table`."""
+        self.rows[table] = self.rows.get(table, 0) + int(rows or 0)
+        self.bytes[table] = self.bytes.get(table, 0) + int(nbytes or 0)
+
+    def merge(self, other: "Reclaimed") -> None:
+        """Add the counts of `other`."""
+        for table in other.rows:
+            self.add(table, other.rows[table], other.bytes.get(table, 0))
+
+    @property
+    def total_bytes(self) -> int:
+        """Bytes over all tables."""
+        return sum(self.bytes.values())
+
+
+@dataclass
+class RetentionReport:
+    """Outcome of one retention pass."""
+
+    threads_scanned: int = 0
+    threads_compacted: int = 0
+    threads_expired: int = 0
+    threads_skipped: int = 0
+    runs_compacted: int = 0
+    channels_materialized: int = 0
+    reclaimed: Reclaimed = field(default_factory=Reclaimed)
+    seconds: float = 0.0
+    dry_run: bool = False
+    finished_at: str | None = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the report as JSON-ready values, with the total reclaimed bytes."""
+        report = asdict(self)
+        report["reclaimed_bytes"] = self.reclaimed.total_bytes
+        report["seconds"] = round(self.seconds, 3)
+        return report
+
+
+@dataclass
+class CheckpointRow:
+    """A thread's root checkpoint, with the metadata retention plans on."""
+
+    checkpoint_id: str
+    parent_checkpoint_id: str | None
+    ts: datetime.datetime
+    source: str | None
+    run_id: str | None
+    # The kept final checkpoint of a compacted run
+    retained: bool = False
+
+
+class ThreadBusy(Exception):
+    """The thread's rows are locked or changed while compacting; retry on the next pass."""
+
+
+def _parse_ts(ts: str | None) -> datetime.datetime:
+    if not ts:
+        return datetime.datetime.min.replace(tzinfo=datetime.UTC)
+    return datetime.datetime.fromisoformat(ts)
+
+
+def plan_runs(rows: Sequence[CheckpointRow], now: datetime.datetime, settle_seconds: float) -> Tuple[List[str], List[Tuple[str, str | None]]]:
+    """Checkpoint ids to drop, and (kept final checkpoint, new parent) pairs that re-chain the history.
+
+    `rows` are one thread's root checkpoints in id (= time) order. A run starts at
+    an `input` checkpoint, after the kept final checkpoint of a compacted run, or
+    when the run id changes; all checkpoints of a completed run except its last
+    are dropped.
+    """
+    runs: List[List[CheckpointRow]] = []
+    for row in rows:
+        previous = runs[-1][-1] if runs else None
+        new_run = (
+            previous is None
+            or previous.retained
+            or row.source == "input"
+            or bool(row.run_id and previous.run_id and row.run_id != previous.run_id)
+        )
+        if new_run:
+            runs.append([row])
+        else:
+            runs[-1].append(row)
+    if runs and (now - runs[-1][-1].ts).total_seconds() < settle_seconds:
+        runs = runs[:-1]
+
+    drop: List[str] = []
+    rechain: List[Tuple[str, str | None]] = []
+    previous_final: str | None = None
+    for run in runs:
+        if len(run) > 1:
+            drop.extend(row.checkpoint_id for row in run[:-1])
+            rechain.append((run[-1].checkpoint_id, previous_final))
+        previous_final = run[-1].checkpoint_id
+    return drop, rechain
+
+
+class PostgresRetentionBackend:
+    """Checkpoint tables of `langgraph-checkpoint-postgres` (and the LangGraph server)."""
+
+    def __init__(self, conn_string: str, lock_timeout_ms: int = 200):
+        """Connect to `conn_string`; statements wait at most `lock_timeout_ms` for row locks."""
+        try:
+            import psycopg
+            from langgraph.checkpoint.postgres import PostgresSaver
+            from psycopg.rows import dict_row
+        except ImportError as e:
+            raise ImportError("Postgres retention needs langgraph-checkpoint-postgres: pip install -e .[checkpoint]") from e
+        self._errors = (psycopg.errors.LockNotAvailable, psycopg.errors.QueryCanceled, psycopg.errors.SerializationFailure)
+        self.conn = psycopg.Connection.connect(conn_string, autocommit=True, prepare_threshold=0, row_factory=dict_row)
+        self.saver = PostgresSaver(self.conn, serde=CompactSerializer())
+        self.lock_timeout_ms = lock_timeout_ms
+
+    def close(self) -> None:
+        """Close the connection."""
+        self.conn.close()
+
+    def list_threads(self, after: str, limit: int) -> List[str]:
+        """Return up to `limit` thread ids after `after`, in order."""
+        rows = self.conn.execute(
+            "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id > %s ORDER BY thread_id LIMIT %s",
+            (after, limit),
+        ).fetchall()
+        return [row["thread_id"] for row in rows]
+
+    def list_checkpoints(self, thread_id: str) -> List[CheckpointRow]:
+        """Return the thread's root checkpoints in id order."""
+        rows = self.conn.execute(
+            "SELECT checkpoint_id, parent_checkpoint_id, checkpoint->>'ts' AS ts, metadata->>'source' AS source, "
+            "metadata->>'run_id' AS run_id, metadata ? 'retention' AS retained FROM checkpoints WHERE thread_id = %s AND checkpoint_ns = '' ORDER BY checkpoint_id",
+            (thread_id,),
+        ).fetchall()
+        return [CheckpointRow(r["checkpoint_id"], r["parent_checkpoint_id"], _parse_ts(r["ts"]), r["source"], r["run_id"], r["retained"])
+                for r in rows]
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        try:
+            with self.conn.transaction(), self.conn.cursor() as cur:
+                # Give way to the server: fail fast instead of queueing behind (or blocking) a run's writes
+                cur.execute("SELECT set_config('lock_timeout', %s, true)", (f"{self.lock_timeout_ms}ms",))
+                cur.execute("SELECT set_config('statement_timeout', %s, true)", (f"{self.lock_timeout_ms * 50}ms",))
+                yield cur
+        except self._errors as e:
+            raise ThreadBusy(str(e)) from e
+
+    @staticmethod
+    def _delete(cur, table: str, where: str, size: str, params: tuple, reclaimed: Reclaimed, dry_run: bool) -> None:
+        if dry_run:
+            sql = f"SELECT count(*) AS n, coalesce(sum({size}), 0) AS bytes FROM {table} t WHERE {where}"
+        else:
+            sql = (f"WITH d AS (DELETE FROM {table} t WHERE {where} RETURNING {size} AS size) "
+                   "SELECT count(*) AS n, coalesce(sum(size), 0) AS bytes FROM d")
+        row = cur.execute(sql, params).fetchone()
+        reclaimed.add(table, row["n"], row["bytes"])
+
+    def _delete_orphan_blobs(self, cur, thread_id: str, reclaimed: Reclaimed, dry_run: bool) -> None:
+        where = (
+            "t.thread_id = %s AND t.checkpoint_ns = '' AND NOT EXISTS (SELECT 1 FROM checkpoints c "
+            "WHERE c.thread_id = t.thread_id AND c.checkpoint_ns = t.checkpoint_ns "
+            "AND c.checkpoint -> 'channel_versions' ->> t.channel = t.version)"
+        )
+        self._delete(cur, "checkpoint_blobs", where, "coalesce(octet_length(t.blob), 0)", (thread_id,), reclaimed, dry_run)
+
+    def compact(self, thread_id: str, drop: Sequence[str], rechain: Sequence[Tuple[str, str | None]],
+                snapshots: Mapping[str, Tuple[Dict[str, Any], Dict[str, Any]]], dry_run: bool) -> Reclaimed:
+        """Store the materialized `snapshots`, re-chain the kept checkpoints and delete `drop`, in one transaction."""
+        reclaimed = Reclaimed()
+        with self._transaction() as cur:
+            if not dry_run:
+                for checkpoint_id, (checkpoint, values) in snapshots.items():
+                    for channel, value in values.items():
+                        type_, blob = self.saver.serde.dumps_typed(value)
+                        cur.execute(
+                            "INSERT INTO checkpoint_blobs (thread_id, checkpoint_ns, channel, version, type, blob) "
+                            "VALUES (%s, '', %s, %s, %s, %s) ON CONFLICT (thread_id, checkpoint_ns, channel, version) "
+                            "DO UPDATE SET type = EXCLUDED.type, blob = EXCLUDED.blob",
+                            (thread_id, channel, str(checkpoint["channel_versions"][channel]), type_, blob),
+                        )
+                        # The marker `put` leaves for a blob-stored snapshot
+                        cur.execute(
+                            "UPDATE checkpoints SET checkpoint = jsonb_set(checkpoint, ARRAY['channel_values', %s], 'true'::jsonb) "
+                            "WHERE thread_id = %s AND checkpoint_ns = '' AND checkpoint_id = %s",
+                            (channel, thread_id, checkpoint_id),
+                        )
+                for checkpoint_id, parent_id in rechain:
+                    cur.execute(
+                        "UPDATE checkpoints SET parent_checkpoint_id = %s, metadata = metadata || %s::jsonb "
+                        "WHERE thread_id = %s AND checkpoint_ns = '' AND checkpoint_id = %s",
+                        (parent_id, json.dumps(RETAINED_MARK), thread_id, checkpoint_id),
+                    )
+            ids = (thread_id, list(drop))
+            where = "t.thread_id = %s AND t.checkpoint_ns = '' AND t.checkpoint_id = ANY(%s)"
+            self._delete(cur, "checkpoint_writes", where, "octet_length(t.blob)", ids, reclaimed, dry_run)
+            self._delete(cur, "checkpoints", where, "pg_column_size(t.checkpoint) + pg_column_size(t.metadata)", ids, reclaimed, dry_run)
+            if not dry_run:
+                self._delete_orphan_blobs(cur, thread_id, reclaimed, dry_run)
+        return reclaimed
+
+    def delete_thread(self, thread_id: str, expected_latest: str, dry_run: bool) -> Reclaimed:
+        """Delete the thread, unless it has checkpoints newer than `expected_latest`."""
+        reclaimed = Reclaimed()
+        with self._transaction() as cur:
+            latest = cur.execute(
+                "SELECT max(checkpoint_id) AS latest FROM checkpoints WHERE thread_id = %s AND checkpoint_ns = ''", (thread_id,)
+            ).fetchone()["latest"]
+            if latest != expected_latest:
+                raise ThreadBusy(f"thread {thread_id} has new checkpoints")
+            where = "t.thread_id = %s"
+            self._delete(cur, "checkpoint_writes", where, "octet_length(t.blob)", (thread_id,), reclaimed, dry_run)
+            self._delete(cur, "checkpoint_blobs", where, "coalesce(octet_length(t.blob), 0)", (thread_id,), reclaimed, dry_run)
+            self._delete(cur, "checkpoints", where, "pg_column_size(t.checkpoint) + pg_column_size(t.metadata)", (thread_id,), reclaimed, dry_run)
+        return reclaimed
+
+
+class SqliteRetentionBackend:
+    """Checkpoint tables of `langgraph-checkpoint-sqlite`; channel values live inside the checkpoint row."""
+
+    def __init__(self, path: str, lock_timeout_ms: int = 200):
+        """Open the database at `path`, waiting at most `lock_timeout_ms` for a locked database."""
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError as e:
+            raise ImportError("SQLite retention needs langgraph-checkpoint-sqlite") from e
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=lock_timeout_ms / 1000)
+        self.saver = SqliteSaver(self.conn, serde=CompactSerializer())
+        self.saver.setup()
+
+    def close(self) -> None:
+        """Close the connection."""
+        self.conn.close()
+
+    def list_threads(self, after: str, limit: int) -> List[str]:
+        """Return up to `limit` thread ids after `after`, in order."""
+        rows = self.conn.execute(
+            "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id > ? ORDER BY thread_id LIMIT ?", (after, limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def list_checkpoints(self, thread_id: str) -> List[CheckpointRow]:
+        """Return the thread's root checkpoints in id order."""
+        rows = self.conn.execute(
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = '' ORDER BY checkpoint_id",
+            (thread_id,),
+        ).fetchall()
+        result = []
+        for checkpoint_id, parent_id, type_, checkpoint, metadata in rows:
+            ts = self.saver.serde.loads_typed((type_, checkpoint)).get("ts")
+            meta = json.loads(metadata) if metadata else {}
+            result.append(CheckpointRow(checkpoint_id, parent_id, _parse_ts(ts), meta.get("source"), meta.get("run_id"), "retention" in meta))
+        return result
+
+    def _delete(self, table: str, where: str, size: str, params: tuple, reclaimed: Reclaimed, dry_run: bool) -> None:
+        n, nbytes = self.conn.execute(f"SELECT count(*), coalesce(sum({size}), 0) FROM {table} WHERE {where}", params).fetchone()
+        if not dry_run:
+            self.conn.execute(f"DELETE FROM {table} WHERE {where}", params)
+        reclaimed.add(table, n, nbytes)
+
+    def compact(self, thread_id: str, drop: Sequence[str], rechain: Sequence[Tuple[str, str | None]],
+                snapshots: Mapping[str, Tuple[Dict[str, Any], Dict[str, Any]]], dry_run: bool) -> Reclaimed:
+        """Store the materialized `snapshots`, re-chain the kept checkpoints and delete `drop`, in one transaction."""
+        reclaimed = Reclaimed()
+        try:
+            with self.conn:
+                if not dry_run:
+                    for checkpoint_id, (checkpoint, values) in snapshots.items():
+                        checkpoint = {**checkpoint, "channel_values": {**checkpoint["channel_values"], **values}}
+                        type_, blob = self.saver.serde.dumps_typed(checkpoint)
+                        self.conn.execute(
+                            "UPDATE checkpoints SET type = ?, checkpoint = ? WHERE thread_id = ? AND checkpoint_ns = '' AND checkpoint_id = ?",
+                            (type_, blob, thread_id, checkpoint_id),
+                        )
+                    for checkpoint_id, parent_id in rechain:
+                        key = (thread_id, checkpoint_id)
+                        (metadata,) = self.conn.execute(
+                            "SELECT metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' AND checkpoint_id = ?", key
+                        ).fetchone()
+                        metadata = json.dumps({**json.loads(metadata or b"{}"), **RETAINED_MARK}, ensure_ascii=False).encode("utf-8")
+                        self.conn.execute(
+                            "UPDATE checkpoints SET parent_checkpoint_id = ?, metadata = ? WHERE thread_id = ? AND checkpoint_ns = '' AND checkpoint_id = ?",
+                            (parent_id, metadata, *key),
+                        )
+                for start in range(0, len(drop), 500):
+                    chunk = list(drop[start:start + 500])
+                    where = f"thread_id = ? AND checkpoint_ns = '' AND checkpoint_id IN ({','.join('?' * len(chunk))})"
+                    self._delete("writes", where, "length(value)", (thread_id, *chunk), reclaimed, dry_run)
+                    self._delete("checkpoints", where, "length(checkpoint) + length(metadata)", (thread_id, *chunk), reclaimed, dry_run)
+        except sqlite3.OperationalError as e:
+            raise ThreadBusy(str(e)) from e
+        return reclaimed
+
+    def delete_thread(self, thread_id: str, expected_latest: str, dry_run: bool) -> Reclaimed:
+        """Delete the thread, unless it has checkpoints newer than `expected_latest`."""
+        reclaimed = Reclaimed()
+        try:
+            with self.conn:
+                latest = self.conn.execute(
+                    "SELECT max(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''", (thread_id,)
+                ).fetchone()[0]
+                if latest != expected_latest:
+                    raise ThreadBusy(f"thread {thread_id} has new checkpoints")
+                self._delete("writes", "thread_id = ?", "length(value)", (thread_id,), reclaimed, dry_run)
+                self._delete("checkpoints", "thread_id = ?", "length(checkpoint) + length(metadata)", (thread_id,), reclaimed, dry_run)
+        except sqlite3.OperationalError as e:
+            raise ThreadBusy(str(e)) from e
+        return reclaimed
+
+
+def open_backend(conn_string: str, lock_timeout_ms: int = 200):
+    """Open a Postgres backend for postgres:// URIs, SQLite for file paths (optionally `sqlite:///path`)."""
+    if conn_string.startswith(("postgres://", "postgresql://")):
+        return PostgresRetentionBackend(conn_string, lock_timeout_ms)
+    return SqliteRetentionBackend(conn_string.removeprefix("sqlite:///"), lock_timeout_ms)
+
+
+def graph_delta_channels() -> Dict[str, Any]:
+    """Return the write-once (`DeltaChannel`) channels of the agent graph; none on langgraph releases without them."""
+    from agent.state import DeltaChannel
+
+    if DeltaChannel is None:
+        return {}
+    from agent.graph import graph
+
+    return {name: channel for name, channel in graph.channels.items() if isinstance(channel, DeltaChannel)}
+
+
+class RetentionJob:
+    """Incremental retention passes over one checkpoint database."""
+
+    def __init__(self, backend, policy: RetentionPolicy | None = None, delta_channels: Mapping[str, Any] | None = None):
+        """Apply `policy` to `backend`; `delta_channels` defaults to the agent graph's write-once channels."""
+        self.backend = backend
+        self.policy = policy or RetentionPolicy()
+        self.delta_channels = graph_delta_channels() if delta_channels is None else dict(delta_channels)
+        # Last thread visited; the next pass continues after it and wraps around at the end
+        self._cursor = ""
+        self.last_report: RetentionReport | None = None
+
+    def _materialize(self, thread_id: str, checkpoint_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]] | None:
+        """Full values of the write-once channels a checkpoint only stores as deltas."""
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": checkpoint_id}}
+        saved = self.backend.saver.get_tuple(config)
+        if saved is None:
+            return None
+        checkpoint = saved.checkpoint
+        missing = [
+            name for name in self.delta_channels
+            if name in checkpoint["channel_versions"] and name not in checkpoint["channel_values"]
+        ]
+        if not missing:
+            return None
+        from langgraph.checkpoint.serde.types import _DeltaSnapshot
+
+        history = self.backend.saver.get_delta_channel_history(config=saved.config, channels=missing)
+        values = {}
+        for name in missing:
+            channel = self.delta_channels[name]
+            # Without a stored seed the value starts empty (a plain value is used as is)
+            channel = channel.from_checkpoint(history[name].get("seed", channel.typ()))
+            channel.replay_writes(history[name]["writes"])
+            values[name] = _DeltaSnapshot(channel.get())
+        return checkpoint, values
+
+    def _process_thread(self, thread_id: str, now: datetime.datetime, report: RetentionReport) -> None:
+        policy = self.policy
+        rows = self.backend.list_checkpoints(thread_id)
+        if not rows:
+            return
+        idle_seconds = (now - rows[-1].ts).total_seconds()
+        if policy.abandoned_thread_ttl_hours and idle_seconds > policy.abandoned_thread_ttl_hours * 3600:
+            reclaimed = self.backend.delete_thread(thread_id, rows[-1].checkpoint_id, policy.dry_run)
+            report.threads_expired += 1
+            report.reclaimed.merge(reclaimed)
+            metrics.inc("agent_retention_threads_total", action="expired")
+            return
+        if not policy.keep_final_checkpoint_per_run:
+            return
+        drop, rechain = plan_runs(rows, now, policy.settle_seconds)
+        if not drop:
+            return
+        snapshots = {}
+        if not policy.dry_run:
+            for checkpoint_id, _ in rechain:
+                materialized = self._materialize(thread_id, checkpoint_id)
+                if materialized is not None:
+                    snapshots[checkpoint_id] = materialized
+                    report.channels_materialized += len(materialized[1])
+        reclaimed = self.backend.compact(thread_id, drop, rechain, snapshots, policy.dry_run)
+        report.threads_compacted += 1
+        report.runs_compacted += len(rechain)
+        report.reclaimed.merge(reclaimed)
+        metrics.inc("agent_retention_threads_total", action="compacted")
+
+    def run_pass(self) -> RetentionReport:
+        """Visit up to `max_threads_per_pass` threads, continuing after the previous pass."""
+        policy = self.policy
+        report = RetentionReport(dry_run=policy.dry_run)
+        start = time.perf_counter()
+        now = datetime.datetime.now(datetime.UTC)
+        while report.threads_scanned < policy.max_threads_per_pass:
+            limit = min(policy.batch_size, policy.max_threads_per_pass - report.threads_scanned)
+            threads = self.backend.list_threads(self._cursor, limit)
+            for thread_id in threads:
+                report.threads_scanned += 1
+                try:
+                    self._process_thread(thread_id, now, report)
+                except ThreadBusy as e:
+                    report.threads_skipped += 1
+                    metrics.inc("agent_retention_threads_total", action="skipped")
+                    logger.info("Retention skipped thread %s: %s", thread_id, e)
+                self._cursor = thread_id
+            if len(threads) < limit:
+                # End of the table: the next pass starts over
+                self._cursor = ""
+                break
+            time.sleep(policy.pause_seconds)
+
+        report.seconds = time.perf_counter() - start
+        report.finished_at = datetime.datetime.now(datetime.UTC).isoformat()
+        if not policy.dry_run:
+            for table, nbytes in report.reclaimed.bytes.items():
+                metrics.inc("agent_retention_reclaimed_bytes_total", nbytes, table=table)
+                metrics.inc("agent_retention_rows_total", report.reclaimed.rows[table], table=table)
+        metrics.observe("agent_retention_pass_seconds", report.seconds)
+        self.last_report = report
+        return report
+
+
+_job: RetentionJob | None = None
+
+
+def retention_status() -> Dict[str, Any]:
+    """Return whether background retention runs, its policy and the last pass."""
+    if _job is None:
+        return {"enabled": False, "interval_minutes": RETENTION_INTERVAL_MINUTES}
+    return {
+        "enabled": True,
+        "interval_minutes": RETENTION_INTERVAL_MINUTES,
+        "policy": asdict(_job.policy),
+        "last_report": _job.last_report.as_dict() if _job.last_report else None,
+    }
+
+
+async def retention_loop() -> None:
+    """Background retention passes every AGENT_RETENTION_INTERVAL_MINUTES on AGENT_RETENTION_DATABASE."""
+    global _job
+    if not RETENTION_INTERVAL_MINUTES or not RETENTION_DATABASE:
+        return
+    backend = await asyncio.to_thread(open_backend, RETENTION_DATABASE)
+    _job = RetentionJob(backend, RetentionPolicy.from_env())
+    logger.info("Checkpoint retention every %g min (%s)", RETENTION_INTERVAL_MINUTES, asdict(_job.policy))
+    try:
+        while True:
+            try:
+                report = await asyncio.to_thread(_job.run_pass)
+                logger.info("Retention pass: %d threads, %d compacted, %d expired, %d bytes reclaimed in %.1fs",
+                            report.threads_scanned, report.threads_compacted, report.threads_expired,
+                            report.reclaimed.total_bytes, report.seconds)
+            except Exception as e:
+                logger.warning("Retention pass failed: %s", e)
+            await asyncio.sleep(RETENTION_INTERVAL_MINUTES * 60)
+    finally:
+        backend.close()
+
+
+def main() -> None:
+    """Apply the retention policy once and print the report."""
+    parser = argparse.ArgumentParser(description="Apply the checkpoint retention policy once.")
+    parser.add_argument("database", nargs="?", default=RETENTION_DATABASE, help="Postgres URI or SQLite file")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be reclaimed without deleting")
+    parser.add_argument("--settle-seconds", type=float, help="Age after which a run's last checkpoint counts as final")
+    parser.add_argument("--thread-ttl-hours", type=float, help="Delete threads idle for longer (0 keeps them)")
+    parser.add_argument("--max-threads", type=int, help="Threads to visit in this pass")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not args.database:
+        parser.error("no database: pass one or set AGENT_RETENTION_DATABASE / DATABASE_URI")
+
+    policy = RetentionPolicy.from_env()
+    policy.dry_run = args.dry_run or policy.dry_run
+    if args.settle_seconds is not None:
+        policy.settle_seconds = args.settle_seconds
+    if args.thread_ttl_hours is not None:
+        policy.abandoned_thread_ttl_hours = args.thread_ttl_hours
+    if args.max_threads is not None:
+        policy.max_threads_per_pass = args.max_threads
+    backend = open_backend(args.database, policy.lock_timeout_ms)
+    try:
+        report = RetentionJob(backend, policy).run_pass()
+    finally:
+        backend.close()
+    print(json.dumps(report.as_dict(), indent=2))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Complexity routing at the start of a run.
+
+Simple factual questions ("what is the capital of X") take the fast path: one
+search and one answer-and-report call on the answer model. Everything else
+takes the deep research loop (query generation, parallel search, o3
+reflection, final answer, code analysis and report).
+
+The route is chosen by a local heuristic (no LLM call, the default) or by the
+query generator model, and can be forced with `research_route` in
+Configuration. End-to-end latency and run counts are recorded per route.
+"""
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from langchain_core.messages import AnyMessage, HumanMessage
+
+from agent.metrics import metrics
+
+ROUTES = ("fast", "deep")
+# Longer questions almost always ask for more than one fact
+SIMPLE_MAX_WORDS = 16
+ROUTE_BUCKETS = (1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0, 90.0, 120.0, 180.0, 300.0)
+
+# Asking for analysis, comparison, explanation or a report
+COMPLEX_CUES = re.compile(
+    r"\b(compar\w*|versus|vs\.?|differences?|analy[sz]\w*|trends?|forecast\w*|predict\w*|impacts?|implications?|"
+    r"pros and cons|advantages|disadvantages|evaluat\w*|assess\w*|research|report|in[- ]depth|detailed|comprehensive|"
+    r"overview|history of|evolution|why|how (does|do|did|can|could|should|would)|strateg\w*|recommend\w*|should i|"
+    r"step[- ]by[- ]step|plan|outlook|latest|recent|news)\b",
+    re.IGNORECASE,
+)
+# Needing calculations or visualizations, which only the deep path can run
+COMPUTE_CUES = re.compile(
+    r"\b(calculat\w*|comput\w*|charts?|plots?|graphs?|visuali[sz]\w*|statistic\w*|percent\w*|growth rate|average|"
+    r"correlat\w*|data ?set)\b",
+    re.IGNORECASE,
+)
+# A single fact: who/what/when/where, yes/no, a count or a definition
+FACTUAL_LEAD = re.compile(
+    r"^\s*(who|what|when|where|which|whose|is|are|was|were|does|did|do|can|define|how (many|much|old|tall|long|far|big))\b",
+    re.IGNORECASE,
+)
+# A follow-up that only makes sense with the earlier turns: it continues them, or refers back to
+# something in them anywhere in the question ("What is its population?")
+FOLLOW_UP_LEAD = re.compile(r"^\s*(and|but|also|what about|how about)\b", re.IGNORECASE)
+ANAPHORA = re.compile(
+    r"\b(it|its|they|them|their|theirs|that|this|those|these|he|him|his|she|her|hers|there|then|former|latter)\b",
+    re.IGNORECASE,
+)
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("agent_route_total", "Runs per research route (fast or deep) and classifier.")
+metrics.describe("agent_route_seconds", "End-to-end run latency per research route.")
+
+
+@dataclass
+class RouteDecision:
+    """The chosen route, why, and which classifier chose it."""
+
+    route: str
+    reason: str
+    classifier: str
+
+
+def latest_question(messages: List[AnyMessage]) -> str:
+    """Return the text of the last user message, or "" when there is none."""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else str(message.content)
+    return ""
+
+
+def needs_conversation(question: str, has_history: bool) -> bool:
+    """Whether the question cannot be searched on its own, because it continues or refers to earlier turns."""
+    return has_history and bool(FOLLOW_UP_LEAD.match(question) or ANAPHORA.search(question))
+
+
+def classify_heuristic(question: str, has_history: bool = False) -> RouteDecision:
+    """Route by length and wording: fast only for short, single, factual questions."""
+    words = question.split()
+    if not words:
+        return RouteDecision("deep", "empty question", "heuristic")
+    if len(words) > SIMPLE_MAX_WORDS:
+        return RouteDecision("deep", f"{len(words)} words", "heuristic")
+    if question.count("?") > 1 or re.search(r"\w{3,}[.;!?]\s+[A-Z]", question):
+        return RouteDecision("deep", "several questions", "heuristic")
+    if needs_conversation(question, has_history):
+        return RouteDecision("deep", "follow-up needing the conversation", "heuristic")
+    for cues, label in ((COMPUTE_CUES, "computation"), (COMPLEX_CUES, "analysis")):
+        match = cues.search(question)
+        if match:
+            return RouteDecision("deep", f"{label} cue '{match.group(0).lower()}'", "heuristic")
+    if not FACTUAL_LEAD.match(question) and len(words) > 8:
+        return RouteDecision("deep", "not a factual question", "heuristic")
+    return RouteDecision("fast", "short factual question", "heuristic")
+
+
+def parse_route(content: str) -> RouteDecision | None:
+    """Read the classifier model's JSON answer; None when it is unusable."""
+    try:
+        answer = json.loads(content.strip().removeprefix("```json").removesuffix("```"))
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(answer, dict) or answer.get("route") not in ROUTES:
+        return None
+    return RouteDecision(answer["route"], str(answer.get("reason", ""))[:200], "llm")
+
+
+def count_route(decision: RouteDecision) -> None:
+    """Count the run under its route and classifier."""
+    metrics.inc("agent_route_total", route=decision.route, classifier=decision.classifier)
+    logger.info("Route: %s (%s: %s)", decision.route, decision.classifier, decision.reason)
+
+
+def record_route(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Record the finished run's latency under its route; returns the summary for message metadata."""
+    route = state.get("route") or "deep"
+    started = state.get("run_started_at")
+    seconds = round(time.time() - started, 3) if started else None
+    if seconds is not None:
+        metrics.observe("agent_route_seconds", seconds, buckets=ROUTE_BUCKETS, route=route)
+    return {"route": route, "route_reason": state.get("route_reason", ""), "seconds": seconds}
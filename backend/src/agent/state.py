@@ -1,34 +1,92 @@
 from __future__ import annotations
 
+import operator
+import os
 from dataclasses import dataclass, field
-from typing import TypedDict, Dict, Any, List
+from typing import Any, Dict, List, TypedDict
 
 from langgraph.graph import add_messages
 from typing_extensions import Annotated
 
+try:
+    # Only in recent langgraph releases (beta)
+    from langgraph.channels.delta import DeltaChannel
+except ImportError:
+    DeltaChannel = None
+
+# With AGENT_WRITE_ONCE_STATE=true, append-only fields are stored write-once: each item
+# is persisted with the step that produced it and checkpoints hold a full copy only every
+# WRITE_ONCE_SNAPSHOT_FREQUENCY updates, instead of re-serializing the growing list at
+# every super-step. It needs langgraph's DeltaChannel; without it (or by default) the
+# fields use the operator.add reducer and every checkpoint stores the full lists.
+WRITE_ONCE_STATE = os.getenv("AGENT_WRITE_ONCE_STATE", "false").lower() == "true" and DeltaChannel is not None
+WRITE_ONCE_SNAPSHOT_FREQUENCY = int(os.getenv("AGENT_WRITE_ONCE_SNAPSHOT_FREQUENCY", "16"))
 
-import operator
-from dataclasses import dataclass, field
-from typing_extensions import Annotated
+
+def _extend(current: list, writes: list) -> list:
+    """operator.add over a batch of writes, as DeltaChannel replays them."""
+    return current + [item for write in writes for item in write]
+
+
+if WRITE_ONCE_STATE:
+    AppendOnlyList = Annotated[list, DeltaChannel(_extend, snapshot_frequency=WRITE_ONCE_SNAPSHOT_FREQUENCY)]
+else:
+    AppendOnlyList = Annotated[list, operator.add]
 
 
 class OverallState(TypedDict):
     messages: Annotated[list, add_messages]
-    search_query: Annotated[list, operator.add]
-    web_research_result: Annotated[list, operator.add]
-    sources_gathered: Annotated[list, operator.add]
+    search_query: AppendOnlyList
+    web_research_result: AppendOnlyList
+    sources_gathered: AppendOnlyList
     initial_search_query_count: int
     max_research_loops: int
     research_loop_count: int
     reasoning_model: str
     # New fields for enhanced research flow
-    code_analysis_results: Annotated[list, operator.add]
+    code_analysis_results: AppendOnlyList
     generated_code: str  # Python code ready for execution
     code_analysis_needed: bool  # Whether code analysis is required
+    analysis_rationale: str
+    analysis_type: str
+    # finalize_answer's answer and UI metadata, for report_generator
+    finalized_content: str
+    finalize_metadata: Dict[str, Any]
+    # Set when finalize_answer already produced the final report (merged_finalize)
+    report_complete: bool
+    final_report: str
+    # Per-call LLM usage records (tokens, latency, retries), see agent.llm
+    llm_usage: AppendOnlyList
+    # Reflection cascade passes (escalation and latency saved), see agent.reflection_cascade
+    reflection_passes: AppendOnlyList
+    # What each search found, kept for follow-up turns of the thread, see agent.evidence
+    evidence: AppendOnlyList
+    # Lengths of web_research_result and evidence when the run started: later items are this turn's
+    results_turn_start: int
+    evidence_turn_start: int
+    # Per-branch gap checks of incremental reflection, see agent.incremental_reflection
+    gap_notes: AppendOnlyList
+    # The conversation as prompt text, built once per run, and the rolling summary of
+    # turns outside the history window, see agent.history
+    research_topic: str
+    history_summary: Dict[str, Any]
+    # Research route chosen at the start of the run ("fast" or "deep"), see agent.routing
+    route: str
+    route_reason: str
+    run_started_at: float
+    # Answer cache lookup of the run (outcome, similarity), see agent.answer_cache
+    answer_cache: Dict[str, Any]
+
+
+class OutputState(TypedDict):
+    """What a run returns and what `values` stream events carry; intermediate research stays in checkpoints."""
+
+    messages: Annotated[list, add_messages]
     final_report: str
 
 
 class ReflectionState(TypedDict):
+    research_topic: str
     is_sufficient: bool
     knowledge_gap: str
     follow_up_queries: Annotated[list, operator.add]
@@ -42,12 +100,15 @@ class Query(TypedDict):
 
 
 class QueryGenerationState(TypedDict):
+    research_topic: str
     query_list: list[Query]
 
 
 class WebSearchState(TypedDict):
     search_query: str
     id: str
+    # Only needed by the branch gap check of incremental reflection
+    research_topic: str
 
 
 class CodeGeneratorState(TypedDict):
@@ -0,0 +1,186 @@
+"""In-memory manifest for serving the built frontend and public assets.
+
+The directory is scanned once at startup; each request is a dictionary lookup
+instead of filesystem checks. Small files are kept in memory together with
+gzip (and, when the `brotli` package is installed, brotli) variants, and the
+variant is picked from the request's Accept-Encoding. Precompressed `.gz`/`.br`
+files produced by the build are used when present.
+
+Caching: hashed Vite bundles under `assets/` are immutable for a year;
+`index.html` is revalidated on every request with its ETag (304 when
+unchanged); other files are cached for an hour and revalidated by ETag.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+# Files up to this size are held in memory (with their compressed variants)
+SMALL_FILE_BYTES = int(os.getenv("STATIC_SMALL_FILE_BYTES", str(512 * 1024)))
+# Compressing tiny files costs more in headers than it saves
+MIN_COMPRESS_BYTES = 512
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+DEFAULT_CACHE = "public, max-age=3600"
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("image/webp", ".webp")
+
+
+@dataclass
+class Asset:
+    """One servable file and its cached representations."""
+
+    path: Path
+    media_type: str
+    etag: str
+    cache_control: str
+    size: int
+    # encoding ("identity", "gzip", "br") -> bytes held in memory
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+    # encoding -> precompressed file on disk, for files too large to keep in memory
+    files: Dict[str, Path] = field(default_factory=dict)
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """Map each encoding in an Accept-Encoding header value to its quality."""
+    accepted = {}
+    for part in value.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of one encoding of a file; each encoding is a representation of its own."""
+    return etag if encoding == "identity" else f'{etag[:-1]}-{encoding}"'
+
+
+def _base_etag(tag: str) -> str:
+    tag = tag.strip().removeprefix("W/")
+    for encoding in ("gzip", "br"):
+        if tag.endswith(f'-{encoding}"'):
+            return tag[:-len(encoding) - 2] + '"'
+    return tag
+
+
+class AssetManifest:
+    """Immutable index of the files below `root`, built once."""
+
+    def __init__(self, root: Path | None, small_file_bytes: int = SMALL_FILE_BYTES):
+        """Scan `root`, keeping files up to `small_file_bytes` (and their compressed variants) in memory."""
+        self.root = root
+        self.small_file_bytes = small_file_bytes
+        self.assets: Dict[str, Asset] = {}
+        if root is not None and root.is_dir():
+            self._scan(root)
+
+    def __bool__(self) -> bool:
+        """Whether any asset was found."""
+        return bool(self.assets)
+
+    def __contains__(self, rel_path: str) -> bool:
+        """Whether `rel_path` is a known asset."""
+        return rel_path in self.assets
+
+    def _cache_control(self, rel_path: str) -> str:
+        if rel_path.startswith("assets/"):
+            return IMMUTABLE_CACHE  # Vite content-hashes everything it writes here
+        if rel_path.endswith(".html"):
+            return REVALIDATE_CACHE
+        return DEFAULT_CACHE
+
+    def _scan(self, root: Path) -> None:
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith((".gz", ".br")):
+                    continue
+                path = Path(dirpath) / filename
+                rel_path = path.relative_to(root).as_posix()
+                self.assets[rel_path] = self._load(rel_path, path)
+
+    def _load(self, rel_path: str, path: Path) -> Asset:
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        size = path.stat().st_size
+        compressible = media_type.startswith(COMPRESSIBLE_TYPES) and size >= MIN_COMPRESS_BYTES
+
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        asset = Asset(
+            path=path,
+            media_type=media_type,
+            etag=f'"{digest.hexdigest()[:20]}"',
+            cache_control=self._cache_control(rel_path),
+            size=size,
+        )
+
+        precompressed = {"gzip": path.with_name(path.name + ".gz"), "br": path.with_name(path.name + ".br")}
+        if size <= self.small_file_bytes:
+            data = path.read_bytes()
+            asset.bodies["identity"] = data
+            if compressible:
+                for encoding, file in precompressed.items():
+                    if file.is_file():
+                        asset.bodies[encoding] = file.read_bytes()
+                if "gzip" not in asset.bodies:
+                    asset.bodies["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+                if "br" not in asset.bodies and BROTLI_AVAILABLE:
+                    asset.bodies["br"] = brotli.compress(data, quality=11)
+                # Keep a variant only when it is actually smaller
+                for encoding in ("gzip", "br"):
+                    if encoding in asset.bodies and len(asset.bodies[encoding]) >= size:
+                        del asset.bodies[encoding]
+        elif compressible:
+            asset.files = {encoding: file for encoding, file in precompressed.items() if file.is_file()}
+        return asset
+
+    def get(self, rel_path: str) -> Asset | None:
+        """Return the asset at `rel_path`, or None."""
+        return self.assets.get(rel_path)
+
+    def response(self, request: Request, asset: Asset) -> Response:
+        """Serve `asset`, honouring If-None-Match and Accept-Encoding."""
+        available = set(asset.bodies) | set(asset.files)
+        vary = {"Vary": "Accept-Encoding"} if available - {"identity"} else {}
+        accepted = parse_accept_encoding(request.headers.get("accept-encoding", ""))
+        encoding = next((e for e in ("br", "gzip") if e in available and accepted.get(e, 0) > 0), "identity")
+        headers = {"ETag": encoded_etag(asset.etag, encoding), "Cache-Control": asset.cache_control, **vary}
+
+        # Any encoding's ETag revalidates: they all name the same file content
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or asset.etag in (_base_etag(t) for t in if_none_match.split(","))):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if encoding in asset.bodies:
+            return Response(asset.bodies[encoding], media_type=asset.media_type, headers=headers)
+        if encoding in asset.files:
+            return FileResponse(asset.files[encoding], media_type=asset.media_type, headers=headers)
+        return FileResponse(asset.path, media_type=asset.media_type, headers=headers)
@@ -0,0 +1,124 @@
+"""Slim streaming profile for the UI.
+
+Nodes emit small `custom` progress events (a title and a one-line summary with
+counts and labels) for the ActivityTimeline, so clients no longer need the
+`updates` stream of full node outputs. A run's output is declared by the
+graph's output schema (`OutputState`); `values` events carry the full state,
+so clients that only render messages should stream `messages-tuple` and
+`custom` instead. Bulky values (visualization images,
+executed code) are written once to a content-addressed artifact store and
+referenced by URL from graph state and message metadata; `/artifacts/{name}`
+serves them with immutable caching.
+
+The store is a directory (AGENT_ARTIFACT_DIR, default `.artifacts`); with more
+than one replica it must be a shared volume.
+"""
+import base64
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+from langgraph.config import get_stream_writer
+
+ARTIFACT_DIR = os.getenv("AGENT_ARTIFACT_DIR", ".artifacts")
+ARTIFACT_ROUTE = "/artifacts"
+IMAGE_FORMATS = ("png", "jpeg", "jpg", "svg", "gif", "webp")
+ARTIFACT_NAME = re.compile(rf"^[0-9a-f]{{64}}\.({'|'.join(IMAGE_FORMATS)}|py|txt|json)$")
+# Snippets longer than this are cut in message metadata; the full text stays in graph state
+SOURCE_SNIPPET_CHARS = 300
+
+
+def emit_progress(node: str, title: str, data: str, **counts: Any) -> None:
+    """Send a progress event on the `custom` stream; a no-op when nobody streams it."""
+    get_stream_writer()({"type": "progress", "node": node, "title": title, "data": data, **counts})
+
+
+class ArtifactStore:
+    """Write-once files named by the SHA-256 of their content."""
+
+    def __init__(self, root: str = ARTIFACT_DIR):
+        """Keep artifacts in the `root` directory, created on the first write."""
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes, extension: str) -> str:
+        """Store `data` and return its artifact name; identical content is written once."""
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = self.root / name
+        if not path.exists():
+            with self._lock:
+                self.root.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+        return name
+
+    def path(self, name: str) -> Path | None:
+        """Return the file of a valid, existing artifact name."""
+        if not ARTIFACT_NAME.match(name):
+            return None
+        path = self.root / name
+        return path if path.is_file() else None
+
+
+_store: ArtifactStore | None = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Return the process-wide artifact store, created on first use."""
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
+
+
+def artifact_url(name: str) -> str:
+    """Return the URL `/artifacts/{name}` serves the artifact at."""
+    return f"{ARTIFACT_ROUTE}/{name}"
+
+
+def slim_visualization(visualization: Dict[str, Any]) -> Dict[str, Any]:
+    """Move a visualization's base64 image into the artifact store and reference it by URL."""
+    encoded = visualization.get("base64_data")
+    if not encoded:
+        return visualization
+    data = base64.b64decode(encoded)
+    extension = (visualization.get("format") or "png").lower()
+    name = get_artifact_store().put(data, extension if extension in IMAGE_FORMATS else "png")
+    slim = {k: v for k, v in visualization.items() if k != "base64_data"}
+    slim.update({"url": artifact_url(name), "bytes": len(data)})
+    return slim
+
+
+def slim_code_result(result: Any, inline_code: bool = False) -> Any:
+    """Replace a code analysis result's images (and, unless `inline_code`, its code) with artifact URLs."""
+    if not isinstance(result, dict):
+        return result
+    slim = dict(result)
+    if result.get("visualizations"):
+        slim["visualizations"] = [slim_visualization(v) for v in result["visualizations"]]
+    code = result.get("code_executed")
+    if code and not inline_code:
+        slim.pop("code_executed")
+        slim["code_url"] = artifact_url(get_artifact_store().put(code.encode("utf-8"), "py"))
+    return slim
+
+
+def slim_sources(sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Trim sources for message metadata to the fields the UI shows, with snippets cut short."""
+    slim = []
+    for source in sources:
+        snippet = source.get("snippet") or ""
+        if len(snippet) > SOURCE_SNIPPET_CHARS:
+            snippet = snippet[:SOURCE_SNIPPET_CHARS].rstrip() + "..."
+        slim.append({
+            "label": source.get("label", ""),
+            "short_url": source.get("short_url", ""),
+            "value": source.get("value", ""),
+            "snippet": snippet,
+            "scraped_successfully": source.get("scraped_successfully", False),
+        })
+    return slim
@@ -0,0 +1,104 @@
+"""Schema-constrained LLM calls for the pydantic models in agent.tools_and_schemas.
+
+Requests carry a strict `response_format` JSON schema, and replies are
+validated against the model. Malformed replies take a bounded repair path:
+first a local cleanup (code fences, prose around the JSON object), then at
+most `max_repairs` calls to the cheap model that rewrite the reply into the
+schema. Failures and repairs are counted per node and model, so malformed
+output shows up in /metrics instead of costing a search branch or an o3 call.
+"""
+import json
+import logging
+from typing import List, Tuple, Type, TypeVar
+
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, ValidationError
+
+from agent.llm import LLMResult, get_llm
+from agent.metrics import metrics
+from agent.prompts import (
+    build_prompt,
+    structured_repair_context,
+    structured_repair_instructions,
+)
+from agent.tools_and_schemas import structured_output
+
+metrics.describe("llm_structured_parse_failures_total", "Replies that did not validate against their schema, by node, model and stage.")
+metrics.describe("llm_structured_repairs_total", "Repairs of malformed structured replies, by node, method (local or llm) and outcome.")
+
+Model = TypeVar("Model", bound=BaseModel)
+
+logger = logging.getLogger(__name__)
+
+
+def _validate(schema: Type[Model], content: str) -> Model | None:
+    try:
+        return schema.model_validate_json(content)
+    except ValidationError:
+        return None
+
+
+def _local_repair(schema: Type[Model], content: str) -> Model | None:
+    """Strip code fences and prose around the outermost JSON object."""
+    start, end = content.find("{"), content.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    return _validate(schema, content[start:end + 1])
+
+
+def parse_structured(schema: Type[Model], content: str, node: str, model: str) -> Model | None:
+    """Validate a structured reply, repairing it locally; failures are counted for `node` and `model`."""
+    parsed = _validate(schema, content)
+    if parsed is not None:
+        return parsed
+    metrics.inc("llm_structured_parse_failures_total", node=node, model=model, stage="initial")
+    parsed = _local_repair(schema, content)
+    metrics.inc("llm_structured_repairs_total", node=node, method="local", outcome="ok" if parsed else "failed")
+    return parsed
+
+
+def structured_chat(
+    node: str,
+    config: RunnableConfig | None,
+    schema: Type[Model],
+    repair_model: str,
+    max_repairs: int = 1,
+    **kwargs,
+) -> Tuple[Model | None, LLMResult, List[dict]]:
+    """Chat completion bound to `schema`; returns (parsed model or None, first result, usage records).
+
+    Replies that cannot be repaired locally are rewritten by `repair_model`, at most
+    `max_repairs` times; None means the reply stayed unusable.
+    """
+    result = get_llm().chat(node, config, response_format=structured_output(schema), **kwargs)
+    usage = [result.usage]
+    parsed = parse_structured(schema, result.content, node, kwargs["model"])
+    content = result.content
+    for _ in range(max_repairs if parsed is None else 0):
+        try:
+            repair = get_llm().chat(
+                f"{node}_repair",
+                config,
+                model=repair_model,
+                messages=build_prompt(
+                    structured_repair_instructions,
+                    structured_repair_context,
+                    schema=json.dumps(schema.model_json_schema()),
+                    reply=content[:8000],
+                ),
+                response_format=structured_output(schema),
+                temperature=0,
+            )
+        except Exception as e:
+            logger.warning("%s - structured output repair failed: %s", node, e)
+            metrics.inc("llm_structured_repairs_total", node=node, method="llm", outcome="error")
+            break
+        usage.append(repair.usage)
+        content = repair.content
+        parsed = _validate(schema, content) or _local_repair(schema, content)
+        metrics.inc("llm_structured_repairs_total", node=node, method="llm", outcome="ok" if parsed else "failed")
+        if parsed is not None:
+            break
+    if parsed is None:
+        metrics.inc("llm_structured_parse_failures_total", node=node, model=kwargs["model"], stage="final")
+    return parsed, result, usage
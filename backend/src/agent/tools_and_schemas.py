@@ -1,4 +1,4 @@
-from typing import List
+from typing import Any, Dict, List, Literal
 from pydantic import BaseModel, Field
 
 
@@ -21,3 +21,41 @@ class Reflection(BaseModel):
     follow_up_queries: List[str] = Field(
         description="A list of follow-up queries to address the knowledge gap."
     )
+    conflicting_evidence: bool = Field(
+        description="Whether sources contradict each other on facts or figures that matter to the answer."
+    )
+    confidence: float = Field(
+        description="Confidence in this assessment, from 0 (guess) to 1 (certain)."
+    )
+
+
+class FinalAnswer(BaseModel):
+    """The finalize_answer reply: the report and the code analysis decision."""
+
+    report: str = Field(
+        description="The user-facing markdown report answering the research question, with citations."
+    )
+    code_analysis_needed: bool = Field(
+        description="Whether computational analysis or visualization would add significant value."
+    )
+    analysis_rationale: str = Field(
+        description="A brief explanation of why computational analysis is or isn't beneficial."
+    )
+    analysis_type: Literal["visualization", "calculation", "statistical", "data_processing", "none"] = Field(
+        description="The kind of computational analysis to run, or 'none'."
+    )
+
+
+def structured_output(schema: type[BaseModel]) -> Dict[str, Any]:
+    """`response_format` for Azure OpenAI structured outputs: the reply is JSON matching `schema`.
+
+    Strict mode needs every property required and no additional properties, and the
+    json_schema format needs AZURE_OPENAI_API_VERSION 2024-08-01-preview or later.
+    """
+    json_schema = schema.model_json_schema()
+    json_schema["additionalProperties"] = False
+    json_schema["required"] = list(json_schema["properties"])
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema.__name__, "schema": json_schema, "strict": True},
+    }
@@ -0,0 +1,228 @@
+"""OpenTelemetry spans for graph runs.
+
+A run span covers the whole run; each node, LLM completion, provider search,
+scraped URL and sandbox execution becomes a child span carrying token, byte,
+cache and status attributes, so the critical path through the `web_research`
+fan-out can be read from a trace viewer or from `benchmarks/critical_path.py`.
+
+Select an exporter with AGENT_TRACING_EXPORTER:
+    none     (default) spans are not created at all
+    console  spans are printed as JSON to stdout
+    file     spans are appended as JSON lines to AGENT_TRACING_FILE
+    otlp     spans are sent over OTLP/HTTP (OTEL_EXPORTER_OTLP_ENDPOINT)
+
+The OpenTelemetry SDK is optional (`pip install -e .[tracing]`); without it
+every helper here is a no-op.
+"""
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SpanExporter,
+        SpanExportResult,
+    )
+    from opentelemetry.trace import Status, StatusCode
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+from agent.utils import get_run_id
+
+TRACING_EXPORTER = os.getenv("AGENT_TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("AGENT_TRACING_FILE", "traces/spans.jsonl")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "azureai-deepsearch-agent")
+MAX_OPEN_RUNS = 256
+
+logger = logging.getLogger(__name__)
+
+
+class _NoopSpan:
+    """Stand-in used when tracing is disabled or OpenTelemetry is not installed."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def set_status(self, *args, **kwargs) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+if OTEL_AVAILABLE:
+    class JsonLinesSpanExporter(SpanExporter):
+        """Append finished spans to a local file, one JSON document per line."""
+
+        def __init__(self, path: str):
+            """Write spans to `path`, creating its directory if needed."""
+            self.path = path
+            self._lock = threading.Lock()
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        def export(self, spans) -> "SpanExportResult":
+            """Append `spans` to the file."""
+            lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            """Nothing to release; every export closes the file."""
+
+
+_tracer = None
+_provider = None
+_tracer_lock = threading.Lock()
+
+
+def _build_exporter(name: str):
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "file":
+        return JsonLinesSpanExporter(TRACING_FILE)
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown AGENT_TRACING_EXPORTER: {name}")
+
+
+def get_tracer():
+    """Return the agent's tracer, or None when tracing is disabled."""
+    global _tracer, _provider
+    if _tracer is not None or TRACING_EXPORTER == "none" or not OTEL_AVAILABLE:
+        return _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+            _provider.add_span_processor(BatchSpanProcessor(_build_exporter(TRACING_EXPORTER)))
+            _tracer = _provider.get_tracer("agent")
+            logger.info("OpenTelemetry tracing enabled (%s exporter)", TRACING_EXPORTER)
+    return _tracer
+
+
+def shutdown_tracing() -> None:
+    """End unfinished run spans and flush pending spans; call before the process exits."""
+    if _provider is None:
+        return
+    for run_id in list(_open_runs):
+        end_run_span(run_id, error="run did not finish")
+    _provider.shutdown()
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Start a child span of the current span; yields a no-op span when tracing is off."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+    with tracer.start_as_current_span(name, attributes=_clean(attributes)) as current:
+        yield current
+
+
+def _clean(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in attributes.items() if v is not None}
+
+
+# Run spans stay open across nodes; nodes attach to them by run id
+_open_runs: "OrderedDict[str, Any]" = OrderedDict()
+_runs_lock = threading.Lock()
+
+
+def _run_key(config: dict | None) -> str:
+    run_id = get_run_id(config) or ((config or {}).get("configurable") or {}).get("thread_id") or "adhoc"
+    return str(run_id)
+
+
+def _run_span(run_id: str, start: bool):
+    tracer = get_tracer()
+    with _runs_lock:
+        current = _open_runs.get(run_id)
+        if current is None and start:
+            current = tracer.start_span("agent.run", context=otel_context.Context(), attributes={"agent.run_id": run_id})
+            _open_runs[run_id] = current
+            while len(_open_runs) > MAX_OPEN_RUNS:
+                _, stale = _open_runs.popitem(last=False)
+                stale.set_status(Status(StatusCode.ERROR, "run span evicted before the run finished"))
+                stale.end()
+        return current
+
+
+def end_run_span(run_id: str, error: str | None = None) -> None:
+    """End the run span of `run_id`, if one is open."""
+    with _runs_lock:
+        current = _open_runs.pop(run_id, None)
+    if current is not None:
+        if error:
+            current.set_status(Status(StatusCode.ERROR, error))
+        current.end()
+
+
+def traced_node(node: str, starts_run: bool = False, ends_run: bool = False) -> Callable:
+    """Wrap a graph node (sync or async) in a span that is a child of its run span.
+
+    The node flagged `starts_run` opens the run span and the one flagged `ends_run`
+    closes it; a failing node closes it with an error status.
+    """
+
+    def decorator(fn):
+        @contextlib.contextmanager
+        def _node_span(config):
+            run_id = _run_key(config)
+            parent = _run_span(run_id, start=starts_run)
+            ctx = trace.set_span_in_context(parent) if parent is not None else None
+            token = otel_context.attach(ctx) if ctx is not None else None
+            try:
+                with get_tracer().start_as_current_span(f"node.{node}", attributes={"agent.node": node, "agent.run_id": run_id}) as current:
+                    try:
+                        yield current
+                    except Exception as e:
+                        end_run_span(run_id, error=f"{node} failed: {e}")
+                        raise
+                if ends_run:
+                    end_run_span(run_id)
+            finally:
+                if token is not None:
+                    otel_context.detach(token)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(state, config):
+                if get_tracer() is None:
+                    return await fn(state, config)
+                with _node_span(config):
+                    return await fn(state, config)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(state, config):
+            if get_tracer() is None:
+                return fn(state, config)
+            with _node_span(config):
+                return fn(state, config)
+
+        return wrapper
+
+    return decorator
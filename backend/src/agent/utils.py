@@ -1,5 +1,22 @@
-from typing import Any, Dict, List
+import re
+from typing import Any, Callable, Dict, List, Tuple
 from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+
+def get_run_id(config: RunnableConfig | None) -> str | None:
+    """Get the id of the current graph run from a RunnableConfig, if there is one.
+
+    The LangGraph server puts it in `configurable`/`metadata`; direct invocations may pass it top-level.
+    """
+    if not config:
+        return None
+    run_id = (
+        config.get("run_id")
+        or config.get("configurable", {}).get("run_id")
+        or config.get("metadata", {}).get("run_id")
+    )
+    return str(run_id) if run_id else None
 
 
 def get_research_topic(messages: List[AnyMessage]) -> str:
@@ -36,6 +53,82 @@ def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
     return resolved_map
 
 
+class UrlMatcher:
+    """Single-pass matcher for a set of URLs (Aho-Corasick style, without a per-URL regex).
+
+    A tiny anchor regex finds the positions where any URL could start (the
+    distinct leading characters, usually just ``https://``); at each hit the
+    longest known URL starting there is found with one dict lookup per distinct
+    URL length. A URL that is a prefix of another never shadows the longer one.
+    """
+
+    def __init__(self, urls: List[str], anchor_chars: int = 8):
+        """Index `urls`; the anchor regex matches their first `anchor_chars` characters."""
+        self.urls = {url for url in urls if url}
+        self.lengths = sorted({len(url) for url in self.urls}, reverse=True)
+        self.anchor = None
+        if self.urls:
+            k = min(anchor_chars, self.lengths[-1])
+            prefixes = sorted({url[:k] for url in self.urls})
+            self.anchor = re.compile("|".join(map(re.escape, prefixes)))
+
+    def finditer(self, text: str):
+        """Yield non-overlapping (start, end, url) matches from left to right."""
+        if self.anchor is None:
+            return
+        position = 0
+        while True:
+            hit = self.anchor.search(text, position)
+            if hit is None:
+                return
+            start = hit.start()
+            for length in self.lengths:
+                if text[start:start + length] in self.urls:
+                    yield start, start + length, text[start:start + length]
+                    position = start + length
+                    break
+            else:
+                position = start + 1
+
+    def sub(self, replace: Callable[[str], str], text: str) -> str:
+        """Return `text` with every matched URL replaced by `replace(url)`."""
+        parts = []
+        position = 0
+        for start, end, url in self.finditer(text):
+            parts.append(text[position:start])
+            parts.append(replace(url))
+            position = end
+        if not parts:
+            return text
+        parts.append(text[position:])
+        return "".join(parts)
+
+
+def rewrite_source_urls(content: str, sources: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Replace every source `short_url` in `content` with its resolved `value` in a single pass.
+
+    Returns the rewritten content and the sources that are actually cited,
+    de-duplicated by short URL and kept in their original order.
+    """
+    by_short_url: Dict[str, Dict[str, Any]] = {}
+    for source in sources:
+        short_url = source.get("short_url")
+        if short_url and short_url not in by_short_url:
+            by_short_url[short_url] = source
+
+    if not by_short_url:
+        return content, []
+
+    cited = set()
+
+    def _replace(short_url: str) -> str:
+        cited.add(short_url)
+        return by_short_url[short_url].get("value", short_url)
+
+    content = UrlMatcher(list(by_short_url)).sub(_replace, content)
+    return content, [source for short_url, source in by_short_url.items() if short_url in cited]
+
+
 def insert_citation_markers(text, citations_list):
     """
     Inserts citation markers into a text string based on start and end indices.
@@ -50,29 +143,24 @@ def insert_citation_markers(text, citations_list):
     Returns:
         str: The text with citation markers inserted.
     """
-    # Sort citations by end_index in descending order.
-    # If end_index is the same, secondary sort by start_index descending.
-    # This ensures that insertions at the end of the string don't affect
-    # the indices of earlier parts of the string that still need to be processed.
+    # Sort citations by end_index, then start_index, so the text can be emitted
+    # front to back. Indices refer to the *original* text, so each chunk is sliced
+    # from it once and the result is assembled with a single join.
     sorted_citations = sorted(
-        citations_list, key=lambda c: (c["end_index"], c["start_index"]), reverse=True
+        citations_list, key=lambda c: (c["end_index"], c["start_index"])
     )
 
-    modified_text = text
+    parts = []
+    position = 0
     for citation_info in sorted_citations:
-        # These indices refer to positions in the *original* text,
-        # but since we iterate from the end, they remain valid for insertion
-        # relative to the parts of the string already processed.
         end_idx = citation_info["end_index"]
-        marker_to_insert = ""
+        parts.append(text[position:end_idx])
+        position = max(position, end_idx)
         for segment in citation_info["segments"]:
-            marker_to_insert += f" [{segment['label']}]({segment['short_url']})"
-        # Insert the citation marker at the original end_idx position
-        modified_text = (
-            modified_text[:end_idx] + marker_to_insert + modified_text[end_idx:]
-        )
+            parts.append(f" [{segment['label']}]({segment['short_url']})")
+    parts.append(text[position:])
 
-    return modified_text
+    return "".join(parts)
 
 
 def get_citations(response, resolved_urls_map):
@@ -0,0 +1,183 @@
+"""Warm-up and readiness for the server process.
+
+Agent modules import their heavy dependencies and create clients on first use so
+that importing the graph (pod start, autoscale-up, `langgraph dev` reloads) is
+fast. `warm_up` pays those costs right after the server binds: it imports heavy
+modules, builds the graph, creates the LLM and search clients, opens their
+HTTP connections, resolves the sandbox backend and opens the knowledge index.
+`/ready` reports not-ready until it has finished, so a load balancer only
+routes traffic to warm pods.
+"""
+import asyncio
+import importlib
+import logging
+import time
+from typing import Any, Callable, Dict, List
+
+from agent.configuration import Configuration
+from agent.metrics import metrics
+
+# Optional modules that are otherwise imported on the first search, scrape or sandbox run
+HEAVY_MODULES = (
+    "openai",
+    "aiohttp",
+    "bs4",
+    "serpapi",
+    "langchain_tavily",
+    "langchain_azure_dynamic_sessions",
+)
+
+# Upper bound for each connection-opening request, so a slow endpoint cannot stall readiness
+WARM_UP_TIMEOUT_SECONDS = 10
+
+logger = logging.getLogger(__name__)
+
+
+def _import_heavy_modules() -> None:
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def _build_graph() -> None:
+    importlib.import_module("agent.graph")
+
+
+def _create_llm_clients() -> None:
+    from agent.llm import get_llm
+
+    pool = get_llm().pool
+    pool.clients()
+    pool.clients(asynchronous=True)
+
+
+def _open_llm_connection() -> None:
+    import openai
+
+    from agent.llm import get_llm
+
+    # Any response, even an error status, leaves a warm TLS connection in the client's pool
+    for client in get_llm().pool.clients():
+        try:
+            client.with_options(timeout=WARM_UP_TIMEOUT_SECONDS).models.list()
+        except openai.APIStatusError:
+            pass
+
+
+def _create_research_tool() -> None:
+    from agent.web_research import get_research_tool
+
+    get_research_tool(Configuration.from_runnable_config().search_engine)
+
+
+def _resolve_sandbox() -> None:
+    if not Configuration.from_runnable_config().use_azure_sessions:
+        return
+    from agent.graph import resolve_sandbox_backend
+
+    resolve_sandbox_backend(probe=True)
+
+
+def _open_knowledge_index() -> None:
+    from agent.knowledge_index import get_knowledge_index, knowledge_index_enabled
+
+    if knowledge_index_enabled():
+        get_knowledge_index()
+
+
+WARM_UP_STEPS: Dict[str, Callable[[], None]] = {
+    "heavy_modules": _import_heavy_modules,
+    "graph": _build_graph,
+    "llm_clients": _create_llm_clients,
+    "llm_connection": _open_llm_connection,
+    "research_tool": _create_research_tool,
+    "sandbox": _resolve_sandbox,
+    "knowledge_index": _open_knowledge_index,
+}
+
+
+class WarmUpStatus:
+    """Progress of the process warm-up, reported by `/ready`."""
+
+    def __init__(self):
+        """Start out not started, with no steps run."""
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.steps: Dict[str, float] = {}
+        self.failed_steps: List[str] = []
+
+    @property
+    def ready(self) -> bool:
+        """Whether the warm-up has finished."""
+        return self.finished_at is not None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Status, duration and per-step seconds of the warm-up, as reported by `/ready`."""
+        duration = None
+        if self.started_at is not None:
+            duration = round((self.finished_at or time.perf_counter()) - self.started_at, 3)
+        return {
+            "status": "ready" if self.ready else ("warming_up" if self.started_at else "not_started"),
+            "warm_up_seconds": duration,
+            "steps": dict(self.steps),
+            "failed_steps": list(self.failed_steps),
+        }
+
+
+status = WarmUpStatus()
+
+metrics.describe("agent_warm_up_seconds", "Duration of the server warm-up before /ready reports ready.")
+
+
+def warm_up() -> Dict[str, float]:
+    """Run every warm-up step and return the seconds each took.
+
+    A failing step is reported and skipped; the request path will retry it.
+    """
+    if status.started_at is None:
+        status.started_at = time.perf_counter()
+    for name, step in WARM_UP_STEPS.items():
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            status.failed_steps.append(name)
+            logger.warning("Warm-up step %s failed: %s", name, e)
+        status.steps[name] = round(time.perf_counter() - start, 3)
+    return dict(status.steps)
+
+
+async def _open_async_llm_connection() -> None:
+    import openai
+
+    from agent.llm import get_llm
+
+    # Async connections belong to the event loop that opened them, so this runs on the server's loop
+    clients = get_llm().pool.clients(asynchronous=True)
+    results = await asyncio.gather(
+        *(client.with_options(timeout=WARM_UP_TIMEOUT_SECONDS).models.list() for client in clients),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, openai.APIStatusError):
+            raise result
+
+
+async def warm_up_server() -> Dict[str, Any]:
+    """Warm up from the server's event loop and mark the process ready."""
+    status.started_at = time.perf_counter()
+    await asyncio.to_thread(warm_up)
+    start = time.perf_counter()
+    try:
+        await _open_async_llm_connection()
+    except Exception as e:
+        status.failed_steps.append("async_llm_connection")
+        logger.warning("Warm-up step async_llm_connection failed: %s", e)
+    status.steps["async_llm_connection"] = round(time.perf_counter() - start, 3)
+    status.finished_at = time.perf_counter()
+    report = status.as_dict()
+    metrics.observe("agent_warm_up_seconds", report["warm_up_seconds"])
+    logger.info("Warm-up finished in %.2fs: %s", report["warm_up_seconds"], report["steps"])
+    return report
@@ -1,24 +1,38 @@
 """
 Enhanced web research tools with SerpAPI and Tavily integration.
+Pages are also served from the local knowledge index when it is enabled.
 Falls back to AI-based research if no search engine is configured.
 """
 import os
 import asyncio
-import aiohttp
+import importlib.util
+import logging
+import threading
+import time
 from typing import List, Dict, Any, Optional
-from serpapi import GoogleSearch
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+from agent.cassette import fingerprint, recorded
+from agent.knowledge_index import get_knowledge_index
+from agent.passage_ranker import best_passage, select_passages
+from agent.tracing import span
+
 # Load environment variables
 load_dotenv()
 
-# Try to import Tavily
-try:
-    from langchain_tavily import TavilySearch
-    TAVILY_AVAILABLE = True
-except ImportError:
-    TAVILY_AVAILABLE = False
+logger = logging.getLogger(__name__)
+
+# Search and scraping clients (serpapi, bs4, aiohttp, langchain_tavily) are imported on first use
+TAVILY_AVAILABLE = importlib.util.find_spec("langchain_tavily") is not None
+
+# Upper bound on page text kept after scraping; passage ranking picks from this
+MAX_SCRAPED_CHARS = 50000
+# Prompt budget per source once passages are ranked against the query
+SOURCE_TOKEN_BUDGET = 500
+# Length of the per-source excerpt appended to the research summary
+SOURCE_PREVIEW_CHARS = 200
+# Knowledge index modes: how local results are combined with live search
+KNOWLEDGE_INDEX_MODES = ("off", "local_first", "mixed")
 
 
 class WebResearchTool:
@@ -32,17 +46,17 @@ class WebResearchTool:
         # Initialize search tools based on availability and preference
         self.use_serpapi = False
         self.use_tavily = False
+        self.use_local = False
         self.tavily_tool = None
         
-        if self.search_engine == "tavily" and self.tavily_key and TAVILY_AVAILABLE:
+        if self.search_engine == "local":
+            # Answer only from the local knowledge index, never hit the network
+            self.use_local = True
+            logger.info("Initialized local knowledge index search engine")
+
+        elif self.search_engine == "tavily" and self.tavily_key and TAVILY_AVAILABLE:
             try:
-                self.tavily_tool = TavilySearch(
-                    max_results=20,
-                    topic="general",
-                    include_answer=True,
-                    include_raw_content=True,
-                    search_depth="advanced"
-                )
+                self.tavily_tool = self._create_tavily_tool()
                 self.use_tavily = True
                 print(f"Initialized Tavily search engine")
             except Exception as e:
@@ -53,16 +67,10 @@ class WebResearchTool:
             print(f"Initialized SerpAPI search engine")
         
         # Fallback logic
-        if not self.use_tavily and not self.use_serpapi:
+        if not self.use_tavily and not self.use_serpapi and not self.use_local:
             if self.tavily_key and TAVILY_AVAILABLE:
                 try:
-                    self.tavily_tool = TavilySearch(
-                        max_results=20,
-                        topic="general",
-                        include_answer=True,
-                        include_raw_content=True,
-                        search_depth="advanced"
-                    )
+                    self.tavily_tool = self._create_tavily_tool()
                     self.use_tavily = True
                     print("Falling back to Tavily search engine")
                 except Exception as e:
@@ -73,6 +81,18 @@ class WebResearchTool:
             else:
                 print("No search engines available. Using AI-based research fallback.")
     
+    @staticmethod
+    def _create_tavily_tool():
+        from langchain_tavily import TavilySearch
+
+        return TavilySearch(
+            max_results=20,
+            topic="general",
+            include_answer=True,
+            include_raw_content=True,
+            search_depth="advanced"
+        )
+
     def search_with_tavily(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
         """Search using Tavily API."""
         if not self.use_tavily or not self.tavily_tool:
@@ -101,7 +121,7 @@ class WebResearchTool:
                     "title": item.get("title", ""),
                     "url": item.get("url", ""),
                     "snippet": item.get("content", "")[:300] + "..." if len(item.get("content", "")) > 300 else item.get("content", ""),
-                    "content": item.get("content", ""),
+                    "content": item.get("raw_content") or item.get("content", ""),
                     "position": i + 1
                 })
             
@@ -111,13 +131,56 @@ class WebResearchTool:
             print(f"Error searching with Tavily: {e}")
             return []
     
-    def search_web(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
-        """Search the web using the configured search engine."""
+    @recorded(
+        "search",
+        lambda self, query, num_results=10, knowledge_mode="off", max_age_hours=None: (
+            fingerprint(self.search_engine, query, num_results, knowledge_mode),
+            fingerprint(self.search_engine, num_results),
+        ),
+    )
+    def search_web(
+        self,
+        query: str,
+        num_results: int = 10,
+        knowledge_mode: str = "off",
+        max_age_hours: float | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Search the web using the configured search engine.
+
+        `knowledge_mode` controls the local knowledge index: "local_first" returns
+        fresh local pages when there are enough of them and only searches live
+        otherwise, "mixed" merges fresh local pages with live results.
+        """
+        if self.use_local:
+            return self.search_local(query, num_results, max_age_hours)
+
+        local_results = []
+        if knowledge_mode in ("local_first", "mixed"):
+            local_results = self.search_local(query, num_results, max_age_hours)
+            # Only pages covering the query count (see KnowledgeIndex.search), and at least one is needed
+            if knowledge_mode == "local_first" and len(local_results) >= max(1, num_results // 2):
+                return local_results
+
         if self.use_tavily:
-            return self.search_with_tavily(query, num_results)
+            live_results = self.search_with_tavily(query, num_results)
         elif self.use_serpapi:
-            return self.search_with_serpapi(query, num_results)
+            live_results = self.search_with_serpapi(query, num_results)
         else:
+            live_results = []
+
+        if not local_results:
+            return live_results
+        # Prefer live copies of pages we already have; local pages fill the remaining slots
+        live_urls = {r["url"] for r in live_results}
+        merged = live_results + [r for r in local_results if r["url"] not in live_urls]
+        return merged[:num_results]
+
+    def search_local(self, query: str, num_results: int = 10, max_age_hours: float | None = None) -> List[Dict[str, Any]]:
+        """Search the local knowledge index of previously fetched pages."""
+        try:
+            return get_knowledge_index().search(query, num_results, max_age_hours)
+        except Exception as e:
+            logger.warning("Error searching local knowledge index: %s", e)
             return []
     
     def search_with_serpapi(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
@@ -126,6 +189,8 @@ class WebResearchTool:
             return []
             
         try:
+            from serpapi import GoogleSearch
+
             search = GoogleSearch({
                 "q": query,
                 "api_key": self.serpapi_key,
@@ -155,8 +220,12 @@ class WebResearchTool:
             print(f"Error searching with SerpAPI: {e}")
             return []
     
+    @recorded("scrape", lambda self, url: (fingerprint(url), fingerprint(url)))
     async def scrape_content(self, url: str) -> Dict[str, Any]:
         """Scrape content from a URL."""
+        import aiohttp
+        from bs4 import BeautifulSoup
+
         try:
             async with aiohttp.ClientSession() as session:
                 headers = {
@@ -178,7 +247,7 @@ class WebResearchTool:
                         text = ' '.join(chunk for chunk in chunks if chunk)
                         return {
                             "url": url,
-                            "content": text[:3000],  # Limit content length
+                            "content": text[:MAX_SCRAPED_CHARS],  # Ranked against the query later
                             "title": soup.title.string if soup.title else "",
                             "success": True
                         }
@@ -187,9 +256,31 @@ class WebResearchTool:
         except Exception as e:
             return {"url": url, "content": "", "title": "", "success": False, "error": str(e)}
     
-    async def research_query(self, query: str, max_sources: int = 5) -> Dict[str, Any]:
-        """Perform comprehensive research on a query."""
-        if not self.use_tavily and not self.use_serpapi:
+    async def _traced_scrape(self, url: str) -> Dict[str, Any]:
+        with span("scrape", **{"http.url": url}) as scrape_span:
+            scraped = await self.scrape_content(url)
+            scrape_span.set_attributes({
+                "scrape.success": scraped["success"],
+                "scrape.bytes": len(scraped["content"]),
+            })
+            return scraped
+
+    async def research_query(
+        self,
+        query: str,
+        max_sources: int = 5,
+        token_budget: int = SOURCE_TOKEN_BUDGET,
+        knowledge_mode: str = "off",
+        max_age_hours: float | None = None,
+        ingest: bool = False,
+    ) -> Dict[str, Any]:
+        """Perform comprehensive research on a query.
+
+        Source content is reduced to the passages most relevant to `query`
+        that fit in `token_budget` tokens per source. Full page text from live
+        results is queued for the knowledge index when `ingest` is set.
+        """
+        if not self.use_tavily and not self.use_serpapi and not self.use_local:
             return {
                 "query": query,
                 "sources": [],
@@ -198,7 +289,15 @@ class WebResearchTool:
             }
         
         # Search for relevant URLs
-        search_results = self.search_web(query, num_results=max_sources * 2)
+        with span("search", **{"search.provider": self.search_engine, "search.query": query,
+                               "search.knowledge_mode": knowledge_mode}) as search_span:
+            search_results = self.search_web(
+                query, num_results=max_sources * 2, knowledge_mode=knowledge_mode, max_age_hours=max_age_hours
+            )
+            search_span.set_attributes({
+                "search.results": len(search_results),
+                "search.index_hits": sum(1 for r in search_results if "fetched_at" in r),
+            })
         
         if not search_results:
             return {
@@ -208,40 +307,56 @@ class WebResearchTool:
                 "search_engine": self.search_engine
             }
         
-        # For Tavily, we already have content, for SerpAPI we need to scrape
+        # Tavily and the local index already provide content, SerpAPI results need scraping
         sources = []
-        scraping_tasks = []
-        
+        to_scrape = []
+        fetched_at = time.time()
+        live_pages = []  # (url, title, full text) of pages fetched during this call
+
         for result in search_results[:max_sources]:
-            if self.use_tavily and result.get("content"):
-                # Tavily already provides content
+            if result.get("content"):
+                from_index = "fetched_at" in result
+                if not from_index:
+                    live_pages.append((result["url"], result["title"], result["content"]))
                 sources.append({
                     "title": result["title"],
                     "url": result["url"],
                     "snippet": result["snippet"],
-                    "content": result["content"][:2000],  # Limit content
-                    "scraped_successfully": True
+                    "content": select_passages(result["content"], query, token_budget),
+                    "scraped_successfully": True,
+                    "from_index": from_index,
                 })
             else:
-                # SerpAPI requires scraping
-                scraping_tasks.append(self.scrape_content(result["url"]))
-        
-        # If we have scraping tasks (SerpAPI), execute them
-        if scraping_tasks:
-            scraped_contents = await asyncio.gather(*scraping_tasks, return_exceptions=True)
-            
+                to_scrape.append(result)
+
+        if to_scrape:
+            scraped_contents = await asyncio.gather(
+                *(self._traced_scrape(result["url"]) for result in to_scrape), return_exceptions=True
+            )
+
             # Combine search results with scraped content
-            for i, result in enumerate(search_results[:max_sources]):
-                if i < len(scraped_contents):
-                    scraped = scraped_contents[i] if not isinstance(scraped_contents[i], Exception) else {}
-                    sources.append({
-                        "title": result["title"],
-                        "url": result["url"],
-                        "snippet": result["snippet"],
-                        "content": scraped.get("content", "")[:2000] if isinstance(scraped, dict) else "",
-                        "scraped_successfully": scraped.get("success", False) if isinstance(scraped, dict) else False
-                    })
-        
+            for result, scraped in zip(to_scrape, scraped_contents):
+                if not isinstance(scraped, dict):
+                    scraped = {}
+                if scraped.get("success"):
+                    live_pages.append((result["url"], result["title"], scraped["content"]))
+                sources.append({
+                    "title": result["title"],
+                    "url": result["url"],
+                    "snippet": result["snippet"],
+                    "content": select_passages(scraped.get("content", ""), query, token_budget),
+                    "scraped_successfully": scraped.get("success", False),
+                    "from_index": False,
+                })
+
+        if ingest and live_pages:
+            try:
+                index = get_knowledge_index()
+                for url, title, content in live_pages:
+                    index.ingest(url, title, content, source=self.search_engine, fetched_at=fetched_at)
+            except Exception as e:
+                logger.warning("Error ingesting into knowledge index: %s", e)
+
         return {
             "query": query,
             "sources": sources,
@@ -251,22 +366,38 @@ class WebResearchTool:
         }
 
 
-# Initialize the research tool with default settings
-research_tool = WebResearchTool()
+# Research tools per search engine, created on first use
+_research_tools: Dict[str, WebResearchTool] = {}
+_research_tools_lock = threading.Lock()
+
+
+def get_research_tool(search_engine: str = "serpapi") -> WebResearchTool:
+    """Return the shared research tool for `search_engine`, creating it on first use."""
+    search_engine = search_engine.lower()
+    tool = _research_tools.get(search_engine)
+    if tool is None:
+        with _research_tools_lock:
+            tool = _research_tools.get(search_engine)
+            if tool is None:
+                tool = _research_tools[search_engine] = WebResearchTool(search_engine=search_engine)
+    return tool
 
 
-async def enhance_ai_research_with_real_data(query: str, ai_generated_content: str, search_engine: str = "serpapi") -> Dict[str, Any]:
+async def enhance_ai_research_with_real_data(
+    query: str,
+    ai_generated_content: str,
+    search_engine: str = "serpapi",
+    knowledge_mode: str = "off",
+    max_age_hours: float | None = None,
+    ingest: bool = False,
+) -> Dict[str, Any]:
     """
     Enhance AI-generated research with real web data when search engines are available.
     This function can be called to augment existing AI research.
     """
-    # Use the existing global tool or create a new one with specified engine
-    if search_engine != research_tool.search_engine:
-        tool = WebResearchTool(search_engine=search_engine)
-    else:
-        tool = research_tool
+    tool = get_research_tool(search_engine)
     
-    if not tool.use_tavily and not tool.use_serpapi:
+    if not tool.use_tavily and not tool.use_serpapi and not tool.use_local:
         return {
             "enhanced_content": ai_generated_content,
             "sources": [],
@@ -275,7 +406,13 @@ async def enhance_ai_research_with_real_data(query: str, ai_generated_content: s
     
     try:
         # Use await instead of asyncio.run since we're already in an async context
-        research_result = await tool.research_query(query, max_sources=3)
+        research_result = await tool.research_query(
+            query,
+            max_sources=3,
+            knowledge_mode=knowledge_mode,
+            max_age_hours=max_age_hours,
+            ingest=ingest,
+        )
         
         if research_result["sources"]:
             # Combine AI content with real sources
@@ -283,7 +420,8 @@ async def enhance_ai_research_with_real_data(query: str, ai_generated_content: s
             for source in research_result["sources"]:
                 if source["content"] or source["snippet"]:
                     content_preview = source["content"] if source["content"] else source["snippet"]
-                    source_summaries.append(f"**{source['title']}**: {content_preview[:200]}...")
+                    excerpt = best_passage(content_preview, query, max_chars=SOURCE_PREVIEW_CHARS)
+                    source_summaries.append(f"**{source['title']}**: {excerpt}...")
             
             enhanced_content = ai_generated_content
             if source_summaries:
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from agent.answer_cache import (
+    AnswerCache,
+    CachedAnswer,
+    question_vector,
+    question_words,
+)
+
+THRESHOLD = 0.9
+
+
+def _answer(question, **kwargs):
+    return CachedAnswer(question=question, final_report=f"Report on {question}", metadata={}, evidence=[], **kwargs)
+
+
+def _similarity(a, b):
+    return float(question_vector(a) @ question_vector(b))
+
+
+def test_question_words_keep_interrogatives_negations_and_numbers():
+    assert question_words("When was the iPhone 15 released?") == ["when", "iphone", "15", "released"]
+    assert question_words("Why isn't -3 < 2, vs. 2.5?") == ["why", "isn't", "-3", "2", "vs", "2.5"]
+
+
+def test_rewordings_of_the_same_question_match():
+    assert _similarity("What is the capital of Australia?", "what is the capital of australia") == pytest.approx(1.0)
+    assert _similarity("Who founded Microsoft?", "Who was it that founded Microsoft?") >= THRESHOLD
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("When was Albert Einstein born?", "Where was Albert Einstein born?"),
+        ("Why did the Roman Empire fall?", "When did the Roman Empire fall?"),
+        ("Is coffee good for you?", "Is coffee not good for you?"),
+        ("Research question 1: how is the market evolving?", "Research question -1: how is the market evolving?"),
+        ("GDP of France in 2022", "GDP of France in 2023"),
+    ],
+)
+def test_different_questions_stay_below_the_threshold(a, b):
+    assert _similarity(a, b) < THRESHOLD
+
+
+def test_lookup_returns_a_close_fresh_match():
+    cache = AnswerCache()
+    cache.store(_answer("When was Albert Einstein born?"), ttl_hours=1)
+
+    hit, similarity = cache.lookup("when was albert einstein born", THRESHOLD, ttl_hours=1)
+    miss, _ = cache.lookup("Where was Albert Einstein born?", THRESHOLD, ttl_hours=1)
+
+    assert hit.question == "When was Albert Einstein born?" and hit.hits == 1
+    assert similarity == pytest.approx(1.0)
+    assert miss is None
+
+
+def test_expired_answers_are_evicted():
+    cache = AnswerCache()
+    cache.store(_answer("Who founded Microsoft?", stored_at=time.time() - 7200), ttl_hours=3)
+
+    assert cache.lookup("Who founded Microsoft?", THRESHOLD, ttl_hours=1) == (None, 0.0)
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_answers_are_evicted_beyond_capacity():
+    cache = AnswerCache(max_entries=2)
+    cache.store(_answer("Who founded Microsoft?"), ttl_hours=1)
+    cache.store(_answer("Who founded Apple?"), ttl_hours=1)
+    cache.lookup("Who founded Microsoft?", THRESHOLD, ttl_hours=1)
+    cache.store(_answer("Who founded Google?"), ttl_hours=1)
+
+    assert cache.lookup("Who founded Apple?", THRESHOLD, ttl_hours=1)[0] is None
+    assert cache.lookup("Who founded Microsoft?", THRESHOLD, ttl_hours=1)[0] is not None
+
+
+def test_storing_the_same_question_replaces_it():
+    cache = AnswerCache()
+    cache.store(_answer("Who founded Microsoft?"), ttl_hours=1)
+    cache.store(CachedAnswer("Who founded Microsoft?", "Newer report", {}, []), ttl_hours=1)
+
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup("Who founded Microsoft?", THRESHOLD, ttl_hours=1)[0].final_report == "Newer report"
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.deadlines import (
+    MIN_CALL_SECONDS,
+    DeadlineExceeded,
+    call_policy,
+    end_run_deadline,
+    parse_node_timeouts,
+    run_time_left,
+    start_run_deadline,
+)
+from agent.llm import InstrumentedLLM
+from agent.llm_pool import Deployment, DeploymentPool
+
+MODEL = "gpt-4.1-mini"
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _config(run_id="run-1", **configurable):
+    return {"configurable": {"run_id": run_id, **configurable}}
+
+
+def _timeout(policy):
+    return policy.deadline - time.monotonic()
+
+
+def test_parse_node_timeouts():
+    assert parse_node_timeouts("web_research=45, reflection = 90,,broken") == {"web_research": 45.0, "reflection": 90.0}
+
+
+def test_node_timeouts_and_default():
+    config = _config(llm_node_timeouts="web_research=45", llm_timeout_seconds=120)
+
+    assert _timeout(call_policy("web_research", config, {})) == pytest.approx(45, abs=0.5)
+    assert _timeout(call_policy("finalize_answer", config, {})) == pytest.approx(120, abs=0.5)
+
+
+def test_reasoning_nodes_get_minutes_by_default():
+    for node in ("reflection", "finalize_answer"):
+        assert _timeout(call_policy(node, _config(), {})) > 239
+
+
+def test_run_budget_caps_calls_but_leaves_a_minimum():
+    config = _config(run_id="budgeted")
+    start_run_deadline(config, 30)
+    try:
+        assert run_time_left(config) == pytest.approx(30, abs=0.5)
+        assert _timeout(call_policy("finalize_answer", config, {})) == pytest.approx(30, abs=0.5)
+
+        start_run_deadline(config, 0.001)
+        time.sleep(0.01)
+        assert _timeout(call_policy("finalize_answer", config, {})) == pytest.approx(MIN_CALL_SECONDS, abs=0.5)
+    finally:
+        end_run_deadline(config)
+    assert run_time_left(config) is None
+
+
+def test_only_idempotent_calls_are_hedged():
+    config = _config(llm_hedge_after_seconds=8, llm_hedge_max_temperature=0.2)
+
+    assert call_policy("web_research", config, {"temperature": 0}).hedge_after == 8
+    assert call_policy("web_research", config, {"temperature": 1.0}).hedge_after is None
+    assert call_policy("web_research", config, {}).hedge_after is None
+    assert call_policy("web_research", config, {"temperature": 0}, hedge=False).hedge_after is None
+    assert call_policy("web_research", _config(llm_hedge_after_seconds=0), {"temperature": 0}).hedge_after is None
+    # A hedge that could only start after the deadline is pointless
+    assert call_policy("branch_gap_check", _config(llm_hedge_after_seconds=30), {"temperature": 0}).hedge_after is None
+
+
+def _async_pool(*delays):
+    """A pool of deployments whose async client answers after the given delays."""
+    deployments = [
+        Deployment(MODEL, f"d{i}", f"https://d{i}.openai.azure.com", "key", "2024-12-01-preview")
+        for i in range(len(delays))
+    ]
+    pool = DeploymentPool(deployments)
+
+    def client(deployment, asynchronous=False):
+        delay = delays[deployments.index(deployment)]
+
+        async def create(**kwargs):
+            await asyncio.sleep(delay)
+            usage = SimpleNamespace(prompt_tokens=1, completion_tokens=1)
+            message = SimpleNamespace(content=deployment.deployment)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    pool.client = client
+    return pool
+
+
+def test_slow_idempotent_call_is_hedged():
+    pool = _async_pool(5, 0)
+    config = _config(llm_hedge_after_seconds=0.05)
+
+    start = time.monotonic()
+    result = asyncio.run(InstrumentedLLM(pool).achat("web_research", config, model=MODEL, messages=MESSAGES, temperature=0))
+
+    assert result.content == "d1" and result.usage["hedged"] is True
+    assert time.monotonic() - start < 1
+    # The slow primary was cancelled and gave its lease back
+    assert [d.inflight for d in pool.deployments] == [0, 0]
+
+
+def test_fast_call_is_not_hedged():
+    result = asyncio.run(
+        InstrumentedLLM(_async_pool(0, 0)).achat("web_research", _config(llm_hedge_after_seconds=1), model=MODEL,
+                                                  messages=MESSAGES, temperature=0)
+    )
+
+    assert result.usage["hedged"] is False
+
+
+def test_call_past_its_deadline_raises_with_a_usage_record():
+    config = _config(llm_node_timeouts="web_research=0.05", llm_hedge_after_seconds=0)
+
+    with pytest.raises(DeadlineExceeded) as raised:
+        asyncio.run(InstrumentedLLM(_async_pool(5)).achat("web_research", config, model=MODEL, messages=MESSAGES))
+
+    assert isinstance(raised.value, TimeoutError)
+    assert raised.value.usage["status"] == "timeout" and raised.value.usage["node"] == "web_research"
+
+
+def _timed_out(*args, **kwargs):
+    raise DeadlineExceeded("out of time", {"node": "test", "model": MODEL, "run_id": None, "status": "timeout"})
+
+
+def test_reflection_out_of_time_finalizes(monkeypatch):
+    from agent import graph
+
+    monkeypatch.setattr(graph, "_reflect", _timed_out)
+    monkeypatch.setattr(graph, "emit_progress", lambda *args, **kwargs: None)
+    state = {"messages": [HumanMessage(content="q")], "research_topic": "q", "web_research_result": ["found"], "search_query": ["q"]}
+
+    update = graph.reflection(state, _config())
+
+    assert update["is_sufficient"] is True and update["follow_up_queries"] == []
+    assert [u["status"] for u in update["llm_usage"]] == ["timeout"]
+
+
+def test_finalize_out_of_time_answers_with_the_findings(monkeypatch):
+    from agent import graph
+
+    monkeypatch.setattr(graph, "get_llm", lambda: SimpleNamespace(chat=_timed_out))
+    monkeypatch.setattr(graph, "emit_progress", lambda *args, **kwargs: None)
+    state = {
+        "messages": [HumanMessage(content="What changed?")],
+        "research_topic": "What changed?",
+        "web_research_result": ["Earlier turn", "Finding one", "Finding two"],
+        "results_turn_start": 1,
+        "sources_gathered": [],
+        "search_query": ["q"],
+    }
+
+    update = graph.finalize_answer(state, _config(merged_finalize=False))
+
+    assert update["report_complete"] is True
+    assert "Finding one" in update["final_report"] and "Finding two" in update["final_report"]
+    assert "Earlier turn" not in update["final_report"]
+    assert update["code_analysis_needed"] is False
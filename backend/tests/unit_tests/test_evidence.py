@@ -0,0 +1,82 @@
+import time
+
+from agent.evidence import coverage, find_evidence, make_entry, partition_queries
+
+
+def _entry(query, labels=(), age_hours=0.0, run_id=None):
+    entry = make_entry(query, f"Summary of {query}", [{"label": label, "snippet": "s" * 500} for label in labels], run_id)
+    entry["fetched_at"] = time.time() - age_hours * 3600
+    return entry
+
+
+def test_make_entry_trims_snippets():
+    assert len(_entry("solar panel costs", ["Solar"])["sources"][0]["snippet"]) == 300
+
+
+def test_coverage_counts_query_and_source_titles():
+    entry = _entry("solar panel costs 2024", ["Residential installation prices"])
+
+    assert coverage("solar panel installation costs", entry) == 1.0
+    assert coverage("solar panel efficiency", entry) == 2 / 3
+    assert coverage("the of", entry) == 0.0
+
+
+def test_find_evidence_picks_the_best_fresh_entry():
+    stale = _entry("wind turbine costs", age_hours=48)
+    partial = _entry("wind turbine")
+    best = _entry("offshore wind turbine costs")
+
+    assert find_evidence("offshore wind turbine costs", [stale, partial, best], 0.5, 24) is best
+    assert find_evidence("wind turbine costs", [stale], 0.5, 24) is None
+    assert find_evidence("geothermal drilling", [partial, best], 0.5, 24) is None
+
+
+def test_entries_without_a_run_id_are_reused():
+    # Seeded and unstamped entries used to be skipped when the run had no id either
+    entry = _entry("battery storage prices", run_id=None)
+
+    assert find_evidence("battery storage prices", [entry], 0.75, 24) is entry
+
+
+def test_partition_queries_searches_only_uncovered_queries():
+    solar = _entry("solar panel costs")
+    wind = _entry("wind turbine costs")
+
+    to_search, reused = partition_queries(
+        ["solar panel costs", "costs of solar panel", "hydrogen fuel cells", "wind turbine costs"],
+        [solar, wind],
+        0.75,
+        24,
+    )
+
+    assert to_search == ["hydrogen fuel cells"]
+    assert reused == [solar, wind]
+
+
+def test_generate_query_reuses_earlier_turns_only(monkeypatch):
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    from agent import graph
+    from agent.tools_and_schemas import SearchQueryList
+
+    queries = SearchQueryList(query=["solar panel costs", "wind turbine costs"], rationale="")
+    monkeypatch.setattr(graph, "structured_chat", lambda *args, **kwargs: (queries, None, []))
+    monkeypatch.setattr(graph, "emit_progress", lambda *args, **kwargs: None)
+    earlier, this_turn = _entry("solar panel costs"), _entry("wind turbine costs")
+    state = {
+        "messages": [HumanMessage(content="Solar?"), AIMessage(content="Report"), HumanMessage(content="And wind?")],
+        "initial_search_query_count": 2,
+        "research_topic": "solar and wind",
+        # The earlier turn already found the solar summary; this turn has started with the wind entry
+        "web_research_result": [earlier["summary"], this_turn["summary"]],
+        "results_turn_start": 1,
+        "evidence": [earlier, this_turn],
+        "evidence_turn_start": 1,
+    }
+
+    update = graph.generate_query(state, {"configurable": {}})
+
+    assert update["query_list"] == ["wind turbine costs"]
+    assert update["search_query"] == ["solar panel costs"]
+    # Found by an earlier turn, but not yet part of this turn's results
+    assert update["web_research_result"] == [earlier["summary"]]
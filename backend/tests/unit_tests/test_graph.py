@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent import graph
+
+MODEL = "o3"
+
+
+
+def _replies(*contents):
+    """A get_llm stand-in whose chat answers with `contents` in turn, recording each call's kwargs."""
+    calls = []
+
+    def chat(node, config, **kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(content=contents[len(calls) - 1], usage={"node": node, "model": MODEL, "status": "ok"})
+
+    return (lambda: SimpleNamespace(chat=chat)), calls
+
+
+@pytest.mark.parametrize(
+    "reply, retried",
+    [
+        # Invalid as a whole (the decision fields are missing), but the report is intact
+        ('{"report": "The answer.", "code_analysis_needed": tru', False),
+        # Truncated inside the report
+        ('{"report": "The ans', True),
+    ],
+)
+def test_malformed_final_answer_never_becomes_the_report(monkeypatch, reply, retried):
+    get_llm, calls = _replies(reply, "The answer.\nCODE_ANALYSIS_NEEDED: false")
+    monkeypatch.setattr(graph, "get_llm", get_llm)
+    monkeypatch.setattr(graph, "emit_progress", lambda *args, **kwargs: None)
+    state = {
+        "messages": [HumanMessage(content="q")],
+        "research_topic": "q",
+        "web_research_result": ["found"],
+        "sources_gathered": [],
+        "search_query": ["q"],
+    }
+
+    update = graph.finalize_answer(state, {"configurable": {"merged_finalize": True, "enable_report_generator": True}})
+
+    assert update["final_report"] == "The answer."
+    assert update["code_analysis_needed"] is False
+    assert len(calls) == (2 if retried else 1)
+    if retried:
+        assert "response_format" not in calls[1]
@@ -0,0 +1,61 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.history import build_research_topic, render_message, window_start
+
+
+def _thread(turns, report_chars=2000):
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"Question {i}"))
+        messages.append(AIMessage(content=f"Report {i} " + "x" * report_chars))
+    messages.append(HumanMessage(content=f"Question {turns}"))
+    return messages
+
+
+def test_single_question_is_the_topic():
+    topic, summary = build_research_topic([HumanMessage(content="What is RAG?")], 1000)
+
+    assert topic == "What is RAG?"
+    assert summary == {"covered": 0, "text": ""}
+
+
+def test_long_assistant_turns_are_clipped():
+    rendered = render_message(AIMessage(content="y" * 4000), max_tokens=100)
+
+    assert rendered.startswith("Assistant: ") and rendered.endswith(" […]\n")
+    assert len(rendered) < 500
+
+
+def test_window_keeps_the_newest_message_even_over_budget():
+    messages = _thread(3)
+
+    assert window_start(messages, 0) == len(messages) - 1
+    assert window_start(messages, 100_000) == 0
+
+
+def test_turns_outside_the_window_are_summarized_once():
+    messages = _thread(4)
+    calls = []
+
+    def summarize(previous, new_turns):
+        calls.append(new_turns)
+        return f"{previous} [{new_turns.count('User:')} questions]".strip()
+
+    topic, summary = build_research_topic(messages, 1200, None, summarize)
+
+    assert topic.startswith("Summary of the earlier conversation:\n[")
+    assert topic.endswith("User: Question 4\n")
+    assert "Question 0" not in topic and summary["covered"] > 0
+    # The next run of the thread reuses the stored summary
+    again, same = build_research_topic(messages, 1200, summary, summarize)
+    assert (again, same) == (topic, summary) and len(calls) == 1
+
+
+def test_failed_summary_falls_back_to_the_earlier_questions():
+    def summarize(previous, new_turns):
+        raise RuntimeError("model unavailable")
+
+    topic, summary = build_research_topic(_thread(4), 1200, None, summarize)
+
+    assert "- The user asked: Question 0" in summary["text"]
+    assert summary["text"] in topic
@@ -0,0 +1,97 @@
+import sqlite3
+import time
+
+import pytest
+
+from agent import knowledge_index
+from agent.knowledge_index import KnowledgeIndex, term_coverage
+
+
+def _index(tmp_path, **kwargs):
+    return KnowledgeIndex(str(tmp_path / "knowledge.db"), **kwargs)
+
+
+def _ingest(index, pages):
+    for url, title, content, fetched_at in pages:
+        index.ingest(url, title, content, "tavily", fetched_at=fetched_at)
+    index.flush(timeout=10)
+
+
+def test_term_coverage():
+    assert term_coverage(["bitcoin", "price"], "The Bitcoin price rose.") == 1.0
+    assert term_coverage(["bitcoin", "price"], "The price of gold.") == 0.5
+    assert term_coverage([], "anything") == 0.0
+
+
+def test_search_returns_pages_covering_the_query(tmp_path):
+    index = _index(tmp_path)
+    now = time.time()
+    _ingest(index, [
+        ("https://a.example", "Bitcoin price history", "The price of bitcoin since 2009.", now),
+        ("https://b.example", "Gold", "The price of gold.", now),
+    ])
+
+    results = index.search("bitcoin price history", num_results=5)
+
+    assert [r["url"] for r in results] == ["https://a.example"]
+    assert results[0]["position"] == 1
+
+
+def test_stopword_only_overlap_does_not_match(tmp_path):
+    # Pages sharing only stopwords and one content word with the query must not match
+    index = _index(tmp_path)
+    now = time.time()
+    _ingest(index, [
+        (f"https://{i}.example", f"Page {i}", f"What is the price of {topic}? It is the same as ever.", now)
+        for i, topic in enumerate(["tea", "pottery", "sailing", "chess"])
+    ])
+
+    assert index.search("What is the price of Bitcoin?") == []
+
+
+def test_search_ignores_stale_pages(tmp_path):
+    index = _index(tmp_path)
+    _ingest(index, [("https://old.example", "Bitcoin price", "Bitcoin price today.", time.time() - 3 * 3600)])
+
+    assert index.search("bitcoin price", max_age_hours=1) == []
+    assert len(index.search("bitcoin price", max_age_hours=24)) == 1
+
+
+def test_prune_drops_old_pages_and_pages_beyond_the_cap(tmp_path):
+    index = _index(tmp_path)
+    now = time.time()
+    _ingest(index, [
+        ("https://expired.example", "Expired", "Old news.", now - 2 * 86400),
+        ("https://oldest.example", "Oldest", "Content one.", now - 300),
+        ("https://middle.example", "Middle", "Content two.", now - 200),
+        ("https://newest.example", "Newest", "Content three.", now - 100),
+    ])
+    index.max_age_days, index.max_pages = 1, 2
+
+    assert index.prune() == 2
+    assert index.stats()["documents"] == 2
+    assert index.search("content two") and index.search("content three")
+    assert index.search("content one") == []
+
+
+def test_prune_closes_the_connection_it_opens(tmp_path, monkeypatch):
+    index = _index(tmp_path)
+    opened = []
+    connect = index._connect
+    monkeypatch.setattr(index, "_connect", lambda: opened.append(connect()) or opened[-1])
+
+    index.prune()
+
+    assert len(opened) == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+
+
+def test_disabled_index_is_not_created(monkeypatch):
+    monkeypatch.setattr(knowledge_index, "_knowledge_index", None)
+    monkeypatch.delenv("KNOWLEDGE_INDEX_MODE", raising=False)
+    monkeypatch.delenv("KNOWLEDGE_INDEX_INGEST", raising=False)
+    assert not knowledge_index.knowledge_index_enabled()
+
+    monkeypatch.setenv("KNOWLEDGE_INDEX_MODE", "local_first")
+    assert knowledge_index.knowledge_index_enabled()
@@ -0,0 +1,187 @@
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from agent.llm import InstrumentedLLM
+from agent.llm_pool import (
+    Deployment,
+    DeploymentPool,
+    TokenBucket,
+    estimate_request_tokens,
+    retry_after_seconds,
+)
+
+MODEL = "gpt-4.1-mini"
+
+
+def _deployment(name, **kwargs):
+    return Deployment(MODEL, name, f"https://{name}.openai.azure.com", "key", "2024-12-01-preview", **kwargs)
+
+
+def _rate_limit_error(headers):
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://example.com"))
+    return openai.RateLimitError("throttled", response=response, body=None)
+
+
+def _completion(content):
+    usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def _client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_token_bucket_refills_continuously():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    bucket.take(60, now)
+
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1) == pytest.approx(0.0)
+    assert bucket.utilization(now + 30) == pytest.approx(0.5)
+    # Requests larger than the bucket only wait for a full bucket
+    assert bucket.wait_time(1000, now + 30) == pytest.approx(30.0)
+
+
+def test_token_bucket_goes_into_debt():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    bucket.take(90, now)
+
+    assert bucket.tokens == -30
+    assert bucket.wait_time(1, now) == pytest.approx(31.0)
+
+
+def test_estimate_request_tokens():
+    messages = [{"role": "user", "content": "x" * 400}]
+
+    assert estimate_request_tokens({"messages": messages, "max_tokens": 50}) == 150
+    assert estimate_request_tokens({"messages": messages, "max_completion_tokens": 20}) == 120
+    assert estimate_request_tokens({"messages": messages}) == 1100
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(_rate_limit_error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(_rate_limit_error({"retry-after": "7"})) == 7.0
+    assert retry_after_seconds(_rate_limit_error({"retry-after": "soon"})) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_acquire_prefers_the_least_loaded_deployment_with_quota():
+    busy, idle = _deployment("busy", rpm=TokenBucket(10)), _deployment("idle", rpm=TokenBucket(10))
+    pool = DeploymentPool([busy, idle])
+    busy.rpm.take(5, time.monotonic())
+
+    lease = pool.acquire(MODEL, 100)
+    assert lease.deployment is idle and idle.inflight == 1
+
+    # Without RPM quota left a deployment is skipped however idle it is
+    pool.release(lease)
+    idle.rpm.take(idle.rpm.tokens, time.monotonic())
+    assert pool.acquire(MODEL, 100).deployment is busy
+
+
+def test_acquire_falls_back_to_wildcard_deployments():
+    wildcard = Deployment("*", "*", "https://any.openai.azure.com", "key", "2024-12-01-preview")
+    pool = DeploymentPool([_deployment("mini"), wildcard])
+
+    assert pool.candidates(MODEL) == [pool.deployments[0]]
+    assert pool.candidates("o3") == [wildcard]
+    assert pool.deployment_name(wildcard, "o3") == "o3"
+    with pytest.raises(ValueError):
+        DeploymentPool([_deployment("mini")]).acquire("o3", 100)
+
+
+def test_release_corrects_the_reservation_and_applies_cooldowns():
+    deployment = _deployment("east", tpm=TokenBucket(10_000))
+    pool = DeploymentPool([deployment])
+
+    lease = pool.acquire(MODEL, 1000)
+    pool.release(lease, used_tokens=200)
+    assert deployment.tpm.tokens == pytest.approx(9800, abs=1)
+
+    pool.release(pool.acquire(MODEL, 0), "throttled", retry_after=5)
+    assert deployment.cooldown_until - time.monotonic() == pytest.approx(5, abs=0.1)
+
+    deployment.cooldown_until = 0
+    for expected in (1, 2, 4):
+        pool.release(pool.acquire(MODEL, 0, max_wait=0), "error")
+        assert deployment.cooldown_until - time.monotonic() == pytest.approx(expected, abs=0.1)
+        deployment.cooldown_until = 0
+    pool.release(pool.acquire(MODEL, 0), "ok")
+    assert deployment.failures == 0
+
+
+def test_acquire_waits_for_cooldown_then_forces_past_the_budget():
+    deployment = _deployment("east")
+    pool = DeploymentPool([deployment])
+    deployment.cooldown_until = time.monotonic() + 0.05
+
+    start = time.monotonic()
+    pool.release(pool.acquire(MODEL, 0, max_wait=1))
+    assert time.monotonic() - start >= 0.04
+
+    deployment.cooldown_until = time.monotonic() + 60
+    assert pool.acquire(MODEL, 0, max_wait=0.01).reserved_tokens == 0.0
+
+
+def test_throttled_call_fails_over_and_cools_down_the_deployment():
+    east, west = _deployment("east"), _deployment("west")
+    pool = DeploymentPool([east, west])
+    calls = []
+
+    def throttled(**kwargs):
+        calls.append("east")
+        raise _rate_limit_error({"retry-after": "20"})
+
+    def ok(**kwargs):
+        calls.append("west")
+        return _completion("answer")
+
+    clients = {east.name: _client(throttled), west.name: _client(ok)}
+    pool.client = lambda deployment, asynchronous=False: clients[deployment.name]
+    # East looks idler, so it is tried first
+    west.inflight = 1
+
+    result = InstrumentedLLM(pool, max_retries=0).chat("test", model=MODEL, messages=[{"role": "user", "content": "hi"}])
+
+    assert result.content == "answer" and result.usage["retries"] == 0
+    assert calls == ["east", "west"]
+    assert east.cooldown_until - time.monotonic() == pytest.approx(20, abs=0.5)
+    assert (east.inflight, west.inflight) == (0, 1)
+
+
+@pytest.fixture
+def azure_env(monkeypatch):
+    for name in ("AZURE_OPENAI_DEPLOYMENTS", "AZURE_OPENAI_DEPLOYMENTS_FILE", "OPENAI_API_VERSION"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "key")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://eastus.openai.azure.com")
+    monkeypatch.setenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
+    return monkeypatch
+
+
+def test_from_env_builds_a_wildcard_deployment(azure_env):
+    [deployment] = DeploymentPool.from_env().deployments
+
+    assert (deployment.endpoint, deployment.api_version) == ("https://eastus.openai.azure.com", "2024-12-01-preview")
+
+
+@pytest.mark.parametrize("missing", ["AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_VERSION"])
+def test_from_env_rejects_missing_settings(azure_env, missing):
+    azure_env.delenv(missing)
+
+    with pytest.raises(ValueError, match=missing):
+        DeploymentPool.from_env()
+
+
+def test_from_env_rejects_a_listed_deployment_without_api_version(azure_env):
+    azure_env.delenv("AZURE_OPENAI_API_VERSION")
+    azure_env.setenv("AZURE_OPENAI_DEPLOYMENTS", '[{"endpoint": "https://eastus.openai.azure.com", "model": "o3"}]')
+
+    with pytest.raises(ValueError, match="AZURE_OPENAI_API_VERSION"):
+        DeploymentPool.from_env()
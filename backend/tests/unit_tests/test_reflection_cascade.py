@@ -0,0 +1,31 @@
+import pytest
+
+from agent import reflection_cascade
+from agent.metrics import MetricsRegistry
+from agent.reflection_cascade import (
+    MIN_ESCALATIONS_FOR_ESTIMATE,
+    record_pass,
+    summarize_passes,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(reflection_cascade, "metrics", MetricsRegistry())
+
+
+def test_no_saving_estimate_until_enough_escalations():
+    passes = [record_pass(1.0, 5.0, "low confidence", run_id="run") for _ in range(MIN_ESCALATIONS_FOR_ESTIMATE - 1)]
+    passes.append(record_pass(1.0, None, "confident", run_id="run"))
+    summary = summarize_passes(passes, run_id="run")
+    assert summary["escalation_overhead_seconds"] == MIN_ESCALATIONS_FOR_ESTIMATE - 1
+    assert summary["estimated_saved_seconds"] is None
+
+
+def test_overhead_is_kept_apart_from_the_estimate():
+    for _ in range(MIN_ESCALATIONS_FOR_ESTIMATE):
+        record_pass(1.0, 5.0, "low confidence", run_id="earlier")
+    passes = [record_pass(1.0, None, "confident", run_id="run"), record_pass(2.0, 5.0, "low confidence", run_id="run")]
+    summary = summarize_passes(passes, run_id="run")
+    assert summary["escalation_overhead_seconds"] == 2.0
+    assert summary["estimated_saved_seconds"] == 4.0
@@ -0,0 +1,103 @@
+import dataclasses
+import datetime
+import operator
+import sqlite3
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import Annotated, TypedDict
+
+from agent.checkpointing import CompactSerializer
+from agent.retention import (
+    CheckpointRow,
+    RetentionJob,
+    RetentionPolicy,
+    SqliteRetentionBackend,
+    plan_runs,
+)
+
+NOW = datetime.datetime(2026, 1, 1, 12, tzinfo=datetime.timezone.utc)
+
+
+def _row(checkpoint_id, minutes_ago, source="loop", run_id=None, retained=False):
+    return CheckpointRow(checkpoint_id, None, NOW - datetime.timedelta(minutes=minutes_ago), source, run_id, retained)
+
+
+def test_plan_runs_keeps_the_final_checkpoint_of_completed_runs():
+    rows = [
+        _row("1", 60, "input"), _row("2", 59), _row("3", 58),
+        _row("4", 30, "input"), _row("5", 29),
+        # In flight: younger than the settle time
+        _row("6", 1, "input"), _row("7", 0),
+    ]
+
+    drop, rechain = plan_runs(rows, NOW, settle_seconds=300)
+
+    assert drop == ["1", "2", "4"]
+    assert rechain == [("3", None), ("5", "3")]
+
+
+def test_plan_runs_splits_runs_on_run_id_and_retained_checkpoints():
+    rows = [
+        _row("1", 60, run_id="a", retained=True),
+        _row("2", 50, run_id="b"), _row("3", 49, run_id="b"),
+        _row("4", 40, run_id="c"), _row("5", 39, run_id="c"),
+    ]
+
+    drop, rechain = plan_runs(rows, NOW, settle_seconds=300)
+
+    assert drop == ["2", "4"]
+    assert rechain == [("3", "1"), ("5", "3")]
+
+
+def test_plan_runs_leaves_a_single_settling_run_alone():
+    assert plan_runs([_row("1", 1, "input"), _row("2", 0)], NOW, settle_seconds=300) == ([], [])
+
+
+class _State(TypedDict):
+    items: Annotated[list, operator.add]
+
+
+def _graph(checkpointer):
+    builder = StateGraph(_State)
+    builder.add_node("first", lambda state: {"items": ["first"]})
+    builder.add_node("second", lambda state: {"items": ["second"]})
+    builder.add_edge(START, "first")
+    builder.add_edge("first", "second")
+    builder.add_edge("second", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def test_retention_pass_compacts_completed_runs(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    saver = SqliteSaver(sqlite3.connect(path, check_same_thread=False), serde=CompactSerializer())
+    graph = _graph(saver)
+    config = {"configurable": {"thread_id": "thread-1"}}
+    graph.invoke({"items": ["question 1"]}, config)
+    graph.invoke({"items": ["question 2"]}, config)
+    before = len(list(saver.list(config)))
+
+    backend = SqliteRetentionBackend(path)
+    report = RetentionJob(backend, RetentionPolicy(settle_seconds=0, pause_seconds=0), delta_channels={}).run_pass()
+
+    assert report.threads_scanned == 1 and report.runs_compacted == 2
+    assert report.reclaimed.rows["checkpoints"] == before - 2
+    assert len(list(saver.list(config))) == 2
+    assert graph.get_state(config).values["items"] == ["question 1", "first", "second", "question 2", "first", "second"]
+    # A second pass finds nothing left to compact
+    assert RetentionJob(backend, RetentionPolicy(settle_seconds=0, pause_seconds=0), delta_channels={}).run_pass().runs_compacted == 0
+
+
+def test_retention_pass_expires_abandoned_threads_and_dry_runs(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    saver = SqliteSaver(sqlite3.connect(path, check_same_thread=False), serde=CompactSerializer())
+    config = {"configurable": {"thread_id": "thread-1"}}
+    _graph(saver).invoke({"items": []}, config)
+    backend = SqliteRetentionBackend(path)
+    policy = RetentionPolicy(abandoned_thread_ttl_hours=1e-9, pause_seconds=0)
+
+    dry_run = RetentionJob(backend, dataclasses.replace(policy, dry_run=True), delta_channels={}).run_pass()
+    assert dry_run.threads_expired == 1 and list(saver.list(config))
+
+    assert RetentionJob(backend, policy, delta_channels={}).run_pass().threads_expired == 1
+    assert list(saver.list(config)) == []
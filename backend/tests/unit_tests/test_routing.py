@@ -0,0 +1,61 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.routing import classify_heuristic, latest_question, parse_route
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "What is the capital of Australia?",
+        "Who wrote Pride and Prejudice?",
+        "When was Albert Einstein born?",
+        "How many moons does Mars have?",
+        "Define photosynthesis",
+    ],
+)
+def test_short_factual_questions_take_the_fast_path(question):
+    assert classify_heuristic(question).route == "fast"
+
+
+@pytest.mark.parametrize(
+    "question, reason",
+    [
+        ("Compare the GDP of France and Germany", "analysis cue 'compare'"),
+        ("Why did the Roman Empire fall?", "analysis cue 'why'"),
+        ("What is the average rainfall in Lima?", "computation cue 'average'"),
+        ("Plot the population of Tokyo", "computation cue 'plot'"),
+        ("What is the capital of Peru? And of Chile?", "several questions"),
+        ("", "empty question"),
+        (" ".join(["word"] * 17), "17 words"),
+        ("Tell me about renewable energy adoption across small island nations", "not a factual question"),
+    ],
+)
+def test_other_questions_take_the_deep_path(question, reason):
+    decision = classify_heuristic(question)
+
+    assert (decision.route, decision.reason) == ("deep", reason)
+
+
+def test_follow_ups_need_the_conversation():
+    assert classify_heuristic("And what is its population?", has_history=True).route == "deep"
+    assert classify_heuristic("What is its population?", has_history=True).route == "deep"
+    assert classify_heuristic("Who founded them?", has_history=True).route == "deep"
+    assert classify_heuristic("What is its population?").route == "fast"
+    assert classify_heuristic("What is the capital of France?", has_history=True).route == "fast"
+
+
+def test_parse_route():
+    decision = parse_route('```json\n{"route": "fast", "reason": "single fact"}\n```')
+
+    assert (decision.route, decision.reason, decision.classifier) == ("fast", "single fact", "llm")
+    assert parse_route('{"route": "medium"}') is None
+    assert parse_route("fast") is None
+    assert parse_route("[]") is None
+
+
+def test_latest_question():
+    messages = [HumanMessage(content="first"), AIMessage(content="answer"), HumanMessage(content="second"), AIMessage(content="")]
+
+    assert latest_question(messages) == "second"
+    assert latest_question([]) == ""
@@ -0,0 +1,36 @@
+from starlette.requests import Request
+
+from agent.static_assets import AssetManifest
+
+
+def _request(**headers):
+    return Request({"type": "http", "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]})
+
+
+def _manifest(tmp_path):
+    (tmp_path / "app.js").write_text("const value = 1;\n" * 200)
+    return AssetManifest(tmp_path)
+
+
+def test_each_encoding_has_its_own_etag(tmp_path):
+    manifest = _manifest(tmp_path)
+    asset = manifest.get("app.js")
+
+    identity = manifest.response(_request(), asset)
+    gzipped = manifest.response(_request(accept_encoding="gzip"), asset)
+
+    assert identity.headers["etag"] == asset.etag
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == asset.etag[:-1] + '-gzip"'
+
+
+def test_any_encoding_etag_revalidates_with_the_etag_of_the_requested_encoding(tmp_path):
+    manifest = _manifest(tmp_path)
+    asset = manifest.get("app.js")
+    gzip_etag = manifest.response(_request(accept_encoding="gzip"), asset).headers["etag"]
+
+    response = manifest.response(_request(if_none_match=gzip_etag), asset)
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == asset.etag
+    assert manifest.response(_request(if_none_match='"other"'), asset).status_code == 200
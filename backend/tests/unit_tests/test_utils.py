@@ -0,0 +1,46 @@
+from agent.utils import UrlMatcher, insert_citation_markers, rewrite_source_urls
+
+
+def _source(short_url, value):
+    return {"label": value, "short_url": short_url, "value": value}
+
+
+def test_url_matcher_prefers_the_longest_url():
+    matcher = UrlMatcher(["https://vertex/id/1", "https://vertex/id/12"])
+
+    matches = list(matcher.finditer("see https://vertex/id/12 and https://vertex/id/1."))
+
+    assert [url for _, _, url in matches] == ["https://vertex/id/12", "https://vertex/id/1"]
+
+
+def test_url_matcher_without_urls_leaves_text_alone():
+    assert UrlMatcher([]).sub(str.upper, "https://vertex/id/1") == "https://vertex/id/1"
+    assert UrlMatcher(["", None]).anchor is None
+
+
+def test_rewrite_source_urls_resolves_and_keeps_cited_sources_in_order():
+    sources = [
+        _source("https://vertex/id/0-0", "https://a.example"),
+        _source("https://vertex/id/0-1", "https://b.example"),
+        _source("https://vertex/id/0-0", "https://duplicate.example"),
+        _source("https://vertex/id/0-2", "https://uncited.example"),
+    ]
+    content = "B [b](https://vertex/id/0-1), A [a](https://vertex/id/0-0) and A again (https://vertex/id/0-0)."
+
+    rewritten, cited = rewrite_source_urls(content, sources)
+
+    assert rewritten == "B [b](https://b.example), A [a](https://a.example) and A again (https://a.example)."
+    assert [s["value"] for s in cited] == ["https://a.example", "https://b.example"]
+
+
+def test_rewrite_source_urls_without_sources():
+    assert rewrite_source_urls("text https://vertex/id/0-0", []) == ("text https://vertex/id/0-0", [])
+
+
+def test_insert_citation_markers():
+    citations = [
+        {"start_index": 0, "end_index": 5, "segments": [{"label": "a", "short_url": "u1"}]},
+        {"start_index": 6, "end_index": 11, "segments": [{"label": "b", "short_url": "u2"}, {"label": "c", "short_url": "u3"}]},
+    ]
+
+    assert insert_citation_markers("Hello world!", citations) == "Hello [a](u1) world [b](u2) [c](u3)!"
@@ -8,6 +8,7 @@ import { ThemeProvider } from "@/components/ThemeProvider";
 import { ThemeToggle } from "@/components/ThemeToggle";
 import { ResearchProgressRing } from "@/components/ResearchProgressRing";
 import { ChevronDown, ChevronUp } from "lucide-react";
+import { apiUrl } from "@/lib/utils";
 
 interface ResearchInsight {
   type: "trend" | "source" | "analysis" | "suggestion" | "methodology" | "progress";
@@ -45,95 +46,26 @@ export default function App() {
     max_research_loops: number;
     reasoning_model: string;
   }>({
-    apiUrl: import.meta.env.DEV
-      ? "http://localhost:2024"
-      : "http://localhost:8000",
+    apiUrl,
     assistantId: "agent",
     messagesKey: "messages",// eslint-disable-next-line @typescript-eslint/no-explicit-any
     onFinish: (event: any) => {
       console.log(event);
     },
+    // Nodes emit slim progress events on the custom stream (see backend agent/streaming.py),
+    // so full node updates are not requested
     // eslint-disable-next-line @typescript-eslint/no-explicit-any
-    onUpdateEvent: (event: any) => {
-      console.log("Event received:", event); // Debug log to understand actual structure
-      let processedEvent: ProcessedEvent | null = null;
-      
-      // The generate_query node in LangGraph returns { query_list: [...] }
-      // So the event structure should be { generate_query: { query_list: [...] } }
-      if (event.generate_query) {
-        // Access query_list from the generate_query node result
-        const nodeOutput = event.generate_query;
-        const queryList = nodeOutput.query_list || nodeOutput; // Fallback to nodeOutput itself
-        let queryData = "Generating search queries...";
-        
-        if (Array.isArray(queryList)) {
-          queryData = queryList.join(", ");
-        } else if (typeof queryList === 'string') {
-          queryData = queryList;
-        } else if (queryList && typeof queryList === 'object' && queryList.query_list) {
-          // If the structure is nested differently
-          const nestedList = queryList.query_list;
-          if (Array.isArray(nestedList)) {
-            queryData = nestedList.join(", ");
-          } else {
-            queryData = String(nestedList);
-          }
-        } else if (queryList) {
-          queryData = String(queryList);
-        }
-        
-        processedEvent = {
-          title: "Generating Search Queries",
-          data: queryData,
-        };
-      } else if (event.web_research) {
-        const sources = event.web_research.sources_gathered || [];
-        const numSources = sources.length;
-        const uniqueLabels = [
-          ...new Set(sources.map((s: {label?: string}) => s.label).filter(Boolean)),
-        ];
-        const exampleLabels = uniqueLabels.slice(0, 3).join(", ");
-        const scrapedCount = sources.filter((s: {scraped_successfully?: boolean}) => s.scraped_successfully).length;
-        
-        processedEvent = {
-          title: "Web Research",
-          data: numSources > 0 
-            ? `Found ${numSources} sources${scrapedCount > 0 ? ` (${scrapedCount} analyzed)` : ''}. Related to: ${exampleLabels || "N/A"}.`
-            : "AI-based research (no external sources)",
-        };      } else if (event.reflection) {
-        let reflectionData = "Reflecting on research results...";
-        
-        if (event.reflection.is_sufficient) {
-          reflectionData = "Search successful, generating final answer.";
-        } else {
-          const followUpQueries = event.reflection.follow_up_queries;
-          if (Array.isArray(followUpQueries)) {
-            reflectionData = `Need more information, searching for ${followUpQueries.join(", ")}`;
-          } else if (typeof followUpQueries === 'string') {
-            reflectionData = `Need more information, searching for ${followUpQueries}`;
-          } else {
-            reflectionData = "Need more information, continuing research...";
-          }
-        }
-        
-        processedEvent = {
-          title: "Reflection",
-          data: reflectionData,
-        };
-      } else if (event.finalize_answer) {
-        processedEvent = {
-          title: "Finalizing Answer",
-          data: "Composing and presenting the final answer.",
-        };
+    onCustomEvent: (event: any) => {
+      if (event?.type !== "progress") return;
+      if (event.node === "finalize_answer" || event.node === "quick_answer") {
         hasFinalizeEventOccurredRef.current = true;
       }
-      if (processedEvent) {
-        setProcessedEventsTimeline((prevEvents) => [
-          ...prevEvents,
-          processedEvent!,
-        ]);
-      }
-    },  });
+      setProcessedEventsTimeline((prevEvents) => [
+        ...prevEvents,
+        { title: event.title, data: event.data },
+      ]);
+    },
+  });
 
   useEffect(() => {
     if (scrollAreaRef.current) {
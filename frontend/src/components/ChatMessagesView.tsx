@@ -44,7 +44,8 @@ interface StructuredMessageContent {
     visualizations?: Array<{
       type: string;
       format: string;
-      base64_data: string;
+      base64_data?: string;
+      url?: string;
       description: string;
     }>;
     errors?: string;
@@ -475,7 +476,7 @@ const AiMessageBubble: React.FC<AiMessageBubbleProps> = ({
     }
     
     if (structuredContent && structuredContent.code_analysis_results && Array.isArray(structuredContent.code_analysis_results)) {
-      const visualizations: Array<{type: string, format: string, base64_data: string, description: string}> = [];
+      const visualizations: Array<{type: string, format: string, base64_data?: string, url?: string, description: string}> = [];
       
       structuredContent.code_analysis_results.forEach((result: any, index: number) => {
         if (result && result.visualizations && Array.isArray(result.visualizations)) {
@@ -496,7 +497,7 @@ const AiMessageBubble: React.FC<AiMessageBubbleProps> = ({
     // Fallback: check directly on message object (legacy)
     const messageWithKwargs = message as Record<string, unknown>;
     if (messageWithKwargs.code_analysis_results && Array.isArray(messageWithKwargs.code_analysis_results)) {
-      const visualizations: Array<{type: string, format: string, base64_data: string, description: string}> = [];
+      const visualizations: Array<{type: string, format: string, base64_data?: string, url?: string, description: string}> = [];
       
       messageWithKwargs.code_analysis_results.forEach((result: any) => {
         if (result && result.visualizations && Array.isArray(result.visualizations)) {
@@ -1,12 +1,14 @@
 import { useState, useEffect } from "react";
 import { Button } from "@/components/ui/button";
 import { ChevronLeft, ChevronRight, BarChart3 } from "lucide-react";
-import { cn } from "@/lib/utils";
+import { apiUrl, cn } from "@/lib/utils";
 
 interface Visualization {
   type: string;
   format: string;
-  base64_data: string;
+  // Inline image, or `url` of an artifact served by the API (slim streaming)
+  base64_data?: string;
+  url?: string;
   description: string;
 }
 
@@ -106,7 +108,9 @@ export function VisualizationCarousel({
         
         <div className="flex justify-center">
           <img 
-            src={`data:image/${currentViz.format || 'png'};base64,${currentViz.base64_data}`}
+            src={currentViz.url
+              ? `${apiUrl}${currentViz.url}`
+              : `data:image/${currentViz.format || 'png'};base64,${currentViz.base64_data}`}
             alt={currentViz.description || `Visualization ${currentIndex + 1}`}
             className="max-w-full h-auto rounded-lg shadow-md border border-border/30 transition-all duration-300"
             style={{maxHeight: '400px'}}
@@ -4,3 +4,8 @@ import { twMerge } from "tailwind-merge";
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs));
 }
+
+// LangGraph API server; artifact URLs in message metadata are relative to it
+export const apiUrl = import.meta.env.DEV
+  ? "http://localhost:2024"
+  : "http://localhost:8000";